@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Compact the SQLite job database offline (stop the agent first).
+
+Rebuilds the file with a full VACUUM and enables incremental auto-vacuum,
+which the running agent then uses to return space in small steps.
+"""
+
+import argparse
+import asyncio
+
+from nostr_dvm_agent.db.store import Store
+
+
+async def vacuum(db_path: str) -> None:
+    store = Store(db_path, read_pool_size=0)
+    await store.open()
+    try:
+        await store.vacuum()
+    finally:
+        await store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("db_path", nargs="?", default="dvm_agent.db")
+    args = parser.parse_args()
+    asyncio.run(vacuum(args.db_path))
+    print(f"Vacuumed {args.db_path}")
+
+
+if __name__ == "__main__":
+    main()
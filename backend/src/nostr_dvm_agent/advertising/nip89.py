@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import math
+import time
+from typing import Callable
 
 import structlog
 from nostr_sdk import EventBuilder, Kind, Tag
@@ -12,13 +16,27 @@ logger = structlog.get_logger()
 
 HANDLER_INFO_KIND = 31990
 
+LoadFn = Callable[[], tuple[int, float]]
+AvailabilityFn = Callable[[BaseDVMService], bool]
+PriceFn = Callable[[BaseDVMService], int]
+
 
 async def publish_handler_info(
     nostr: NostrClient,
     services: dict[int, BaseDVMService],
     lightning_address: str,
+    *,
+    prices: dict[int, int] | None = None,
+    unavailable: frozenset[int] = frozenset(),
+    status: str = "ok",
+    queue_depth: int = 0,
+    est_wait_secs: float = 0.0,
 ) -> None:
-    """Publish a NIP-89 Handler Information event (Kind 31990) to advertise DVM capabilities."""
+    """Publish a NIP-89 Handler Information event (Kind 31990) to advertise DVM capabilities.
+
+    Unavailable kinds keep their ``nip90`` tag (marked ``unavailable``) but
+    lose their ``k`` tag, so clients filtering handlers by kind skip us.
+    """
 
     metadata = json.dumps({
         "name": "sats.ai",
@@ -26,6 +44,9 @@ async def publish_handler_info(
         "about": "AI services powered by Gemini 3 Pro. Pay with Lightning sats. Text generation, translation, summarization, image generation, and more.",
         "picture": "",
         "lud16": lightning_address,
+        "status": status,
+        "queue_depth": queue_depth,
+        "est_wait_secs": round(est_wait_secs),
     })
 
     tags: list[Tag] = [
@@ -33,14 +54,17 @@ async def publish_handler_info(
     ]
 
     for kind, service in services.items():
-        tags.append(Tag.parse(["k", str(kind)]))
+        if kind not in unavailable:
+            tags.append(Tag.parse(["k", str(kind)]))
 
     for kind, service in services.items():
+        price = (prices or {}).get(kind, service.default_cost_msats)
         tags.append(Tag.parse([
             "nip90",
             str(kind),
             service.name,
-            str(service.default_cost_msats),
+            str(price),
+            "unavailable" if kind in unavailable else "available",
         ]))
 
     builder = EventBuilder(Kind(HANDLER_INFO_KIND), metadata).tags(tags)
@@ -50,4 +74,94 @@ async def publish_handler_info(
         "handler_info_published",
         kinds=list(services.keys()),
         services=[s.name for s in services.values()],
+        status=status,
+        unavailable=sorted(unavailable),
     )
+
+
+class HandlerAdvertiser:
+    """Keeps the NIP-89 handler event in line with current prices, load and health.
+
+    Every ``check_secs`` it takes a snapshot (price per kind, which kinds'
+    Gemini models are all circuit-broken, outstanding jobs and estimated
+    wait) and republishes when the snapshot changed, or at least every
+    ``interval_secs``. The wait is compared in power-of-two buckets so
+    ordinary jitter doesn't cause a republish on every check.
+    """
+
+    def __init__(
+        self,
+        nostr: NostrClient,
+        services: dict[int, BaseDVMService],
+        lightning_address: str,
+        *,
+        load: LoadFn,
+        availability: AvailabilityFn,
+        price: PriceFn | None = None,
+        interval_secs: float = 900,
+        check_secs: float = 30,
+        busy_wait_secs: float = 120,
+    ) -> None:
+        self._nostr = nostr
+        self._services = services
+        self._lightning_address = lightning_address
+        self._load = load
+        self._availability = availability
+        self._price = price or (lambda service: service.default_cost_msats)
+        self._interval = interval_secs
+        self._check = check_secs
+        self._busy_wait = busy_wait_secs
+        self._last_key: tuple | None = None
+        self._last_published = 0.0
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("handler_info_refresh_failed")
+            await asyncio.sleep(self._check)
+
+    async def refresh(self, *, force: bool = False) -> bool:
+        """Republish if anything advertised changed or the interval elapsed."""
+        prices = {kind: self._price(s) for kind, s in self._services.items()}
+        unavailable = frozenset(
+            kind for kind, s in self._services.items() if not self._availability(s)
+        )
+        depth, wait = self._load()
+        if len(unavailable) == len(self._services):
+            status = "unavailable"
+        elif wait >= self._busy_wait:
+            status = "busy"
+        elif unavailable:
+            status = "degraded"
+        else:
+            status = "ok"
+
+        wait_bucket = 0 if wait < 1 else int(math.log2(wait)) + 1
+        key = (tuple(sorted(prices.items())), unavailable, status, wait_bucket)
+        now = time.monotonic()
+        if not force and key == self._last_key and now - self._last_published < self._interval:
+            return False
+
+        await publish_handler_info(
+            self._nostr,
+            self._services,
+            self._lightning_address,
+            prices=prices,
+            unavailable=unavailable,
+            status=status,
+            queue_depth=depth,
+            est_wait_secs=wait,
+        )
+        self._last_key = key
+        self._last_published = now
+        return True
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import re
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?。！？])\s+")
+
+
+def _split_oversized(piece: str, max_chars: int) -> list[str]:
+    """Split a single paragraph on sentence ends, hard-cutting as a last resort."""
+    parts: list[str] = []
+    current = ""
+    for sentence in _SENTENCE_RE.split(piece):
+        while len(sentence) > max_chars:
+            if current:
+                parts.append(current)
+                current = ""
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= max_chars // 2:
+                cut = max_chars
+            parts.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            parts.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_text(text: str, max_chars: int) -> list[str]:
+    """Split ``text`` into chunks of at most ``max_chars`` on semantic boundaries.
+
+    Paragraphs are packed greedily; a paragraph that is too long on its own
+    is split on sentence ends, and a sentence that is still too long is cut
+    at the last space before the limit.
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    chunks: list[str] = []
+    current = ""
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        pieces = [paragraph] if len(paragraph) <= max_chars else _split_oversized(paragraph, max_chars)
+        for piece in pieces:
+            if current and len(current) + 2 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
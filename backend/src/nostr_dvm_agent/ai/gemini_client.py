@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 import asyncio
-import base64
+import hashlib
+import math
 import re
+import time
+from collections import OrderedDict
 from functools import partial
 from typing import Any
 
@@ -11,25 +14,42 @@ import structlog
 from google import genai
 from google.genai.types import GenerateContentConfig
 
+from nostr_dvm_agent.ai.chunking import split_text
+from nostr_dvm_agent.ai.model_router import ModelRouter
+from nostr_dvm_agent.ai.tokenizer import TokenCounter
 from nostr_dvm_agent.config import Settings
+from nostr_dvm_agent.core.cpu_executor import CpuExecutor, b64encode_chunked
 
 logger = structlog.get_logger()
 
 DEFAULT_MODEL = "gemini-2.5-flash"
-IMAGE_MODEL = "gemini-2.0-flash-exp"
 MAX_RETRIES = 3
 RETRY_BACKOFF = 2.0
+CHUNK_CACHE_SIZE = 1024
+
+SUMMARY_SYSTEM = "You are an expert at creating clear, accurate summaries."
+EXTRACT_SYSTEM = "You are an expert at analyzing and extracting key information from web content."
 
 
 class GeminiClient:
     """Async wrapper around the Google GenAI SDK for Gemini inference."""
 
-    def __init__(self, settings: Settings) -> None:
+    def __init__(self, settings: Settings, cpu: CpuExecutor | None = None) -> None:
         self._settings = settings
+        self._cpu = cpu or CpuExecutor()
         self._client = genai.Client(api_key=settings.gemini_api_key)
         self._model = settings.gemini_model
+        self._image_model = settings.gemini_image_model
+        self._router = ModelRouter(settings)
+        self._tokens = TokenCounter()
+        self._chunk_cache: OrderedDict[bytes, str] = OrderedDict()
+        self._chunk_semaphore = asyncio.Semaphore(settings.summarize_concurrency)
         self._http = httpx.AsyncClient(timeout=30)
 
+    @property
+    def router(self) -> ModelRouter:
+        return self._router
+
     async def close(self) -> None:
         await self._http.aclose()
 
@@ -41,7 +61,7 @@ class GeminiClient:
         temperature: float = 0.7,
         max_tokens: int = 4096,
         model: str | None = None,
-    ) -> str:
+    ) -> Any:
         config = GenerateContentConfig(
             temperature=temperature,
             max_output_tokens=max_tokens,
@@ -54,22 +74,54 @@ class GeminiClient:
             contents=prompt,
             config=config,
         )
-        return response.text or ""
+        return response
 
-    async def _generate(self, prompt: str, **kwargs: Any) -> str:
+    async def _generate(self, prompt: str, *, task: str = "generate", **kwargs: Any) -> str:
+        """Run a generation, failing over across routed models before backing off.
+
+        A failed attempt moves on to the next candidate model immediately;
+        the exponential backoff only applies when the same model is retried.
+        """
+        models = self._router.candidates(task, len(prompt))
         last_exc: Exception | None = None
         for attempt in range(MAX_RETRIES):
+            model = models[attempt % len(models)]
+            started = time.monotonic()
             try:
                 loop = asyncio.get_running_loop()
-                return await loop.run_in_executor(
-                    None, partial(self._sync_generate, prompt, **kwargs)
+                response = await loop.run_in_executor(
+                    None, partial(self._sync_generate, prompt, model=model, **kwargs)
                 )
+                text = response.text or ""
             except Exception as exc:
+                self._router.record_failure(model)
                 last_exc = exc
                 if attempt < MAX_RETRIES - 1:
+                    next_model = models[(attempt + 1) % len(models)]
+                    if next_model != model:
+                        logger.warning(
+                            "gemini_failover",
+                            task=task,
+                            model=model,
+                            next_model=next_model,
+                            error=str(exc),
+                        )
+                        continue
                     wait = RETRY_BACKOFF ** (attempt + 1)
                     logger.warning("gemini_retry", attempt=attempt + 1, wait=wait, error=str(exc))
                     await asyncio.sleep(wait)
+            else:
+                self._router.record_success(model, time.monotonic() - started)
+                # Calibration re-tokenizes the whole prompt; keep it off the event loop.
+                # It is bookkeeping only, so a failure must not fail over a good answer.
+                try:
+                    await self._cpu.run_thread(
+                        self._observe_usage, prompt, kwargs.get("system", ""), response,
+                        size=len(prompt),
+                    )
+                except Exception:
+                    logger.exception("gemini_calibration_failed", task=task, model=model)
+                return text
         raise last_exc  # type: ignore[misc]
 
     async def generate_text(self, prompt: str, **params: Any) -> str:
@@ -77,7 +129,9 @@ class GeminiClient:
         max_tokens = int(params.get("max_tokens", 4096))
 
         logger.info("gemini_generate_text", prompt_len=len(prompt))
-        result = await self._generate(prompt, temperature=temperature, max_tokens=max_tokens)
+        result = await self._generate(
+            prompt, task="generate", temperature=temperature, max_tokens=max_tokens
+        )
         logger.info("gemini_text_result", result_len=len(result))
         return result
 
@@ -88,15 +142,102 @@ class GeminiClient:
             prompt = f"Translate the following text from {source_language} to {target_language}:\n\n{text}"
 
         logger.info("gemini_translate", target=target_language, text_len=len(text))
-        return await self._generate(prompt, system=system, temperature=0.3)
+        return await self._generate(prompt, task="translate", system=system, temperature=0.3)
 
     async def summarize(self, text: str, **params: Any) -> str:
         max_length = params.get("max_length", "concise")
-        system = "You are an expert at creating clear, accurate summaries."
-        prompt = f"Provide a {max_length} summary of the following text:\n\n{text}"
-
         logger.info("gemini_summarize", text_len=len(text))
-        return await self._generate(prompt, system=system, temperature=0.3)
+        self.check_summarizable(len(text))
+
+        limit = self._settings.summarize_chunk_chars
+        if len(text) <= limit:
+            prompt = f"Provide a {max_length} summary of the following text:\n\n{text}"
+            return await self._generate(prompt, task="summarize", system=SUMMARY_SYSTEM, temperature=0.3)
+
+        notes = await self._condense(
+            text,
+            limit,
+            kind="summary",
+            instruction=(
+                "Summarize this section of a longer document. "
+                "Keep key facts, names and figures:"
+            ),
+            system=SUMMARY_SYSTEM,
+        )
+        prompt = (
+            f"The following are summaries of consecutive sections of one document. "
+            f"Merge them into a single {max_length} summary of the whole document:\n\n{notes}"
+        )
+        return await self._generate(prompt, task="summarize", system=SUMMARY_SYSTEM, temperature=0.3)
+
+    async def _map_chunk(self, chunk: str, *, kind: str, instruction: str, system: str) -> str:
+        key = hashlib.sha256(f"{kind}\0{chunk}".encode()).digest()
+        cached = self._chunk_cache.get(key)
+        if cached is not None:
+            self._chunk_cache.move_to_end(key)
+            return cached
+
+        async with self._chunk_semaphore:
+            result = await self._generate(
+                f"{instruction}\n\n{chunk}", task="map_chunk", system=system, temperature=0.3
+            )
+
+        self._chunk_cache[key] = result
+        if len(self._chunk_cache) > CHUNK_CACHE_SIZE:
+            self._chunk_cache.popitem(last=False)
+        return result
+
+    async def _condense(
+        self,
+        text: str,
+        limit: int,
+        *,
+        kind: str,
+        instruction: str,
+        system: str,
+    ) -> str:
+        """Map ``instruction`` over chunks of ``text`` until the notes fit in ``limit`` chars.
+
+        Chunks run concurrently under a client-wide semaphore so one large
+        document cannot take all of our Gemini quota, and per-chunk results
+        are cached so a re-submitted document only pays for changed chunks.
+        Callers keep ``text`` within ``max_condense_chars``; notes that stop
+        shrinking are cut to ``limit``.
+        """
+        chunk_chars = self._settings.summarize_chunk_chars
+        while len(text) > limit:
+            chunks = split_text(text, chunk_chars)
+            logger.info("gemini_map_chunks", kind=kind, chunks=len(chunks), text_len=len(text))
+            partials = await asyncio.gather(*(
+                self._map_chunk(c, kind=kind, instruction=instruction, system=system)
+                for c in chunks
+            ))
+            condensed = "\n\n".join(partials)
+            if len(condensed) >= len(text):
+                logger.warning("gemini_condense_stalled", kind=kind, text_len=len(text), limit=limit)
+                return text[:limit]
+            text = condensed
+        return text
+
+    @property
+    def max_condense_chars(self) -> int:
+        """Longest input condensed chunk-by-chunk: ``summarize_max_chunks`` chunks."""
+        return self._settings.summarize_chunk_chars * self._settings.summarize_max_chunks
+
+    def check_summarizable(self, text_len: int) -> None:
+        """Raise ValueError for input longer than ``summarize`` reads in full."""
+        if text_len > self.max_condense_chars:
+            raise ValueError(
+                f"Input too long to summarize: {text_len} characters, "
+                f"at most {self.max_condense_chars} are accepted."
+            )
+
+    def summary_chunks(self, text_len: int) -> int:
+        """Chunks ``summarize`` maps a text of this length to (1 if it fits one call)."""
+        chunk_chars = self._settings.summarize_chunk_chars
+        if text_len <= chunk_chars:
+            return 1
+        return min(math.ceil(text_len / chunk_chars), self._settings.summarize_max_chunks)
 
     async def generate_image(self, prompt: str, **params: Any) -> str:
         """Generate an image using Gemini's native image generation.
@@ -113,21 +254,25 @@ class GeminiClient:
                 temperature=0.8,
             )
             loop = asyncio.get_running_loop()
+            started = time.monotonic()
             response = await loop.run_in_executor(
                 None,
                 partial(
                     self._client.models.generate_content,
-                    model=IMAGE_MODEL,
+                    model=self._image_model,
                     contents=f"Generate an image: {prompt}",
                     config=config,
                 ),
             )
+            self._router.record_success(self._image_model, time.monotonic() - started)
 
             for part in response.candidates[0].content.parts:
                 if hasattr(part, "inline_data") and part.inline_data:
                     img_bytes = part.inline_data.data
                     mime = part.inline_data.mime_type or "image/png"
-                    b64 = base64.b64encode(img_bytes).decode()
+                    b64 = await self._cpu.run_thread(
+                        b64encode_chunked, img_bytes, size=len(img_bytes)
+                    )
                     data_url = f"data:{mime};base64,{b64}"
                     logger.info("gemini_image_generated", mime=mime, size=len(img_bytes))
                     return data_url
@@ -136,11 +281,13 @@ class GeminiClient:
                 return response.text
 
         except Exception:
+            self._router.record_failure(self._image_model)
             logger.warning("gemini_image_gen_fallback", reason="model may not support image output")
 
         system = "You are a creative visual artist. Create a vivid, detailed visual description."
         result = await self._generate(
             f"Create a detailed visual description for: {prompt}",
+            task="image",
             system=system,
             temperature=0.8,
         )
@@ -155,16 +302,54 @@ class GeminiClient:
         if not content:
             content = f"[URL: {url} - content was not available for extraction]"
 
-        system = "You are an expert at analyzing and extracting key information from web content."
+        logger.info("gemini_extract", url=url, content_len=len(content))
+
+        # Pages are only seen once fetched, after the quote, so an oversized
+        # one is cut and the result says how much of it was read.
+        note = ""
+        if len(content) > self.max_condense_chars:
+            logger.warning(
+                "gemini_input_truncated", kind="extract",
+                text_len=len(content), kept=self.max_condense_chars,
+            )
+            note = (
+                f"\n\n[Only the first {self.max_condense_chars} of "
+                f"{len(content)} characters of this page were read.]"
+            )
+            content = content[: self.max_condense_chars]
+
+        max_chars = self._settings.extract_max_chars
+        if len(content) > max_chars:
+            content = await self._condense(
+                content,
+                max_chars,
+                kind="extract",
+                instruction=(
+                    f"Extract the key information from this section of the web page at {url}. "
+                    f"Keep facts, figures, names and links:"
+                ),
+                system=EXTRACT_SYSTEM,
+            )
+
         prompt = (
             f"Analyze and extract the key information from the following web page content.\n"
             f"Source URL: {url}\n\n"
-            f"Content:\n{content[:50000]}"
+            f"Content:\n{content}"
         )
+        result = await self._generate(prompt, task="extract", system=EXTRACT_SYSTEM, temperature=0.2)
+        return result + note
 
-        logger.info("gemini_extract", url=url, content_len=len(content))
-        return await self._generate(prompt, system=system, temperature=0.2)
+    def _observe_usage(self, prompt: str, system: str, response: Any) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None) if usage else None
+        if isinstance(prompt_tokens, int):
+            self._tokens.observe(f"{system}\n{prompt}" if system else prompt, prompt_tokens)
 
     def estimate_tokens(self, text: str) -> int:
-        """Rough token count estimate (1 token ~ 4 chars for English)."""
-        return len(text) // 4
+        """Token count from the calibrated local tokenizer (memoized by input hash)."""
+        return self._tokens.count(text)
+
+    def estimate_job_tokens(self, text: str, params: dict[str, Any], task: str = "generate") -> int:
+        """Input plus expected output tokens for a job, used for pricing."""
+        input_tokens = self._tokens.count(text)
+        return input_tokens + self._tokens.estimate_output(task, input_tokens, params)
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import structlog
+
+from nostr_dvm_agent.config import Settings
+
+logger = structlog.get_logger()
+
+LATENCY_ALPHA = 0.2
+ERROR_ALPHA = 0.3
+TRIP_ERROR_RATE = 0.5
+TRIP_MIN_CALLS = 3
+COOLDOWN_SECS = 60.0
+RATE_WINDOW_SECS = 60.0
+
+FAST_TASKS = frozenset({"translate"})
+LONG_TASKS = frozenset({"summarize", "extract", "map_chunk"})
+
+
+@dataclass
+class ModelStats:
+    """Rolling latency and error-rate figures for a single model."""
+
+    latency_ewma: float | None = None
+    error_rate: float = 0.0
+    calls: int = 0
+    failures: int = 0
+    open_until: float = 0.0
+    recent_calls: deque[float] = field(default_factory=deque)
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.open_until
+
+    def note_call(self, now: float) -> None:
+        self.calls += 1
+        self.recent_calls.append(now)
+        self.calls_in_window(now)
+
+    def calls_in_window(self, now: float) -> int:
+        while self.recent_calls and now - self.recent_calls[0] > RATE_WINDOW_SECS:
+            self.recent_calls.popleft()
+        return len(self.recent_calls)
+
+    def score(self) -> float:
+        """Expected cost of a call: slower and flakier models score higher."""
+        latency = self.latency_ewma if self.latency_ewma is not None else 1.0
+        return latency * (1.0 + 4.0 * self.error_rate)
+
+
+class ModelRouter:
+    """Picks a Gemini model per task and input size, failing over on errors.
+
+    Short translations go to the fast model, long summaries and extractions
+    (and the chunks they are condensed from) to the long-context model, everything else to ``gemini_model``. Each
+    model carries a simple circuit breaker: once its error rate crosses
+    ``TRIP_ERROR_RATE`` it is skipped for ``COOLDOWN_SECS`` unless no
+    healthy model remains.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self._default = settings.gemini_model
+        self._fast = settings.gemini_fast_model or settings.gemini_model
+        self._long = settings.gemini_long_model or settings.gemini_model
+        self._fallbacks = settings.gemini_fallback_model_list
+        self._short_chars = settings.route_short_input_chars
+        self._long_chars = settings.route_long_input_chars
+        self._stats: dict[str, ModelStats] = {}
+
+    def stats(self, model: str) -> ModelStats:
+        if model not in self._stats:
+            self._stats[model] = ModelStats()
+        return self._stats[model]
+
+    def preferred_model(self, task: str, input_len: int) -> str:
+        if task in FAST_TASKS and input_len <= self._short_chars:
+            return self._fast
+        if task in LONG_TASKS and input_len >= self._long_chars:
+            return self._long
+        return self._default
+
+    def candidates(self, task: str, input_len: int) -> list[str]:
+        """Return models to try in order, best first."""
+        primary = self.preferred_model(task, input_len)
+        ordered: list[str] = []
+        for model in [primary, self._default, *self._fallbacks]:
+            if model and model not in ordered:
+                ordered.append(model)
+
+        now = time.monotonic()
+        healthy = [m for m in ordered if self.stats(m).is_available(now)]
+        tripped = [m for m in ordered if m not in healthy]
+
+        if healthy and healthy[0] == primary:
+            rest = sorted(healthy[1:], key=lambda m: self.stats(m).score())
+            healthy = [primary, *rest]
+        else:
+            healthy.sort(key=lambda m: self.stats(m).score())
+
+        return healthy + tripped
+
+    def is_available(self, model: str) -> bool:
+        return self.stats(model).is_available(time.monotonic())
+
+    def task_available(self, task: str) -> bool:
+        """True unless every model that could serve ``task`` is tripped."""
+        now = time.monotonic()
+        return any(self.stats(m).is_available(now) for m in self.candidates(task, 0))
+
+    def calls_per_minute(self, model: str) -> int:
+        return self.stats(model).calls_in_window(time.monotonic())
+
+    def record_success(self, model: str, latency_secs: float) -> None:
+        s = self.stats(model)
+        s.note_call(time.monotonic())
+        if s.latency_ewma is None:
+            s.latency_ewma = latency_secs
+        else:
+            s.latency_ewma += LATENCY_ALPHA * (latency_secs - s.latency_ewma)
+        s.error_rate *= 1.0 - ERROR_ALPHA
+        s.open_until = 0.0
+
+    def record_failure(self, model: str) -> None:
+        s = self.stats(model)
+        s.note_call(time.monotonic())
+        s.failures += 1
+        s.error_rate += ERROR_ALPHA * (1.0 - s.error_rate)
+        if s.calls >= TRIP_MIN_CALLS and s.error_rate >= TRIP_ERROR_RATE:
+            s.open_until = time.monotonic() + COOLDOWN_SECS
+            logger.warning("gemini_model_tripped", model=model, error_rate=round(s.error_rate, 2))
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import difflib
+import hashlib
+import itertools
+import json
+import re
+import struct
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+import structlog
+
+logger = structlog.get_logger()
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_CHARS = 3
+MAX_PROMPT_CHARS = 4000
+
+# Params that steer billing or caching rather than the answer itself.
+CONTROL_PARAMS = frozenset({"cache", "credit"})
+ALLOW_VALUES = frozenset({"allow", "true", "yes", "1"})
+
+# Near-duplicates may differ only by these words and by single-word typos.
+FILLER_WORDS = frozenset({"a", "an", "the", "please", "pls", "kindly", "just", "hi", "hey"})
+NEGATION_WORDS = frozenset({"no", "not", "never", "none", "nor", "without", "cannot"})
+TYPO_MIN_RATIO = 0.85
+
+_TRAILING_PUNCT_RE = re.compile(r"[\s.?!]+$")
+_TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)*|[^\W\d_]+|\S", re.UNICODE)
+_SIGNATURE = struct.Struct(f"<{NUM_PERM}I")
+
+
+def canonicalize(text: str) -> str:
+    """NFKC, casefolded, whitespace collapsed, trailing ``.?!`` dropped.
+
+    Other punctuation is kept: in ``2+2`` versus ``2*2`` it is the question.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _TRAILING_PUNCT_RE.sub("", " ".join(text.split()))
+
+
+def _tokens(canonical: str) -> list[str]:
+    return _TOKEN_RE.findall(canonical)
+
+
+def _is_fixed(token: str) -> bool:
+    """Tokens that change the meaning of a prompt: numbers, symbols, negations."""
+    return not token.isalpha() or token in NEGATION_WORDS
+
+
+def _is_typo(a: str, b: str) -> bool:
+    # Same first letter rules out prefixes such as "happy" / "unhappy".
+    return (
+        a[0] == b[0]
+        and difflib.SequenceMatcher(None, a, b, autojunk=False).ratio() >= TYPO_MIN_RATIO
+    )
+
+
+def equivalent(a: str, b: str) -> bool:
+    """Whether two canonical prompts differ only by filler words and typos.
+
+    Numbers, operators, punctuation and negations must match exactly and in
+    order; other words may only be misspelled, not replaced.
+    """
+    ta, tb = _tokens(a), _tokens(b)
+    if [t for t in ta if _is_fixed(t)] != [t for t in tb if _is_fixed(t)]:
+        return False
+    matcher = difflib.SequenceMatcher(None, ta, tb, autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        removed, added = ta[i1:i2], tb[j1:j2]
+        if op == "equal" or all(t in FILLER_WORDS for t in removed + added):
+            continue
+        if op == "replace" and len(removed) == len(added) and all(
+            _is_typo(x, y) for x, y in zip(removed, added)
+        ):
+            continue
+        return False
+    return True
+
+
+def minhash(canonical: str) -> tuple[int, ...]:
+    """MinHash signature over character shingles of canonical text.
+
+    Each shingle is hashed once with SHAKE-128 into ``NUM_PERM`` 32-bit
+    values, one per hash function, and the signature is their column-wise
+    minimum, so the per-shingle work stays in C.
+    """
+    padded = f" {canonical} "
+    shingles = {
+        padded[i:i + SHINGLE_CHARS] for i in range(max(1, len(padded) - SHINGLE_CHARS + 1))
+    }
+    rows = (
+        _SIGNATURE.unpack(hashlib.shake_128(s.encode()).digest(_SIGNATURE.size))
+        for s in shingles
+    )
+    return tuple(map(min, zip(*rows)))
+
+
+def answer_scope(kind: int, job_data: dict[str, Any]) -> str:
+    """Cache partition for a job: answers are only shared between equal settings."""
+    params = {k: v for k, v in job_data.get("params", {}).items() if k not in CONTROL_PARAMS}
+    topics = sorted(t.lower() for t in job_data.get("topics", []))
+    return json.dumps([kind, sorted(params.items()), topics])
+
+
+def cache_allowed(job_data: dict[str, Any]) -> bool:
+    return str(job_data.get("params", {}).get("cache", "")).lower() in ALLOW_VALUES
+
+
+@dataclass
+class _Entry:
+    scope: str
+    canonical: str
+    signature: tuple[int, ...]
+    answer: str
+    stored_at: float
+
+
+class SemanticCache:
+    """Recent answers looked up by near-duplicate prompt.
+
+    Prompts are canonicalised; an exact canonical match is a dict hit.
+    Otherwise MinHash signatures are banded for locality-sensitive hashing
+    (``BANDS`` bands of ``ROWS`` values, so pairs above roughly 0.5 Jaccard
+    similarity usually share a bucket). A candidate whose estimated
+    similarity reaches ``threshold`` is only served if ``equivalent`` also
+    holds for the two texts, since shingle overlap alone can't tell "I am
+    happy" from "I am unhappy". Entries are scoped by ``answer_scope``,
+    bounded LRU, and dropped after ``ttl_secs``.
+    """
+
+    def __init__(
+        self, *, max_entries: int = 2048, ttl_secs: float = 3600, threshold: float = 0.8
+    ) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl_secs
+        self._threshold = threshold
+        self._ids = itertools.count()
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._exact: dict[tuple[str, str], int] = {}
+        self._buckets: dict[tuple[str, int, tuple[int, ...]], set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _bands(signature: tuple[int, ...]) -> list[tuple[int, tuple[int, ...]]]:
+        return [(b, signature[b * ROWS:(b + 1) * ROWS]) for b in range(BANDS)]
+
+    def lookup(self, scope: str, prompt: str) -> str | None:
+        if len(prompt) > MAX_PROMPT_CHARS:
+            return None
+        now = time.monotonic()
+        canonical = canonicalize(prompt)
+        entry_id = self._exact.get((scope, canonical))
+        if entry_id is None:
+            signature = minhash(canonical)
+            candidates: set[int] = set()
+            for band, values in self._bands(signature):
+                candidates |= self._buckets.get((scope, band, values), set())
+            best = 0.0
+            for candidate in candidates:
+                other = self._entries[candidate]
+                similarity = sum(a == b for a, b in zip(signature, other.signature)) / NUM_PERM
+                if (
+                    similarity >= self._threshold
+                    and similarity > best
+                    and equivalent(canonical, other.canonical)
+                ):
+                    best, entry_id = similarity, candidate
+        if entry_id is None:
+            return None
+
+        entry = self._entries[entry_id]
+        if now - entry.stored_at > self._ttl:
+            self._remove(entry_id)
+            return None
+        self._entries.move_to_end(entry_id)
+        return entry.answer
+
+    def store(self, scope: str, prompt: str, answer: str) -> None:
+        if len(prompt) > MAX_PROMPT_CHARS or not answer:
+            return
+        canonical = canonicalize(prompt)
+        previous = self._exact.get((scope, canonical))
+        if previous is not None:
+            self._remove(previous)
+
+        entry_id = next(self._ids)
+        entry = _Entry(scope, canonical, minhash(canonical), answer, time.monotonic())
+        self._entries[entry_id] = entry
+        self._exact[(scope, canonical)] = entry_id
+        for band, values in self._bands(entry.signature):
+            self._buckets.setdefault((scope, band, values), set()).add(entry_id)
+
+        while len(self._entries) > self._max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        if self._exact.get((entry.scope, entry.canonical)) == entry_id:
+            del self._exact[(entry.scope, entry.canonical)]
+        for band, values in self._bands(entry.signature):
+            key = (entry.scope, band, values)
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import math
+from typing import Callable
+
+import structlog
+
+logger = structlog.get_logger()
+
+CountFn = Callable[[], int]
+
+
+class AdmissionController:
+    """Decides whether a new job request may be quoted at all.
+
+    In-flight work is paid jobs outstanding plus unpaid invoices we have
+    issued (any of which may be paid and start running). A request is
+    refused when in-flight work reaches ``max_in_flight``, or when a new
+    job, queued behind the paid ones at ``capacity`` at a time, would not
+    finish within ``max_wait_secs`` at the observed turnaround. A limit of
+    0 disables that check.
+    """
+
+    def __init__(
+        self,
+        *,
+        outstanding: CountFn,
+        awaiting_payment: CountFn,
+        turnaround: Callable[[], float | None],
+        capacity: int,
+        max_in_flight: int,
+        max_wait_secs: float,
+    ) -> None:
+        self._outstanding = outstanding
+        self._awaiting_payment = awaiting_payment
+        self._turnaround = turnaround
+        self._capacity = max(1, capacity)
+        self._max_in_flight = max_in_flight
+        self._max_wait = max_wait_secs
+
+    def estimated_completion_secs(self) -> float:
+        """Seconds until a job admitted now would finish, 0 before any job has finished."""
+        turnaround = self._turnaround() or 0.0
+        ahead = self._outstanding()
+        return turnaround * (math.floor(ahead / self._capacity) + 1)
+
+    def refusal(self) -> str | None:
+        """Why a new request can't be admitted right now, or None to admit it."""
+        in_flight = self._outstanding() + self._awaiting_payment()
+        if self._max_in_flight and in_flight >= self._max_in_flight:
+            logger.warning("admission_refused", reason="in_flight", in_flight=in_flight)
+            return "Service busy, retry later."
+
+        completion = self.estimated_completion_secs()
+        if self._max_wait and completion > self._max_wait:
+            logger.warning("admission_refused", reason="wait", est_completion_secs=round(completion))
+            return f"Service busy (estimated completion {round(completion)}s), retry later."
+        return None
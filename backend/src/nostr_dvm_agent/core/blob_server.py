@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import mmap
+
+import structlog
+
+from nostr_dvm_agent.db.blobs import DIGEST_RE, BlobStore
+
+logger = structlog.get_logger()
+
+WRITE_CHUNK = 256 * 1024
+REQUEST_TIMEOUT_SECS = 10
+
+
+class BlobServer:
+    """Minimal HTTP/1.1 endpoint serving ``GET /blobs/<sha256>`` from a BlobStore.
+
+    Blobs are immutable, so responses carry a year-long immutable cache
+    header and the digest as ETag; anything other than GET/HEAD on a known
+    digest gets a 404/405. Each connection serves a single request.
+    """
+
+    def __init__(self, blobs: BlobStore, host: str, port: int) -> None:
+        self._blobs = blobs
+        self._host = host
+        self._port = port
+        self._server: asyncio.base_events.Server | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self._host, self._port)
+        logger.info("blob_server_started", host=self._host, port=self._port)
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT_SECS)
+            while True:
+                header = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT_SECS)
+                if header in (b"\r\n", b"\n", b""):
+                    break
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2:
+                await self._respond(writer, 400, "Bad Request")
+                return
+            method, target = parts[0], parts[1]
+            if method not in ("GET", "HEAD"):
+                await self._respond(writer, 405, "Method Not Allowed")
+                return
+
+            digest = target.split("?", 1)[0].rsplit("/", 1)[-1]
+            if not target.startswith("/blobs/") or not DIGEST_RE.match(digest):
+                await self._respond(writer, 404, "Not Found")
+                return
+
+            data = self._blobs.read(digest)
+            if data is None:
+                await self._respond(writer, 404, "Not Found")
+                return
+            try:
+                await self._send_blob(
+                    writer, digest, data, self._blobs.mime(digest), head_only=method == "HEAD"
+                )
+            finally:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception:
+            logger.exception("blob_server_error")
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, reason: str) -> None:
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+    async def _send_blob(
+        self,
+        writer: asyncio.StreamWriter,
+        digest: str,
+        data: bytes | mmap.mmap,
+        mime: str,
+        *,
+        head_only: bool,
+    ) -> None:
+        view = memoryview(data)
+        try:
+            headers = (
+                "HTTP/1.1 200 OK\r\n"
+                f"Content-Type: {mime}\r\n"
+                f"Content-Length: {len(view)}\r\n"
+                f'ETag: "{digest}"\r\n'
+                "Cache-Control: public, max-age=31536000, immutable\r\n"
+                "Access-Control-Allow-Origin: *\r\n"
+                "Connection: close\r\n\r\n"
+            )
+            writer.write(headers.encode())
+            if not head_only:
+                # Copy chunk-by-chunk so the transport never holds a view into the mmap.
+                for offset in range(0, len(view), WRITE_CHUNK):
+                    writer.write(bytes(view[offset:offset + WRITE_CHUNK]))
+                    await writer.drain()
+            await writer.drain()
+        finally:
+            view.release()
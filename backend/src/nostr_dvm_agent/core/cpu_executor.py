@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+import structlog
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+# Multiple of 3 so chunk encodings concatenate without padding in between.
+B64_CHUNK_BYTES = 3 * 128 * 1024
+
+
+def b64encode_chunked(data: bytes) -> str:
+    """Base64-encode ``data`` in slices so a thread running it yields the GIL between them."""
+    view = memoryview(data)
+    return "".join(
+        base64.b64encode(view[i:i + B64_CHUNK_BYTES]).decode()
+        for i in range(0, len(view), B64_CHUNK_BYTES)
+    )
+
+
+class CpuExecutor:
+    """Runs CPU-heavy calls off the event loop once their input is big enough.
+
+    FFI calls into nostr-sdk (NIP-44, Schnorr verification) release the GIL
+    and go to a thread pool. Pure-Python work such as regex passes over a
+    large page holds the GIL, so it goes to a process pool and its callable
+    must be a picklable module-level function. Inputs below the size
+    thresholds run inline, where the pool hop would cost more than the call;
+    ``size=None`` always offloads. Pools are created on first use.
+    """
+
+    def __init__(
+        self,
+        *,
+        thread_workers: int = 4,
+        process_workers: int = 2,
+        thread_min_bytes: int = 16384,
+        process_min_bytes: int = 262144,
+    ) -> None:
+        self._thread_workers = thread_workers
+        self._process_workers = process_workers
+        self._thread_min = thread_min_bytes
+        self._process_min = process_min_bytes
+        self._threads: ThreadPoolExecutor | None = None
+        self._processes: ProcessPoolExecutor | None = None
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(
+                max_workers=self._thread_workers, thread_name_prefix="cpu"
+            )
+        return self._threads
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        if self._processes is None:
+            # spawn: forking a process that already runs aiosqlite/FFI threads is unsafe.
+            self._processes = ProcessPoolExecutor(
+                max_workers=self._process_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._processes
+
+    async def run_thread(
+        self, fn: Callable[..., T], *args: Any, size: int | None = None, **kwargs: Any
+    ) -> T:
+        if size is not None and size < self._thread_min:
+            return fn(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._thread_pool(), partial(fn, *args, **kwargs))
+
+    async def run_process(self, fn: Callable[..., T], *args: Any, size: int | None = None) -> T:
+        if size is not None and size < self._process_min:
+            return fn(*args)
+        if self._process_workers <= 0:
+            return await self.run_thread(fn, *args)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._process_pool(), partial(fn, *args))
+        except BrokenProcessPool:
+            # A worker died (OOM kill, signal); rebuild the pool next time.
+            logger.warning("cpu_process_pool_broken", fn=getattr(fn, "__name__", repr(fn)))
+            self._processes = None
+            return await self.run_thread(fn, *args)
+
+    def shutdown(self) -> None:
+        if self._threads:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes:
+            self._processes.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import mmap
+from collections import OrderedDict
+from typing import Any
+
+import structlog
+from nostr_sdk import PublicKey
+
+from nostr_dvm_agent.core.cpu_executor import CpuExecutor
+from nostr_dvm_agent.core.nostr_client import NostrClient
+from nostr_dvm_agent.core.result_chunks import join_chunks, result_mime, unpack_chunks
+from nostr_dvm_agent.db.blobs import BlobStore, blob_digest
+from nostr_dvm_agent.db.payload import decode_payload
+from nostr_dvm_agent.db.base import BaseStore, JobState
+from nostr_dvm_agent.security.encryption import decrypt_content
+from nostr_dvm_agent.security.nip44 import ConversationKeyCache
+
+logger = structlog.get_logger()
+
+CHAINED_INPUT_TYPES = frozenset({"job", "event"})
+EVENT_CACHE_SIZE = 512
+# Upstream hops followed when checking a chain for cycles.
+MAX_CHAIN_DEPTH = 8
+
+_FAILED_STATES = frozenset({
+    JobState.FAILED.value,
+    JobState.EXPIRED.value,
+    JobState.CANCELLED.value,
+})
+
+
+def has_chained_inputs(job_data: dict[str, Any]) -> bool:
+    """True if any input must be resolved from another job or event."""
+    return any(inp.get("type") in CHAINED_INPUT_TYPES for inp in job_data.get("inputs", []))
+
+
+def _read_blob_result(blobs: BlobStore, digest: str) -> str | None:
+    """A blob as the result it replaced: text for text mimes, else a data URL."""
+    data = blobs.read(digest)
+    if data is None:
+        return None
+    try:
+        raw = bytes(data)
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+    mime = blobs.mime(digest)
+    if result_mime(mime) == mime:
+        return raw.decode()
+    return f"data:{mime};base64,{base64.b64encode(raw).decode()}"
+
+
+class InputResolver:
+    """Resolves NIP-90 ``job`` and ``event`` inputs into text inputs.
+
+    ``job`` inputs are looked up in our own jobs table first, waiting for
+    the upstream job to finish if it is still pending, and only fall back
+    to fetching a published result from relays for jobs we never saw.
+    ``event`` inputs are fetched from relays once and cached by id, since
+    events are immutable. Results we stored as encrypted chunks or moved to
+    the blob store are read back in full.
+    """
+
+    def __init__(
+        self,
+        store: BaseStore,
+        nostr: NostrClient,
+        wait_timeout_secs: float,
+        cpu: CpuExecutor | None = None,
+        nip44: ConversationKeyCache | None = None,
+        blobs: BlobStore | None = None,
+        blob_public_url: str = "",
+    ) -> None:
+        self._store = store
+        self._blobs = blobs
+        self._blob_public_url = blob_public_url
+        self._cpu = cpu or CpuExecutor()
+        self._nip44 = nip44
+        self._nostr = nostr
+        self._wait_timeout = wait_timeout_secs
+        self._waiters: dict[str, list[asyncio.Future[None]]] = {}
+        self._event_cache: OrderedDict[str, str] = OrderedDict()
+
+    def notify_finished(self, event_id: str) -> None:
+        """Wake any jobs waiting on ``event_id`` after it reaches a terminal state."""
+        for fut in self._waiters.pop(event_id, []):
+            if not fut.done():
+                fut.set_result(None)
+
+    async def resolve(self, job_data: dict[str, Any]) -> dict[str, Any]:
+        """Return a copy of ``job_data`` with chained inputs replaced by text."""
+        resolved = await self._resolve(job_data, wait=True)
+        assert resolved is not None
+        return resolved
+
+    async def preview(self, job_data: dict[str, Any]) -> dict[str, Any] | None:
+        """Resolve inputs for quoting without waiting; None while an upstream job runs.
+
+        Raises ValueError for inputs that can never resolve, so the request
+        is refused before it is invoiced.
+        """
+        return await self._resolve(job_data, wait=False)
+
+    async def _resolve(self, job_data: dict[str, Any], *, wait: bool) -> dict[str, Any] | None:
+        customer = job_data.get("pubkey", "")
+        resolved: list[dict[str, str]] = []
+        for inp in job_data.get("inputs", []):
+            input_type = inp.get("type", "text")
+            if input_type == "job":
+                await self._check_chain(job_data.get("event_id", ""), inp["value"])
+                text = await self._resolve_job(inp["value"], customer, wait=wait)
+                if text is None:
+                    return None
+            elif input_type == "event":
+                text = await self._resolve_event(inp["value"])
+            else:
+                resolved.append(inp)
+                continue
+            resolved.append({"value": text, "type": "text", "source": input_type})
+
+        return {**job_data, "inputs": resolved}
+
+    async def _check_chain(self, event_id: str, upstream: str) -> None:
+        """Fail fast on a job that takes its own result as input, directly or not."""
+        frontier, seen = [upstream], set()
+        for _ in range(MAX_CHAIN_DEPTH):
+            if event_id in frontier:
+                raise ValueError(f"Job input chain of {event_id[:8]} refers back to itself")
+            parents: list[str] = []
+            for job_id in frontier:
+                if job_id in seen:
+                    continue
+                seen.add(job_id)
+                payload = await self._store.get_payload(job_id)
+                if payload:
+                    parents.extend(
+                        inp["value"] for inp in payload["inputs"] if inp.get("type") == "job"
+                    )
+            if not parents:
+                return
+            frontier = parents
+        raise ValueError(f"Job input chain of {event_id[:8]} is deeper than {MAX_CHAIN_DEPTH}")
+
+    async def _resolve_job(self, event_id: str, customer: str, *, wait: bool) -> str | None:
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future[None] = loop.create_future()
+        self._waiters.setdefault(event_id, []).append(fut)
+        try:
+            job = await self._store.get_job(event_id)
+            if job is None:
+                return await self._fetch_remote_result(event_id)
+
+            if job["state"] not in _FAILED_STATES and job["state"] != JobState.COMPLETED.value:
+                if not wait:
+                    return None
+                logger.info("chain_waiting_on_job", upstream=event_id)
+                try:
+                    await asyncio.wait_for(fut, timeout=self._wait_timeout)
+                except asyncio.TimeoutError:
+                    raise ValueError(f"Timed out waiting for job input {event_id[:8]}")
+                job = await self._store.get_job(event_id)
+                if job is None:
+                    raise ValueError(f"Job input {event_id[:8]} disappeared")
+        finally:
+            waiters = self._waiters.get(event_id)
+            if waiters and fut in waiters:
+                waiters.remove(fut)
+                if not waiters:
+                    del self._waiters[event_id]
+
+        if job["state"] != JobState.COMPLETED.value:
+            raise ValueError(f"Job input {event_id[:8]} ended in state {job['state']}")
+
+        return await self._plaintext_result(job, customer)
+
+    async def _plaintext_result(self, job: dict[str, Any], customer: str) -> str:
+        result = job.get("result") or ""
+        input_data = decode_payload(
+            job.get("input_data"),
+            event_id=job["event_id"],
+            pubkey=job["customer_pubkey"],
+            kind=job["kind"],
+        )
+        if not input_data["encrypted"]:
+            return await self._dereference_blob(result)
+
+        if job["customer_pubkey"] != customer:
+            raise ValueError("Encrypted job inputs can only be chained by their owner")
+        packed = unpack_chunks(result)
+        if packed is None:
+            return await self._dereference_blob(await self._decrypt(customer, result))
+        pieces, compressed = packed
+        plain = [await self._decrypt(customer, piece) for piece in pieces]
+        return await self._cpu.run_thread(
+            join_chunks, plain, compressed=compressed, size=len(result)
+        )
+
+    async def _decrypt(self, customer: str, payload: str) -> str:
+        plaintext = await self._cpu.run_thread(
+            decrypt_content, self._nostr.keys, PublicKey.parse(customer), payload, self._nip44,
+            size=len(payload),
+        )
+        if plaintext is None:
+            raise ValueError("Could not decrypt chained job result")
+        return plaintext
+
+    async def _dereference_blob(self, result: str) -> str:
+        """The full result behind one of our blob URLs; any other result unchanged."""
+        digest = blob_digest(result, self._blob_public_url) if self._blobs else None
+        if digest is None:
+            return result
+        content = await self._cpu.run_thread(_read_blob_result, self._blobs, digest)
+        if content is None:
+            raise ValueError(f"Blob {digest[:8]} of chained job result is missing")
+        return content
+
+    async def _fetch_remote_result(self, event_id: str) -> str:
+        cached = self._cached_event(f"result:{event_id}")
+        if cached is not None:
+            return cached
+        request = await self._nostr.fetch_event(event_id)
+        if request is None:
+            raise ValueError(f"Job input {event_id[:8]} not found on relays")
+        # Anyone can publish a 6xxx event tagging the request, so only the
+        # providers it targeted (and us) are trusted to have answered it.
+        authors = {self._nostr.public_key.to_hex()}
+        for tag in request.tags().to_vec():
+            tag_vec = tag.as_vec()
+            if len(tag_vec) >= 2 and tag_vec[0] == "p":
+                authors.add(tag_vec[1])
+        event = await self._nostr.fetch_job_result(event_id, sorted(authors))
+        if event is None or event.author().to_hex() not in authors:
+            raise ValueError(f"No result found for job input {event_id[:8]}")
+        return self._cache_event(f"result:{event_id}", event.content())
+
+    async def _resolve_event(self, event_id: str) -> str:
+        cached = self._cached_event(event_id)
+        if cached is not None:
+            return cached
+        event = await self._nostr.fetch_event(event_id)
+        if event is None:
+            raise ValueError(f"Event input {event_id[:8]} not found on relays")
+        return self._cache_event(event_id, event.content())
+
+    def _cached_event(self, key: str) -> str | None:
+        content = self._event_cache.get(key)
+        if content is not None:
+            self._event_cache.move_to_end(key)
+        return content
+
+    def _cache_event(self, key: str, content: str) -> str:
+        self._event_cache[key] = content
+        if len(self._event_cache) > EVENT_CACHE_SIZE:
+            self._event_cache.popitem(last=False)
+        return content
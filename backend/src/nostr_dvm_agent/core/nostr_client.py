@@ -1,6 +1,9 @@
 from __future__ import annotations
 
 import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from typing import Callable, Awaitable
 
 import structlog
@@ -8,6 +11,7 @@ from nostr_sdk import (
     Client,
     Event,
     EventBuilder,
+    EventId,
     Filter,
     HandleNotification,
     Keys,
@@ -26,10 +30,25 @@ logger = structlog.get_logger()
 
 DVM_REQUEST_KINDS = [5000, 5001, 5002, 5100, 5300]
 ZAP_RECEIPT_KIND = 9735
+DELETION_KIND = 5
+DELETION_SUBSCRIPTION_ID = "dvm-job-deletions"
+FETCH_TIMEOUT_SECS = 5
+SIGN_BATCH_MAX = 32
+JOB_TAG_CACHE_SIZE = 2048
 
 EventCallback = Callable[[Event], Awaitable[None]]
 
 
+def _sign_all(builders: list[EventBuilder], keys: Keys) -> list[Event | Exception]:
+    signed: list[Event | Exception] = []
+    for builder in builders:
+        try:
+            signed.append(builder.sign_with_keys(keys))
+        except Exception as exc:
+            signed.append(exc)
+    return signed
+
+
 class _NotificationHandler(HandleNotification):
     """Bridge between nostr-sdk's sync HandleNotification and our async callbacks."""
 
@@ -47,7 +66,16 @@ class _NotificationHandler(HandleNotification):
 
 
 class NostrClient:
-    """Manages relay connections, subscriptions, and event publishing."""
+    """Manages relay connections, subscriptions, and event publishing.
+
+    Outgoing events go through a publish queue: a single publisher task
+    takes everything queued so far, signs the whole batch in one call on a
+    dedicated signing thread, then sends the signed events concurrently.
+    Under light load a batch is one event and nothing waits; under a burst
+    of feedback, signing is amortised and stays off the event loop. The
+    ``e``/``p`` tags of each job and the ``status`` tags are built once and
+    reused across that job's feedback and result events.
+    """
 
     def __init__(self, settings: Settings) -> None:
         self._settings = settings
@@ -56,8 +84,16 @@ class NostrClient:
         self._client = Client(signer)
         self._on_job_request: EventCallback | None = None
         self._on_zap_receipt: EventCallback | None = None
+        self._on_deletion: EventCallback | None = None
         self._running = False
         self._event_queue: asyncio.Queue[Event] = asyncio.Queue()
+        self._publish_queue: asyncio.Queue[
+            tuple[EventBuilder, asyncio.Future[Event]]
+        ] = asyncio.Queue()
+        self._publisher_task: asyncio.Task | None = None
+        self._sign_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nostr-sign")
+        self._job_tags: OrderedDict[str, tuple[Tag, Tag]] = OrderedDict()
+        self._status_tags: dict[str, Tag] = {}
 
     @property
     def public_key(self) -> PublicKey:
@@ -73,6 +109,9 @@ class NostrClient:
     def on_zap_receipt(self, callback: EventCallback) -> None:
         self._on_zap_receipt = callback
 
+    def on_deletion(self, callback: EventCallback) -> None:
+        self._on_deletion = callback
+
     async def connect(self) -> None:
         for url in self._settings.relay_url_list:
             await self._client.add_relay(RelayUrl.parse(url))
@@ -102,6 +141,46 @@ class NostrClient:
             zap_kind=ZAP_RECEIPT_KIND,
         )
 
+    async def watch_deletions(self, event_ids: list[str]) -> None:
+        """Point the NIP-09 deletion subscription at the given job event ids.
+
+        The subscription is replaced in place (same subscription id), so
+        relays only ever send us deletions that reference our open jobs.
+        """
+        if not event_ids:
+            await self._client.unsubscribe(DELETION_SUBSCRIPTION_ID)
+            return
+
+        deletion_filter = (
+            Filter()
+            .kind(Kind(DELETION_KIND))
+            .events([EventId.parse(e) for e in event_ids])
+        )
+        await self._client.subscribe_with_id(DELETION_SUBSCRIPTION_ID, deletion_filter, None)
+        logger.debug("deletion_watch_updated", jobs=len(event_ids))
+
+    async def fetch_event(self, event_id: str) -> Event | None:
+        """Fetch a single event by id from the connected relays."""
+        event_filter = Filter().id(EventId.parse(event_id)).limit(1)
+        events = await self._client.fetch_events(
+            event_filter, timedelta(seconds=FETCH_TIMEOUT_SECS)
+        )
+        return events.first()
+
+    async def fetch_job_result(self, job_event_id: str, authors: list[str]) -> Event | None:
+        """Fetch a NIP-90 result (kind 6xxx) for another job request, published by ``authors``."""
+        result_filter = (
+            Filter()
+            .kinds([Kind(k + 1000) for k in DVM_REQUEST_KINDS])
+            .event(EventId.parse(job_event_id))
+            .authors([PublicKey.parse(author) for author in authors])
+            .limit(1)
+        )
+        events = await self._client.fetch_events(
+            result_filter, timedelta(seconds=FETCH_TIMEOUT_SECS)
+        )
+        return events.first()
+
     async def run_event_loop(self) -> None:
         self._running = True
         logger.info("event_loop_started")
@@ -140,11 +219,73 @@ class NostrClient:
             except Exception:
                 logger.exception("zap_receipt_handler_error", event_id=event.id().to_hex())
 
+        elif kind_num == DELETION_KIND and self._on_deletion:
+            logger.info("deletion_received", event_id=event.id().to_hex())
+            try:
+                await self._on_deletion(event)
+            except Exception:
+                logger.exception("deletion_handler_error", event_id=event.id().to_hex())
+
+    def _tags_for_job(self, job_event_id: str, customer_pubkey: str) -> list[Tag]:
+        cached = self._job_tags.get(job_event_id)
+        if cached is None:
+            cached = (Tag.parse(["e", job_event_id]), Tag.parse(["p", customer_pubkey]))
+            self._job_tags[job_event_id] = cached
+            if len(self._job_tags) > JOB_TAG_CACHE_SIZE:
+                self._job_tags.popitem(last=False)
+        else:
+            self._job_tags.move_to_end(job_event_id)
+        return list(cached)
+
+    def _status_tag(self, status: str) -> Tag:
+        tag = self._status_tags.get(status)
+        if tag is None:
+            tag = self._status_tags[status] = Tag.parse(["status", status])
+        return tag
+
     async def publish_event(self, event_builder: EventBuilder) -> Event:
-        output = await self._client.send_event_builder(event_builder)
-        event_id = output.id.to_hex()
-        logger.info("event_published", event_id=event_id)
-        return output
+        """Queue ``event_builder`` for signing and sending; returns the signed event."""
+        fut: asyncio.Future[Event] = asyncio.get_running_loop().create_future()
+        self._publish_queue.put_nowait((event_builder, fut))
+        if self._publisher_task is None or self._publisher_task.done():
+            self._publisher_task = asyncio.create_task(self._run_publisher())
+        return await fut
+
+    async def publish_batch(self, event_builders: list[EventBuilder]) -> list[Event]:
+        """Publish several events; queued together, they are signed in one call."""
+        return list(await asyncio.gather(*(self.publish_event(b) for b in event_builders)))
+
+    async def _run_publisher(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._publish_queue.get()]
+            while len(batch) < SIGN_BATCH_MAX and not self._publish_queue.empty():
+                batch.append(self._publish_queue.get_nowait())
+
+            try:
+                signed = await loop.run_in_executor(
+                    self._sign_pool, _sign_all, [builder for builder, _ in batch], self._keys
+                )
+            except Exception as exc:
+                signed = [exc] * len(batch)
+
+            async def _send(event: Event | Exception) -> Event:
+                if isinstance(event, Exception):
+                    raise event
+                await self._client.send_event(event)
+                return event
+
+            results = await asyncio.gather(*(_send(e) for e in signed), return_exceptions=True)
+            for (_, fut), result in zip(batch, results):
+                if fut.done():
+                    continue
+                if isinstance(result, BaseException):
+                    fut.set_exception(result)
+                else:
+                    logger.info("event_published", event_id=result.id().to_hex())
+                    fut.set_result(result)
+            if len(batch) > 1:
+                logger.debug("event_batch_published", size=len(batch))
 
     async def publish_feedback(
         self,
@@ -155,11 +296,8 @@ class NostrClient:
         extra_tags: list[Tag] | None = None,
         content: str = "",
     ) -> None:
-        tags = [
-            Tag.parse(["e", job_event_id]),
-            Tag.parse(["p", customer_pubkey]),
-            Tag.parse(["status", status]),
-        ]
+        tags = self._tags_for_job(job_event_id, customer_pubkey)
+        tags.append(self._status_tag(status))
         if extra_tags:
             tags.extend(extra_tags)
 
@@ -177,19 +315,56 @@ class NostrClient:
         extra_tags: list[Tag] | None = None,
     ) -> None:
         result_kind = request_kind + 1000
-        tags = [
-            Tag.parse(["e", job_event_id]),
-            Tag.parse(["p", customer_pubkey]),
-            Tag.parse(["status", "success"]),
-        ]
+        tags = self._tags_for_job(job_event_id, customer_pubkey)
+        tags.append(self._status_tag("success"))
         if extra_tags:
             tags.extend(extra_tags)
 
         builder = EventBuilder(Kind(result_kind), content).tags(tags)
         await self.publish_event(builder)
+        # The result is the job's last event.
+        self._job_tags.pop(job_event_id, None)
         logger.info("result_published", job=job_event_id, result_kind=result_kind)
 
+    async def publish_result_chunks(
+        self,
+        job_event_id: str,
+        customer_pubkey: str,
+        request_kind: int,
+        pieces: list[str],
+        *,
+        extra_tags: list[Tag] | None = None,
+    ) -> None:
+        """Publish a result split into ``pieces``.
+
+        All but the last piece go out as Kind 7000 ``partial`` feedback and
+        the last as the result event; each carries ``["chunk", i, n]`` and
+        ``extra_tags``. The events are signed together and sent concurrently,
+        so clients order them by the chunk tag, not by arrival.
+        """
+        job_tags = self._tags_for_job(job_event_id, customer_pubkey)
+        total = str(len(pieces))
+        builders = []
+        for index, piece in enumerate(pieces):
+            last = index == len(pieces) - 1
+            tags = list(job_tags)
+            tags.append(self._status_tag("success" if last else "partial"))
+            tags.append(Tag.parse(["chunk", str(index), total]))
+            if extra_tags:
+                tags.extend(extra_tags)
+            kind = request_kind + 1000 if last else 7000
+            builders.append(EventBuilder(Kind(kind), piece).tags(tags))
+
+        await self.publish_batch(builders)
+        self._job_tags.pop(job_event_id, None)
+        logger.info(
+            "result_published", job=job_event_id, result_kind=request_kind + 1000, chunks=len(pieces)
+        )
+
     async def disconnect(self) -> None:
         self._running = False
+        if self._publisher_task:
+            self._publisher_task.cancel()
+        self._sign_pool.shutdown(wait=False)
         await self._client.disconnect()
         logger.info("disconnected")
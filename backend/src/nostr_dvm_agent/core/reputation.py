@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+
+import structlog
+
+from nostr_dvm_agent.db.base import BaseStore
+
+logger = structlog.get_logger()
+
+LATENCY_ALPHA = 0.3
+
+
+@dataclass
+class CustomerStats:
+    requested: int = 0
+    paid: int = 0
+    expired: int = 0
+    total_msats: int = 0
+    # EWMA of invoice-to-payment seconds; None until an invoice was paid.
+    pay_latency_secs: float | None = None
+    # Open invoices right now; rebuilt from WAITING_PAYMENT jobs, not persisted.
+    pending: int = 0
+
+    @property
+    def pay_rate(self) -> float:
+        """Share of settled invoices that were paid; 1.0 with no history."""
+        settled = self.paid + self.expired
+        return self.paid / settled if settled else 1.0
+
+
+class ReputationIndex:
+    """Per-pubkey payment record, kept in memory and persisted periodically.
+
+    The state machine updates it on each transition (request priced,
+    invoice issued, paid, expired), so lookups are a dict access. Changed
+    entries are written back every ``flush_interval_secs`` and on stop;
+    a crash loses at most that window of counts. An unknown pubkey reads as
+    an empty record, which is never ``deprioritised``.
+    """
+
+    def __init__(
+        self,
+        store: BaseStore,
+        *,
+        flush_interval_secs: float = 60,
+        min_expired: int = 3,
+        min_pay_rate: float = 0.2,
+    ) -> None:
+        self._store = store
+        self._flush_interval = flush_interval_secs
+        self._min_expired = min_expired
+        self._min_pay_rate = min_pay_rate
+        self._stats: dict[str, CustomerStats] = {}
+        self._dirty: set[str] = set()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    async def load(self) -> None:
+        for row in await self._store.load_reputation():
+            pubkey = row.pop("pubkey")
+            self._stats[pubkey] = CustomerStats(**row)
+        logger.info("reputation_loaded", customers=len(self._stats))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+        await self.flush()
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("reputation_flush_failed")
+
+    async def flush(self) -> int:
+        dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return 0
+        rows = []
+        for pubkey in dirty:
+            row = asdict(self._stats[pubkey])
+            del row["pending"]
+            rows.append({"pubkey": pubkey, **row})
+        try:
+            await self._store.save_reputation(rows)
+        except Exception:
+            self._dirty |= dirty
+            raise
+        return len(rows)
+
+    def get(self, pubkey: str) -> CustomerStats:
+        return self._stats.get(pubkey) or CustomerStats()
+
+    def deprioritised(self, pubkey: str) -> bool:
+        """True for pubkeys that mostly let invoices expire."""
+        stats = self._stats.get(pubkey)
+        return (
+            stats is not None
+            and stats.expired >= self._min_expired
+            and stats.pay_rate < self._min_pay_rate
+        )
+
+    def _entry(self, pubkey: str, *, persist: bool = True) -> CustomerStats:
+        if persist:
+            self._dirty.add(pubkey)
+        stats = self._stats.get(pubkey)
+        if stats is None:
+            stats = self._stats[pubkey] = CustomerStats()
+        return stats
+
+    def record_request(self, pubkey: str) -> None:
+        self._entry(pubkey).requested += 1
+
+    def record_invoice(self, pubkey: str) -> None:
+        self._entry(pubkey, persist=False).pending += 1
+
+    def record_paid(
+        self, pubkey: str, amount_msats: int, *, invoiced_at: float | None = None
+    ) -> None:
+        """A paid job; ``invoiced_at`` (epoch secs) for invoices, None for credit debits."""
+        stats = self._entry(pubkey)
+        stats.paid += 1
+        stats.total_msats += amount_msats
+        if invoiced_at is not None:
+            stats.pending = max(0, stats.pending - 1)
+            latency = max(0.0, time.time() - invoiced_at)
+            if stats.pay_latency_secs is None:
+                stats.pay_latency_secs = latency
+            else:
+                stats.pay_latency_secs += LATENCY_ALPHA * (latency - stats.pay_latency_secs)
+
+    def record_expired(self, pubkey: str) -> None:
+        stats = self._entry(pubkey)
+        stats.expired += 1
+        stats.pending = max(0, stats.pending - 1)
+
+    def record_withdrawn(self, pubkey: str) -> None:
+        """An open invoice closed without payment or expiry (customer cancelled)."""
+        stats = self._entry(pubkey, persist=False)
+        stats.pending = max(0, stats.pending - 1)
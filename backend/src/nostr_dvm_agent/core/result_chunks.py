@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import base64
+import gzip
+
+# Value of the ``encoding`` tag on chunked results: the concatenated pieces
+# are base64 of the gzip-compressed UTF-8 result.
+CHUNK_ENCODING = "gzip"
+
+# First line of an encrypted chunked result as kept in the jobs table. NIP-44
+# payloads are base64, so it can't be mistaken for a single ciphertext.
+STORED_CHUNKS_HEADER = "chunks"
+
+TEXT_MIMES = frozenset({"application/json", "application/xml", "text/markdown", "text/html"})
+
+
+def result_mime(output_mime: str | None) -> str:
+    """Mime to advertise for a text result, from the request's ``output`` tag."""
+    if output_mime and (output_mime.startswith("text/") or output_mime in TEXT_MIMES):
+        return output_mime
+    return "text/plain"
+
+
+def split_result(result: str, chunk_bytes: int, *, compress: bool = True) -> list[str]:
+    """Split ``result`` into pieces of at most ``chunk_bytes`` UTF-8 bytes each.
+
+    Compressed pieces are slices of one base64 string and only decode once
+    joined; uncompressed pieces never split a multi-byte character, so
+    each is valid text on its own.
+    """
+    if compress:
+        payload = base64.b64encode(gzip.compress(result.encode(), mtime=0)).decode()
+        return [payload[i:i + chunk_bytes] for i in range(0, len(payload), chunk_bytes)] or [""]
+
+    data = result.encode()
+    pieces = []
+    start = 0
+    while start < len(data):
+        end = min(start + chunk_bytes, len(data))
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        pieces.append(data[start:end].decode())
+        start = end
+    return pieces or [""]
+
+
+def pack_chunks(pieces: list[str], *, compressed: bool) -> str:
+    """Encrypted chunk pieces as one string for the jobs table; see ``unpack_chunks``."""
+    encoding = CHUNK_ENCODING if compressed else "identity"
+    return "\n".join([f"{STORED_CHUNKS_HEADER} {encoding}", *pieces])
+
+
+def unpack_chunks(stored: str) -> tuple[list[str], bool] | None:
+    """``(pieces, compressed)`` from ``pack_chunks`` output, or None for anything else."""
+    header, _, body = stored.partition("\n")
+    name, _, encoding = header.partition(" ")
+    if name != STORED_CHUNKS_HEADER or not body:
+        return None
+    return body.split("\n"), encoding == CHUNK_ENCODING
+
+
+def join_chunks(pieces: list[str], *, compressed: bool = True) -> str:
+    """Inverse of ``split_result``, for pieces already ordered by their ``chunk`` tag."""
+    joined = "".join(pieces)
+    if compressed:
+        return gzip.decompress(base64.b64decode(joined)).decode()
+    return joined
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable
+
+import structlog
+
+logger = structlog.get_logger()
+
+DeadlineCallback = Callable[[str], Awaitable[None]]
+
+
+class DeadlineScheduler:
+    """Fires a callback for each key at its exact deadline.
+
+    Deadlines live in a min-heap (O(log n) schedule and pop). Rescheduling
+    or cancelling a key leaves its old heap entry in place and it is skipped
+    when popped; the heap is rebuilt once stale entries outnumber live ones.
+    A single task sleeps until the earliest deadline and is woken early
+    whenever a sooner deadline is added.
+    """
+
+    def __init__(self, callback: DeadlineCallback) -> None:
+        self._callback = callback
+        self._heap: list[tuple[float, int, str]] = []
+        self._deadlines: dict[str, float] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._deadlines
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def schedule(self, key: str, deadline: float) -> None:
+        """Set ``key`` to fire at ``deadline`` (a ``time.time()`` timestamp)."""
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._seq), key))
+        if self._heap[0][2] == key:
+            self._wakeup.set()
+
+    def cancel(self, key: str) -> None:
+        if self._deadlines.pop(key, None) is not None:
+            if len(self._heap) > 2 * len(self._deadlines) + 64:
+                self._compact()
+
+    def _compact(self) -> None:
+        self._heap = [
+            entry for entry in self._heap if self._deadlines.get(entry[2]) == entry[0]
+        ]
+        heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float) -> list[str]:
+        due: list[str] = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(self._heap)
+            if self._deadlines.get(key) != deadline:
+                continue
+            del self._deadlines[key]
+            due.append(key)
+        return due
+
+    async def _run(self) -> None:
+        while True:
+            for key in self._pop_due(time.time()):
+                try:
+                    await self._callback(key)
+                except Exception:
+                    logger.exception("deadline_callback_error", key=key)
+
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            if timeout is not None and timeout <= 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
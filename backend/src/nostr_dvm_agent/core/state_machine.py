@@ -2,47 +2,176 @@ from __future__ import annotations
 
 import asyncio
 import json
+import time
 from typing import Any
 
 import structlog
 from nostr_sdk import Event, PublicKey, Tag
 
+from nostr_dvm_agent.ai.model_router import ModelRouter
+from nostr_dvm_agent.ai.semantic_cache import SemanticCache, answer_scope, cache_allowed
 from nostr_dvm_agent.config import Settings
+from nostr_dvm_agent.core.admission import AdmissionController
+from nostr_dvm_agent.core.cpu_executor import CpuExecutor
 from nostr_dvm_agent.core.event_handler import extract_job_input, get_primary_input_text
+from nostr_dvm_agent.core.input_resolver import InputResolver, has_chained_inputs
 from nostr_dvm_agent.core.nostr_client import NostrClient
-from nostr_dvm_agent.db.store import JobState, Store
+from nostr_dvm_agent.core.reputation import ReputationIndex
+from nostr_dvm_agent.core.result_chunks import (
+    CHUNK_ENCODING,
+    pack_chunks,
+    result_mime,
+    split_result,
+)
+from nostr_dvm_agent.core.scheduler import DeadlineScheduler
+from nostr_dvm_agent.db.base import TERMINAL_STATES, BaseStore, JobState
+from nostr_dvm_agent.db.blobs import DATA_URL_RE, BlobStore, blob_url, decode_data_url
+from nostr_dvm_agent.db.payload import encode_payload
 from nostr_dvm_agent.payment.lightning import LightningClient
+from nostr_dvm_agent.payment.pricing import PricingEngine
+from nostr_dvm_agent.payment.zap_cache import ZapReceiptCache
 from nostr_dvm_agent.security.encryption import decrypt_content, encrypt_content, is_encrypted
+from nostr_dvm_agent.security import nip44
+from nostr_dvm_agent.security.nip44 import ConversationKeyCache
 from nostr_dvm_agent.services.base import BaseDVMService
 
 logger = structlog.get_logger()
 
+DELETION_WATCH_DEBOUNCE_SECS = 1.0
+TURNAROUND_ALPHA = 0.2
+CANCELLABLE_STATES = frozenset({
+    JobState.RECEIVED.value,
+    JobState.WAITING_PAYMENT.value,
+    JobState.QUEUED.value,
+    JobState.PROCESSING.value,
+})
+
+
+def _balance_tags(balance: int | None) -> list[Tag] | None:
+    return [Tag.parse(["balance", str(balance)])] if balance is not None else None
+
+
+def _note_speculation_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.info("speculative_execution_failed", error=str(task.exception()))
+
 
 class StateMachine:
-    """Orchestrates the NIP-90 job lifecycle from request to result delivery."""
+    """Orchestrates the NIP-90 job lifecycle from request to result delivery.
+
+    With ``agent_role="all"`` paid jobs execute in this process. As a
+    ``coordinator`` it instead resolves inputs and queues paid jobs for
+    ``JobWorker`` processes, then publishes the results they hand back.
+    """
 
     def __init__(
         self,
         settings: Settings,
         nostr: NostrClient,
-        store: Store,
+        store: BaseStore,
         lightning: LightningClient,
         services: dict[int, BaseDVMService],
+        blobs: BlobStore | None = None,
+        cpu: CpuExecutor | None = None,
+        router: ModelRouter | None = None,
     ) -> None:
         self._settings = settings
         self._nostr = nostr
         self._store = store
         self._lightning = lightning
         self._services = services
-        self._expiry_task: asyncio.Task | None = None
+        self._blobs = blobs
+        self._cpu = cpu or CpuExecutor()
+        self._nip44 = ConversationKeyCache(
+            nostr.keys,
+            max_entries=settings.nip44_cache_size,
+            ttl_secs=settings.nip44_cache_ttl_secs,
+        )
+        self._expiry = DeadlineScheduler(self._expire_job)
+        self._running_jobs: dict[str, asyncio.Task] = {}
+        # Executions started before payment confirmed, by job.
+        self._speculative: dict[str, asyncio.Task] = {}
+        # Cached answers quoted at a discount, delivered once paid.
+        self._cache_hits: dict[str, str] = {}
+        self._answers = (
+            SemanticCache(
+                max_entries=settings.semantic_cache_size,
+                ttl_secs=settings.semantic_cache_ttl_secs,
+                threshold=settings.semantic_cache_threshold,
+            )
+            if settings.semantic_cache_enabled
+            else None
+        )
+        # Paid jobs not yet finished (executing here or queued for workers), by claim time.
+        self._outstanding: dict[str, float] = {}
+        self._turnaround_ewma: float | None = None
+        self._watched_jobs: set[str] = set()
+        self._watch_task: asyncio.Task | None = None
+        self._watch_dirty = False
+        self._resolver = InputResolver(
+            store, nostr, settings.chain_wait_timeout_secs, cpu=self._cpu, nip44=self._nip44,
+            blobs=blobs, blob_public_url=settings.blob_public_url,
+        )
+        self._zaps = ZapReceiptCache(self._cpu)
+        self._reputation = ReputationIndex(
+            store,
+            flush_interval_secs=settings.reputation_flush_secs,
+            min_expired=settings.reputation_min_expired,
+            min_pay_rate=settings.reputation_min_pay_rate,
+        )
+        self._pricing = (
+            PricingEngine(settings, self.load, router)
+            if router is not None and settings.pricing_enabled
+            else None
+        )
+        self._admission = AdmissionController(
+            outstanding=lambda: len(self._outstanding),
+            awaiting_payment=lambda: len(self._expiry),
+            turnaround=lambda: self._turnaround_ewma,
+            capacity=settings.job_capacity,
+            max_in_flight=settings.admission_max_in_flight,
+            max_wait_secs=settings.admission_max_wait_secs,
+        )
+        self._coordinator = settings.agent_role == "coordinator"
+        self._collect_task: asyncio.Task | None = None
 
     async def start(self) -> None:
-        self._expiry_task = asyncio.create_task(self._expiry_loop())
-        logger.info("state_machine_started", services=list(self._services.keys()))
+        timeout = self._settings.payment_timeout_secs
+        await self._reputation.load()
+        for job in await self._store.get_jobs_in_state(JobState.WAITING_PAYMENT):
+            self._reputation.record_invoice(job["customer_pubkey"])
+            self._watched_jobs.add(job["event_id"])
+            self._expiry.schedule(job["event_id"], job["updated_at"] + timeout)
+        self._schedule_deletion_watch()
+        self._expiry.start()
+        self._reputation.start()
+        if self._coordinator:
+            # Queued, leased and executed jobs still count towards load until delivered.
+            for state in (JobState.QUEUED, JobState.EXECUTED):
+                for job in await self._store.get_jobs_in_state(state):
+                    self._outstanding[job["event_id"]] = time.monotonic()
+            for job in await self._store.get_jobs_in_state(JobState.PROCESSING):
+                self._outstanding[job["event_id"]] = time.monotonic()
+                # Paid jobs whose dispatch was interrupted never reached the queue.
+                if job.get("lease_owner") is None:
+                    self._spawn(job["event_id"], self._queue_job(
+                        job["event_id"], job["customer_pubkey"], job["kind"]
+                    ))
+            self._collect_task = asyncio.create_task(self._collect_loop())
+        logger.info(
+            "state_machine_started",
+            services=list(self._services.keys()),
+            awaiting_payment=len(self._expiry),
+            role=self._settings.agent_role,
+        )
 
     async def stop(self) -> None:
-        if self._expiry_task:
-            self._expiry_task.cancel()
+        self._expiry.stop()
+        await self._reputation.stop()
+        if self._collect_task:
+            self._collect_task.cancel()
+        if self._watch_task:
+            self._watch_task.cancel()
 
     async def handle_job_request(self, event: Event) -> None:
         job_data = extract_job_input(event)
@@ -53,9 +182,11 @@ class StateMachine:
         if is_encrypted(event):
             logger.info("encrypted_job_detected", event_id=event_id)
             try:
-                sender_pk = PublicKey.from_hex(customer)
-                decrypted = decrypt_content(
-                    self._nostr.keys, sender_pk, event.content()
+                sender_pk = PublicKey.parse(customer)
+                ciphertext = event.content()
+                decrypted = await self._cpu.run_thread(
+                    decrypt_content, self._nostr.keys, sender_pk, ciphertext, self._nip44,
+                    size=len(ciphertext),
                 )
                 if decrypted:
                     decrypted_data = json.loads(decrypted)
@@ -71,17 +202,81 @@ class StateMachine:
             logger.warning("unsupported_kind", kind=kind, event_id=event_id)
             return
 
-        if not await service.validate_input(job_data):
+        # Pubkeys that rarely pay get one open invoice at a time; the rest are
+        # dropped without an LNURL call or a feedback event.
+        if (
+            self._reputation.deprioritised(customer)
+            and self._reputation.get(customer).pending >= self._settings.reputation_max_pending
+        ):
+            logger.info("request_deprioritised", event_id=event_id, customer=customer)
+            return
+
+        # Refuse before quoting: better than taking sats we can't turn around in time.
+        refusal = self._admission.refusal()
+        if refusal:
+            await self._nostr.publish_feedback(event_id, customer, "error", content=refusal)
+            return
+
+        # Chained inputs are resolved again when the job executes; here they are
+        # only read if already available, so the quote reflects the real input.
+        quoted: dict[str, Any] | None = job_data
+        if has_chained_inputs(job_data):
+            try:
+                quoted = await self._resolver.preview(job_data)
+            except ValueError as exc:
+                logger.warning("unresolvable_input", event_id=event_id, error=str(exc))
+                await self._nostr.publish_feedback(event_id, customer, "error", content=str(exc))
+                return
+        try:
+            valid = quoted is None or await service.validate_input(quoted)
+        except ValueError as exc:
+            logger.warning("input_refused", event_id=event_id, error=str(exc))
+            await self._nostr.publish_feedback(event_id, customer, "error", content=str(exc))
+            return
+        if not valid:
             logger.warning("invalid_input", event_id=event_id)
             await self._nostr.publish_feedback(
                 event_id, customer, "error", content="Invalid or missing input data."
             )
             return
 
-        await self._store.create_job(event_id, customer, kind, input_data=job_data)
+        # Relays deliver the same request more than once; only the first copy is invoiced.
+        if not await self._store.create_job(event_id, customer, kind, input_data=job_data):
+            logger.info("duplicate_request", event_id=event_id)
+            return
+        self._reputation.record_request(customer)
+
+        # An upstream job still running has no output to price yet.
+        cost = await service.estimate_cost(quoted) if quoted is not None else service.max_price()
+        if self._pricing:
+            cost = self._pricing.quote(service, cost)
+
+        cached = self._cached_answer(service, job_data)
+        if cached is not None:
+            cost = round(cost * self._settings.semantic_cache_discount)
+            self._cache_hits[event_id] = cached
+            logger.info("semantic_cache_hit", event_id=event_id, amount_msats=cost)
+
+        balance: int | None = None
+        top_up = self._requested_top_up(job_data)
+        if self._settings.credit_enabled and not top_up:
+            balance = await self._store.get_balance(customer)
+            if balance is not None and balance >= cost:
+                debited = await self._store.debit(customer, cost, f"job:{event_id}")
+                if debited is not None:
+                    await self._store.update_state(event_id, JobState.PROCESSING, amount_msats=cost)
+                    self._reputation.record_paid(customer, cost)
+                    self._watch(event_id)
+                    logger.info(
+                        "job_paid_from_credit",
+                        event_id=event_id, amount_msats=cost, balance_msats=debited,
+                    )
+                    await self._start_job(event_id, customer, kind, balance=debited)
+                    return
 
-        cost = await service.estimate_cost(job_data)
-        invoice_data = await self._lightning.create_invoice(cost, f"sats.ai DVM job {event_id[:8]}")
+        invoice_data = await self._lightning.create_invoice(
+            cost + top_up, f"sats.ai DVM job {event_id[:8]}"
+        )
 
         if not invoice_data:
             logger.error("invoice_creation_failed", event_id=event_id)
@@ -93,18 +288,175 @@ class StateMachine:
             JobState.WAITING_PAYMENT,
             bolt11=invoice_data["bolt11"],
             invoice_hash=invoice_data.get("payment_hash", ""),
-            amount_msats=cost,
+            amount_msats=cost + top_up,
         )
+        self._reputation.record_invoice(customer)
+        self._watch(event_id)
+        self._expiry.schedule(event_id, time.time() + self._settings.payment_timeout_secs)
 
         await self._nostr.publish_feedback(
             event_id,
             customer,
             "payment-required",
             extra_tags=[
-                Tag.parse(["amount", str(cost), invoice_data["bolt11"]]),
+                Tag.parse(["amount", str(cost + top_up), invoice_data["bolt11"]]),
+                *(_balance_tags(balance) or []),
             ],
         )
-        logger.info("payment_required", event_id=event_id, amount_msats=cost)
+        logger.info("payment_required", event_id=event_id, amount_msats=cost + top_up)
+
+        if self._should_speculate(event_id, customer, cost + top_up, job_data):
+            task = asyncio.create_task(service.execute(job_data))
+            task.add_done_callback(_note_speculation_failure)
+            self._speculative[event_id] = task
+            logger.info("speculative_execution_started", event_id=event_id)
+
+        # A receipt may have arrived while the invoice was being created.
+        if not invoice_data.get("payment_hash"):
+            return
+        for early in (
+            self._zaps.find_by_job(event_id),
+            self._zaps.find_by_bolt11(invoice_data["bolt11"]),
+        ):
+            if early and await self._receipt_pays(early, invoice_data["bolt11"], cost + top_up):
+                logger.info("zap_receipt_preceded_invoice", event_id=event_id)
+                await self.handle_payment_confirmed(invoice_data["payment_hash"])
+                return
+
+    async def handle_zap_receipt(self, event: Event) -> None:
+        zap_data = await self._zaps.verify(event)
+        if not zap_data:
+            return
+        if not zap_data.get("event_id"):
+            if self._settings.credit_enabled:
+                await self._top_up_from_zap(zap_data)
+            return
+        job = await self._store.get_job(zap_data["event_id"])
+        if (
+            job
+            and job.get("invoice_hash")
+            and await self._receipt_pays(zap_data, job.get("bolt11"), job.get("amount_msats"))
+        ):
+            await self.handle_payment_confirmed(job["invoice_hash"])
+
+    async def _receipt_pays(
+        self, zap: dict[str, Any], bolt11: str | None, amount_msats: int | None
+    ) -> bool:
+        """Whether a verified zap receipt proves that our invoice ``bolt11`` was paid.
+
+        Anyone can sign a kind 9735 that tags a job, so the receipt must settle
+        the exact invoice we issued and be signed by our LNURL provider. A
+        provider that doesn't sign zap receipts leaves nothing to check the
+        receipt against (the bolt11 itself is public), so it is not trusted.
+        """
+        if not bolt11 or zap.get("bolt11") != bolt11:
+            logger.warning("zap_invoice_mismatch", receipt=zap.get("zap_receipt_id"))
+            return False
+        paid = zap.get("amount_msats")
+        if paid is not None and amount_msats and paid < amount_msats:
+            logger.warning(
+                "zap_insufficient_amount", receipt=zap.get("zap_receipt_id"),
+                expected=amount_msats, received=paid,
+            )
+            return False
+        zapper = await self._lightning.zapper_pubkey()
+        if not zapper:
+            logger.warning("zap_receipt_unverifiable", receipt=zap.get("zap_receipt_id"))
+            return False
+        if zap.get("receipt_author") != zapper:
+            logger.warning("zap_receipt_untrusted", receipt=zap.get("zap_receipt_id"))
+            return False
+        return True
+
+    def _cached_answer(self, service: BaseDVMService, job_data: dict[str, Any]) -> str | None:
+        if (
+            self._answers is None
+            or not service.cacheable
+            or not cache_allowed(job_data)
+            or has_chained_inputs(job_data)
+        ):
+            return None
+        return self._answers.lookup(
+            answer_scope(service.kind, job_data), get_primary_input_text(job_data)
+        )
+
+    def _remember_answer(
+        self, service: BaseDVMService | None, job_data: dict[str, Any], result: str
+    ) -> None:
+        # Answers to encrypted requests are never shared.
+        if (
+            self._answers is None
+            or service is None
+            or not service.cacheable
+            or job_data.get("encrypted")
+            or has_chained_inputs(job_data)
+        ):
+            return
+        self._answers.store(
+            answer_scope(service.kind, job_data), get_primary_input_text(job_data), result
+        )
+
+    def _should_speculate(
+        self, event_id: str, customer: str, amount_msats: int, job_data: dict[str, Any]
+    ) -> bool:
+        """Whether to execute before payment: cheap, self-contained, from a reliable payer."""
+        s = self._settings
+        if (
+            not s.speculative_enabled
+            or self._coordinator
+            or event_id in self._cache_hits
+            or amount_msats > s.speculative_max_msats
+            or len(self._speculative) >= s.speculative_max_concurrent
+            or has_chained_inputs(job_data)
+        ):
+            return False
+        stats = self._reputation.get(customer)
+        return (
+            stats.paid >= s.speculative_min_paid_jobs
+            and stats.pay_rate >= s.speculative_min_pay_rate
+        )
+
+    async def _take_speculative(self, event_id: str) -> tuple[bool, str]:
+        """Result of a speculative execution for ``event_id``, as (found, result).
+
+        A speculative run that failed counts as not found, so the job
+        executes normally.
+        """
+        task = self._speculative.pop(event_id, None)
+        if task is None:
+            return False, ""
+        try:
+            await asyncio.wait([task])
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if task.cancelled() or task.exception() is not None:
+            return False, ""
+        logger.info("speculative_result_used", event_id=event_id)
+        return True, task.result()
+
+    async def _top_up_from_zap(self, zap: dict[str, Any]) -> None:
+        """Credit a zap to our profile (no job referenced) to the zapper's balance."""
+        payer, amount = zap.get("payer_pubkey"), zap.get("amount_msats")
+        if not payer or not amount or amount <= 0:
+            return
+        # Anyone can sign a kind 9735; only our LNURL provider's receipts prove payment.
+        if zap["receipt_author"] != await self._lightning.zapper_pubkey():
+            logger.warning("credit_zap_untrusted", receipt=zap["zap_receipt_id"])
+            return
+        balance = await self._store.credit(payer, amount, f"zap:{zap['zap_receipt_id']}")
+        if balance is not None:
+            logger.info("credit_topped_up", pubkey=payer, amount_msats=amount, balance_msats=balance)
+
+    def _requested_top_up(self, job_data: dict[str, Any]) -> int:
+        """Msats the customer asked to add to their balance with ``["param", "credit", <msats>]``."""
+        if not self._settings.credit_enabled:
+            return 0
+        try:
+            amount = int(job_data.get("params", {}).get("credit", 0))
+        except (TypeError, ValueError):
+            return 0
+        return min(max(0, amount), self._settings.credit_max_topup_msats)
 
     async def handle_payment_confirmed(self, invoice_hash: str) -> None:
         job = await self._store.get_job_by_invoice(invoice_hash)
@@ -116,14 +468,117 @@ class StateMachine:
         customer = job["customer_pubkey"]
         kind = job["kind"]
 
-        if job["state"] != JobState.WAITING_PAYMENT.value:
+        if job["state"] == JobState.CANCELLED.value:
+            await self._handle_late_payment(job)
+            return
+
+        # Conditional claim, so a payment seen by several agents runs the job once.
+        if job["state"] != JobState.WAITING_PAYMENT.value or not await self._store.claim_job(
+            event_id, JobState.WAITING_PAYMENT, JobState.PROCESSING
+        ):
             logger.info("payment_already_processed", event_id=event_id)
             return
 
-        await self._transition(event_id, customer, JobState.PROCESSING)
-        await self._nostr.publish_feedback(event_id, customer, "processing")
+        self._expiry.cancel(event_id)
+        self._reputation.record_paid(
+            customer, job.get("amount_msats") or 0, invoiced_at=job["updated_at"]
+        )
+        balance = None
+        top_up = 0
+        if self._settings.credit_enabled:
+            top_up = self._requested_top_up(await self._store.get_payload(event_id) or {})
+        if top_up:
+            balance = await self._store.credit(customer, top_up, f"invoice:{event_id}")
+            logger.info("credit_topped_up", pubkey=customer, amount_msats=top_up, balance_msats=balance)
+        await self._start_job(event_id, customer, kind, balance=balance)
+
+    async def _handle_late_payment(self, job: dict[str, Any]) -> None:
+        """An invoice paid after its job was cancelled: credit the payment, or run the job."""
+        event_id, customer = job["event_id"], job["customer_pubkey"]
+        logger.info("payment_after_cancel", event_id=event_id)
+        if self._settings.credit_enabled:
+            await self._refund_to_credit(event_id, customer, job.get("amount_msats") or 0)
+            return
+        if not await self._store.claim_job(event_id, JobState.CANCELLED, JobState.PROCESSING):
+            return
+        self._reputation.record_paid(customer, job.get("amount_msats") or 0)
+        await self._start_job(event_id, customer, job["kind"])
+
+    async def _start_job(
+        self, event_id: str, customer: str, kind: int, *, balance: int | None = None
+    ) -> None:
+        """Run a job that has just been paid for, or queue it for workers."""
+        self._outstanding[event_id] = time.monotonic()
+        logger.info("state_transition", event_id=event_id, state=JobState.PROCESSING.value)
+        await self._nostr.publish_feedback(
+            event_id, customer, "processing", extra_tags=_balance_tags(balance)
+        )
+
+        cached = self._cache_hits.pop(event_id, None)
+        if cached is not None:
+            self._spawn(event_id, self._deliver_cached(event_id, customer, kind, cached))
+        elif self._coordinator:
+            self._spawn(event_id, self._queue_job(event_id, customer, kind))
+        else:
+            self._spawn(event_id, self._execute_job(event_id, customer, kind))
+
+    def _spawn(self, event_id: str, coro: Any) -> None:
+        task = asyncio.create_task(coro)
+        self._running_jobs[event_id] = task
+        task.add_done_callback(lambda _: self._running_jobs.pop(event_id, None))
+
+    async def handle_deletion(self, event: Event) -> None:
+        """Cancel jobs referenced by a NIP-09 deletion from the job's own author."""
+        author = event.author().to_hex()
+        for tag in event.tags().to_vec():
+            tag_vec = tag.as_vec()
+            if len(tag_vec) >= 2 and tag_vec[0] == "e":
+                await self._cancel_job(tag_vec[1], author)
+
+    async def _cancel_job(self, event_id: str, requester: str) -> None:
+        job = await self._store.get_job(event_id)
+        if not job or job["customer_pubkey"] != requester:
+            return
+        if job["state"] not in CANCELLABLE_STATES:
+            logger.info("cancel_ignored", event_id=event_id, state=job["state"])
+            return
 
-        asyncio.create_task(self._execute_job(event_id, customer, kind))
+        paid = job["state"] in (JobState.QUEUED.value, JobState.PROCESSING.value)
+        refund = 0
+        if paid:
+            payload = await self._store.get_payload(event_id) or {}
+            refund = (job.get("amount_msats") or 0) - self._requested_top_up(payload)
+            # Without credit there is no way to give the money back, so the job runs.
+            if refund > 0 and not self._settings.credit_enabled:
+                logger.info("cancel_ignored", event_id=event_id, state=job["state"], reason="paid")
+                return
+
+        task = self._running_jobs.pop(event_id, None)
+        if task:
+            task.cancel()
+        # Conditional on the state read above, so a job that finished meanwhile stays finished.
+        if not await self._store.claim_job(event_id, JobState(job["state"]), JobState.CANCELLED):
+            logger.info("cancel_lost_race", event_id=event_id, was=job["state"])
+            return
+        self._expiry.cancel(event_id)
+        self._release(event_id)
+        if job["state"] == JobState.WAITING_PAYMENT.value:
+            self._reputation.record_withdrawn(requester)
+        logger.info("job_cancelled", event_id=event_id, was=job["state"], had_task=task is not None)
+        if refund > 0:
+            await self._refund_to_credit(event_id, requester, refund)
+
+    async def _refund_to_credit(self, event_id: str, customer: str, amount_msats: int) -> None:
+        """Return a cancelled job's payment to the customer's balance, once per job."""
+        balance = await self._store.credit(customer, amount_msats, f"refund:{event_id}")
+        if balance is None:
+            return
+        logger.info("job_refunded", event_id=event_id, amount_msats=amount_msats, balance_msats=balance)
+        await self._nostr.publish_feedback(
+            event_id, customer, "error",
+            content=f"Job cancelled; {amount_msats} msats credited to your balance.",
+            extra_tags=_balance_tags(balance),
+        )
 
     async def _execute_job(self, event_id: str, customer: str, kind: int) -> None:
         service = self._services.get(kind)
@@ -131,43 +586,248 @@ class StateMachine:
             await self._transition(event_id, customer, JobState.FAILED, error="Service not found")
             return
 
-        job = await self._store.get_job(event_id)
-        if not job:
+        job_data = await self._store.get_payload(event_id)
+        if job_data is None:
             return
 
-        job_data = json.loads(job["input_data"]) if job["input_data"] else {}
         is_enc = job_data.get("encrypted", False)
 
         try:
-            result = await service.execute(job_data)
+            found, result = await self._take_speculative(event_id)
+            if not found:
+                job_data = await self._resolve_inputs(service, job_data)
+                result = await service.execute(job_data)
+            await self._deliver_result(
+                event_id, customer, kind, result, is_enc, output_mime=job_data.get("output_mime")
+            )
 
-            if is_enc:
-                try:
-                    recipient_pk = PublicKey.from_hex(customer)
-                    encrypted_result = encrypt_content(
-                        self._nostr.keys, recipient_pk, result
-                    )
-                    if encrypted_result:
-                        result = encrypted_result
-                        logger.info("result_encrypted", event_id=event_id)
-                except Exception:
-                    logger.exception("result_encryption_failed", event_id=event_id)
+        except asyncio.CancelledError:
+            logger.info("job_execution_cancelled", event_id=event_id)
+            raise
+
+        except Exception as exc:
+            await self._fail_job(event_id, customer, str(exc))
+            logger.exception("job_execution_failed", event_id=event_id)
 
-            await self._store.update_state(event_id, JobState.COMPLETED, result=result)
+        else:
+            self._remember_answer(service, job_data, result)
 
-            extra_tags = [Tag.parse(["encrypted"])] if is_enc else None
-            await self._nostr.publish_result(
-                event_id, customer, kind, result, extra_tags=extra_tags
+    async def _deliver_cached(self, event_id: str, customer: str, kind: int, result: str) -> None:
+        job_data = await self._store.get_payload(event_id) or {}
+        try:
+            await self._deliver_result(
+                event_id, customer, kind, result, job_data.get("encrypted", False),
+                output_mime=job_data.get("output_mime"),
             )
-            logger.info("job_completed", event_id=event_id)
+        except Exception as exc:
+            await self._fail_job(event_id, customer, str(exc))
+            logger.exception("cached_delivery_failed", event_id=event_id)
+
+    async def _queue_job(self, event_id: str, customer: str, kind: int) -> None:
+        """Coordinator side of execution: resolve inputs, then hand the job to workers."""
+        service = self._services.get(kind)
+        if not service:
+            await self._transition(event_id, customer, JobState.FAILED, error="Service not found")
+            return
+
+        job_data = await self._store.get_payload(event_id)
+        if job_data is None:
+            return
 
+        try:
+            if has_chained_inputs(job_data):
+                job_data = await self._resolve_inputs(service, job_data)
+                await self._transition(
+                    event_id, customer, JobState.QUEUED, input_data=encode_payload(job_data)
+                )
+            else:
+                await self._transition(event_id, customer, JobState.QUEUED)
+        except asyncio.CancelledError:
+            logger.info("job_dispatch_cancelled", event_id=event_id)
+            raise
         except Exception as exc:
-            error_msg = str(exc)
-            await self._transition(event_id, customer, JobState.FAILED, error=error_msg)
-            await self._nostr.publish_feedback(
-                event_id, customer, "error", content=error_msg
+            await self._fail_job(event_id, customer, str(exc))
+            logger.exception("job_dispatch_failed", event_id=event_id)
+
+    async def _collect_loop(self) -> None:
+        while True:
+            try:
+                await self.collect_results()
+            except Exception:
+                logger.exception("result_collection_failed")
+            await asyncio.sleep(self._settings.worker_poll_interval_secs)
+
+    async def collect_results(self) -> int:
+        """Requeue jobs of dead workers and publish outcomes workers handed back."""
+        for event_id in await self._store.requeue_expired_leases():
+            logger.warning("job_lease_expired", event_id=event_id)
+
+        executed = await self._store.get_jobs_in_state(JobState.EXECUTED)
+        for job in executed:
+            event_id, customer = job["event_id"], job["customer_pubkey"]
+            if job.get("error") is not None:
+                await self._fail_job(event_id, customer, job["error"])
+                continue
+            job_data = await self._store.get_payload(event_id) or {}
+            try:
+                await self._deliver_result(
+                    event_id, customer, job["kind"], job.get("result") or "",
+                    job_data.get("encrypted", False), output_mime=job_data.get("output_mime"),
+                )
+            except Exception as exc:
+                await self._fail_job(event_id, customer, str(exc))
+                logger.exception("result_delivery_failed", event_id=event_id)
+            else:
+                self._remember_answer(
+                    self._services.get(job["kind"]), job_data, job.get("result") or ""
+                )
+        return len(executed)
+
+    async def _resolve_inputs(
+        self, service: BaseDVMService, job_data: dict[str, Any]
+    ) -> dict[str, Any]:
+        if not has_chained_inputs(job_data):
+            return job_data
+        job_data = await self._resolver.resolve(job_data)
+        if not await service.validate_input(job_data):
+            raise ValueError("Invalid or missing input data.")
+        return job_data
+
+    async def _deliver_result(
+        self,
+        event_id: str,
+        customer: str,
+        kind: int,
+        result: str,
+        is_enc: bool,
+        *,
+        output_mime: str | None = None,
+    ) -> None:
+        result, blob_tags, blob = await self._externalize_result(result, is_enc, output_mime)
+        limit = self._settings.result_max_event_bytes
+        if is_enc:
+            # NIP-44 padding and base64 grow the content by about a third.
+            limit = nip44.max_plaintext_for(limit)
+        # len() is a lower bound on the UTF-8 size; only encode when it might matter.
+        if len(result) * 4 > limit and len(result.encode()) > limit:
+            await self._deliver_chunked(event_id, customer, kind, result, is_enc, output_mime)
+            return
+
+        if is_enc:
+            try:
+                recipient_pk = PublicKey.parse(customer)
+                encrypted_result = await self._cpu.run_thread(
+                    encrypt_content, self._nostr.keys, recipient_pk, result, self._nip44,
+                    size=len(result),
+                )
+                if encrypted_result:
+                    result = encrypted_result
+                    logger.info("result_encrypted", event_id=event_id)
+            except Exception:
+                logger.exception("result_encryption_failed", event_id=event_id)
+
+        await self._transition(
+            event_id, customer, JobState.COMPLETED, result=result, result_blob=blob
+        )
+
+        extra_tags = [Tag.parse(["encrypted"])] if is_enc else blob_tags or None
+        await self._nostr.publish_result(
+            event_id, customer, kind, result, extra_tags=extra_tags
+        )
+        logger.info("job_completed", event_id=event_id)
+
+    async def _deliver_chunked(
+        self,
+        event_id: str,
+        customer: str,
+        kind: int,
+        result: str,
+        is_enc: bool,
+        output_mime: str | None,
+    ) -> None:
+        """Publish a result too large for one event as ordered chunk events."""
+        s = self._settings
+        chunk_bytes = s.result_max_event_bytes
+        if is_enc:
+            # Padding and base64 grow each piece by about a third; size the
+            # plaintext so its ciphertext fits (and stays under NIP-44's 64 KiB).
+            chunk_bytes = nip44.max_plaintext_for(chunk_bytes)
+            if not chunk_bytes:
+                raise ValueError("result_max_event_bytes is too small for an encrypted chunk")
+        pieces = await self._cpu.run_thread(
+            split_result, result, chunk_bytes,
+            compress=s.result_chunk_compression, size=len(result),
+        )
+        if len(pieces) > s.result_max_chunks:
+            raise ValueError(
+                f"Result of {len(result)} characters exceeds the {s.result_max_chunks}-chunk limit"
             )
-            logger.exception("job_execution_failed", event_id=event_id)
+
+        tags: list[Tag] = []
+        if s.result_chunk_compression:
+            tags.append(Tag.parse(["encoding", CHUNK_ENCODING]))
+        if is_enc:
+            recipient_pk = PublicKey.parse(customer)
+            encrypted = []
+            for piece in pieces:
+                ciphertext = await self._cpu.run_thread(
+                    encrypt_content, self._nostr.keys, recipient_pk, piece, self._nip44,
+                    size=len(piece),
+                )
+                if not ciphertext:
+                    raise ValueError("Result encryption failed")
+                encrypted.append(ciphertext)
+            pieces = encrypted
+            tags.append(Tag.parse(["encrypted"]))
+        else:
+            data_url = DATA_URL_RE.match(result)
+            mime = data_url.group(1) if data_url else result_mime(output_mime)
+            tags.append(Tag.parse(["m", mime]))
+
+        stored = (
+            pack_chunks(pieces, compressed=s.result_chunk_compression) if is_enc else result
+        )
+        await self._transition(event_id, customer, JobState.COMPLETED, result=stored)
+        await self._nostr.publish_result_chunks(event_id, customer, kind, pieces, extra_tags=tags)
+        logger.info("job_completed", event_id=event_id, chunks=len(pieces))
+
+    async def _fail_job(self, event_id: str, customer: str, error_msg: str) -> None:
+        await self._transition(event_id, customer, JobState.FAILED, error=error_msg)
+        await self._nostr.publish_feedback(
+            event_id, customer, "error", content=error_msg
+        )
+
+    async def _externalize_result(
+        self, result: str, is_enc: bool, output_mime: str | None = None
+    ) -> tuple[str, list[Tag], str | None]:
+        """Move a large result into the blob store and return its URL and digest instead.
+
+        Data URLs are stored decoded under their own mime; text is stored as
+        UTF-8 under the mime the request asked for (``text/plain`` if none).
+        Both the jobs row and the published event then carry only the URL;
+        the input resolver reads the blob back when the job is chained.
+        For encrypted jobs the hash tags are omitted, since the URL is a
+        capability that must stay inside the encrypted content.
+        """
+        if not self._blobs or len(result) < self._settings.blob_min_bytes:
+            return result, [], None
+        # Decoding and writing a multi-megabyte result would stall the event loop.
+        mime, digest = await self._cpu.run_thread(
+            self._store_blob, result, output_mime, size=len(result)
+        )
+        url = blob_url(self._settings.blob_public_url, digest)
+        if is_enc:
+            return url, [], digest
+        return url, [Tag.parse(["x", digest]), Tag.parse(["m", mime])], digest
+
+    def _store_blob(self, result: str, output_mime: str | None) -> tuple[str, str]:
+        assert self._blobs
+        decoded = decode_data_url(result)
+        if decoded:
+            mime, data = decoded
+        else:
+            mime, data = result_mime(output_mime), result.encode()
+        return mime, self._blobs.put(data, mime)
 
     async def _transition(
         self,
@@ -177,14 +837,78 @@ class StateMachine:
         **extra: Any,
     ) -> None:
         await self._store.update_state(event_id, state, **extra)
+        if state != JobState.WAITING_PAYMENT:
+            self._expiry.cancel(event_id)
+        if state in TERMINAL_STATES:
+            self._release(event_id)
         logger.info("state_transition", event_id=event_id, state=state.value)
 
-    async def _expiry_loop(self) -> None:
-        while True:
+    @property
+    def reputation(self) -> ReputationIndex:
+        return self._reputation
+
+    @property
+    def pricing(self) -> PricingEngine | None:
+        return self._pricing
+
+    def load(self) -> tuple[int, float]:
+        """Paid jobs outstanding and the estimated wait for a new one, in seconds."""
+        depth = len(self._outstanding)
+        capacity = max(1, self._settings.job_capacity)
+        return depth, (self._turnaround_ewma or 0.0) * depth / capacity
+
+    def _release(self, event_id: str) -> None:
+        """Drop per-job bookkeeping once a job reaches a terminal state."""
+        claimed_at = self._outstanding.pop(event_id, None)
+        if claimed_at is not None:
+            took = time.monotonic() - claimed_at
+            if self._turnaround_ewma is None:
+                self._turnaround_ewma = took
+            else:
+                self._turnaround_ewma += TURNAROUND_ALPHA * (took - self._turnaround_ewma)
+        self._cache_hits.pop(event_id, None)
+        speculative = self._speculative.pop(event_id, None)
+        if speculative:
+            # Expired or cancelled before payment: the result is discarded.
+            speculative.cancel()
+        self._unwatch(event_id)
+        self._resolver.notify_finished(event_id)
+
+    async def _expire_job(self, event_id: str) -> None:
+        job = await self._store.get_job(event_id)
+        if not job or not await self._store.expire_job(event_id):
+            return
+        self._release(event_id)
+        self._reputation.record_expired(job["customer_pubkey"])
+        logger.info("job_expired", event_id=event_id)
+        await self._nostr.publish_feedback(
+            event_id,
+            job["customer_pubkey"],
+            "error",
+            content="Payment not received before the invoice expired.",
+        )
+
+    def _watch(self, event_id: str) -> None:
+        self._watched_jobs.add(event_id)
+        self._schedule_deletion_watch()
+
+    def _unwatch(self, event_id: str) -> None:
+        if event_id in self._watched_jobs:
+            self._watched_jobs.discard(event_id)
+            self._schedule_deletion_watch()
+
+    def _schedule_deletion_watch(self) -> None:
+        """Coalesce watch-set changes into one resubscription per debounce window."""
+        self._watch_dirty = True
+        if self._watch_task and not self._watch_task.done():
+            return
+        self._watch_task = asyncio.create_task(self._refresh_deletion_watch())
+
+    async def _refresh_deletion_watch(self) -> None:
+        while self._watch_dirty:
+            await asyncio.sleep(DELETION_WATCH_DEBOUNCE_SECS)
+            self._watch_dirty = False
             try:
-                expired = await self._store.expire_stale_jobs(self._settings.payment_timeout_secs)
-                if expired:
-                    logger.info("expired_jobs", count=expired)
+                await self._nostr.watch_deletions(sorted(self._watched_jobs))
             except Exception:
-                logger.exception("expiry_loop_error")
-            await asyncio.sleep(30)
+                logger.exception("deletion_watch_failed")
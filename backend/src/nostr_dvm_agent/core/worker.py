@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import structlog
+
+from nostr_dvm_agent.db.base import BaseStore
+from nostr_dvm_agent.services.base import BaseDVMService
+
+logger = structlog.get_logger()
+
+
+class JobWorker:
+    """Executes paid jobs leased from the shared store.
+
+    Workers never touch relays or invoices: the coordinator resolves inputs
+    and queues the job, a worker leases it, runs the service and hands the
+    raw result (or error) back as EXECUTED for the coordinator to publish.
+    While a job runs its lease is renewed every third of ``lease_secs``; if
+    renewal fails (the job was cancelled, or the lease lapsed and another
+    worker took it) execution is abandoned. A worker that dies simply stops
+    renewing, and the coordinator requeues the job once the lease expires.
+    """
+
+    def __init__(
+        self,
+        store: BaseStore,
+        services: dict[int, BaseDVMService],
+        worker_id: str,
+        *,
+        concurrency: int = 4,
+        lease_secs: float = 120,
+        poll_interval_secs: float = 1.0,
+    ) -> None:
+        self._store = store
+        self._services = services
+        self._worker_id = worker_id
+        self._concurrency = concurrency
+        self._lease_secs = lease_secs
+        self._poll_interval = poll_interval_secs
+        self._running: dict[str, asyncio.Task] = {}
+        self._task: asyncio.Task | None = None
+
+    @property
+    def active(self) -> int:
+        return len(self._running)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+        logger.info("worker_started", worker_id=self._worker_id, concurrency=self._concurrency)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+        for task in list(self._running.values()):
+            task.cancel()
+        # Leases of abandoned jobs lapse and the coordinator requeues them.
+        await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                leased = await self.poll_once()
+            except Exception:
+                logger.exception("worker_poll_failed", worker_id=self._worker_id)
+                leased = 0
+            if not leased:
+                await asyncio.sleep(self._poll_interval)
+
+    async def poll_once(self) -> int:
+        """Lease as many queued jobs as there are free slots and start them."""
+        free = self._concurrency - len(self._running)
+        if free <= 0:
+            return 0
+        rows = await self._store.lease_jobs(self._worker_id, self._lease_secs, free)
+        for row in rows:
+            event_id = row["event_id"]
+            task = asyncio.create_task(self._run(row))
+            self._running[event_id] = task
+            task.add_done_callback(lambda _, eid=event_id: self._running.pop(eid, None))
+        return len(rows)
+
+    async def _run(self, row: dict[str, Any]) -> None:
+        event_id = row["event_id"]
+        execution = asyncio.create_task(self._execute(row))
+        heartbeat = asyncio.create_task(self._heartbeat(event_id, execution))
+        try:
+            result, error = await execution
+        except asyncio.CancelledError:
+            logger.info("worker_job_abandoned", event_id=event_id)
+            return
+        finally:
+            heartbeat.cancel()
+            execution.cancel()
+
+        if not await self._store.finish_lease(event_id, self._worker_id, result=result, error=error):
+            logger.warning("worker_lease_lost", event_id=event_id)
+            return
+        logger.info("worker_job_executed", event_id=event_id, failed=error is not None)
+
+    async def _execute(self, row: dict[str, Any]) -> tuple[str | None, str | None]:
+        service = self._services.get(row["kind"])
+        if not service:
+            return None, "Service not found"
+        job_data = await self._store.get_payload(row["event_id"])
+        if job_data is None:
+            return None, "Job input missing"
+        try:
+            return await service.execute(job_data), None
+        except Exception as exc:
+            logger.exception("worker_job_failed", event_id=row["event_id"])
+            return None, str(exc)
+
+    async def _heartbeat(self, event_id: str, execution: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(self._lease_secs / 3)
+            try:
+                held = await self._store.renew_lease(event_id, self._worker_id, self._lease_secs)
+            except Exception:
+                logger.exception("worker_lease_renew_failed", event_id=event_id)
+                continue
+            if not held:
+                logger.info("worker_lease_revoked", event_id=event_id)
+                execution.cancel()
+                return
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Any
+
+
+class JobState(str, Enum):
+    RECEIVED = "received"
+    PAYMENT_REQUIRED = "payment_required"
+    WAITING_PAYMENT = "waiting_payment"
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    EXECUTED = "executed"
+    STREAMING = "streaming"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    EXPIRED = "expired"
+    CANCELLED = "cancelled"
+
+
+TERMINAL_STATES = frozenset({
+    JobState.COMPLETED,
+    JobState.FAILED,
+    JobState.EXPIRED,
+    JobState.CANCELLED,
+})
+
+# Columns update_state() may set besides state/updated_at.
+UPDATABLE_COLUMNS = frozenset({
+    "bolt11", "invoice_hash", "amount_msats", "result", "error", "input_data", "result_blob",
+})
+
+
+class BaseStore(ABC):
+    """Persistence interface for DVM job state.
+
+    Rows are plain dicts with the columns of the ``jobs`` table. Methods
+    that move a job between states conditionally (``claim_job``,
+    ``claim_jobs``, ``expire_job``) must be atomic, since several agent
+    processes may share one backend.
+    """
+
+    @abstractmethod
+    async def open(self) -> None: ...
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+    @abstractmethod
+    async def create_job(
+        self,
+        event_id: str,
+        customer_pubkey: str,
+        kind: int,
+        input_data: dict[str, Any] | None = None,
+    ) -> bool:
+        """Insert a RECEIVED job; False if the event id was already stored."""
+        ...
+
+    @abstractmethod
+    async def get_payload(self, event_id: str) -> dict[str, Any] | None:
+        """Decoded job_data for a job, or None if unknown."""
+
+    @abstractmethod
+    async def update_state(self, event_id: str, state: JobState, **extra: Any) -> None: ...
+
+    @abstractmethod
+    async def get_job(self, event_id: str) -> dict[str, Any] | None: ...
+
+    @abstractmethod
+    async def get_job_by_invoice(self, invoice_hash: str) -> dict[str, Any] | None: ...
+
+    @abstractmethod
+    async def get_jobs_in_state(self, state: JobState) -> list[dict[str, Any]]: ...
+
+    @abstractmethod
+    async def claim_job(self, event_id: str, from_state: JobState, to_state: JobState) -> bool:
+        """Move a job to ``to_state`` only if it is still in ``from_state``."""
+
+    @abstractmethod
+    async def claim_jobs(
+        self, from_state: JobState, to_state: JobState, limit: int
+    ) -> list[dict[str, Any]]:
+        """Atomically move up to ``limit`` of the oldest jobs in ``from_state``.
+
+        Returns the claimed rows; concurrent callers never claim the same job.
+        """
+
+    @abstractmethod
+    async def lease_jobs(self, owner: str, lease_secs: float, limit: int) -> list[dict[str, Any]]:
+        """Move up to ``limit`` QUEUED jobs to PROCESSING under a lease held by ``owner``."""
+
+    @abstractmethod
+    async def renew_lease(self, event_id: str, owner: str, lease_secs: float) -> bool:
+        """Extend a lease; False once the job was cancelled or re-leased elsewhere."""
+
+    @abstractmethod
+    async def finish_lease(
+        self,
+        event_id: str,
+        owner: str,
+        *,
+        result: str | None = None,
+        error: str | None = None,
+    ) -> bool:
+        """Hand a leased job's outcome back as EXECUTED, if ``owner`` still holds it."""
+
+    @abstractmethod
+    async def requeue_expired_leases(self) -> list[str]:
+        """Return PROCESSING jobs whose lease ran out to QUEUED."""
+
+    @abstractmethod
+    async def load_reputation(self) -> list[dict[str, Any]]:
+        """All persisted ``ReputationIndex`` rows."""
+
+    @abstractmethod
+    async def save_reputation(self, rows: list[dict[str, Any]]) -> None:
+        """Upsert ``ReputationIndex`` rows by pubkey."""
+
+    @abstractmethod
+    async def get_balance(self, pubkey: str) -> int | None:
+        """Prepaid credit in msats, or None if ``pubkey`` never topped up."""
+
+    @abstractmethod
+    async def credit(self, pubkey: str, amount_msats: int, reference: str) -> int | None:
+        """Add to a balance once per ``reference``; the new balance, or None if already applied."""
+
+    @abstractmethod
+    async def debit(self, pubkey: str, amount_msats: int, reference: str) -> int | None:
+        """Atomically take ``amount_msats`` if the balance covers it.
+
+        Returns the new balance, or None if the balance is short or
+        ``reference`` was already recorded.
+        """
+
+    async def expire_job(self, event_id: str) -> bool:
+        """Expire a single job if it is still waiting for payment."""
+        return await self.claim_job(event_id, JobState.WAITING_PAYMENT, JobState.EXPIRED)
+
+    @abstractmethod
+    async def expire_stale_jobs(self, timeout_secs: float) -> int: ...
+
+    @abstractmethod
+    async def get_archivable_jobs(self, cutoff: float, limit: int) -> list[dict[str, Any]]:
+        """Oldest terminal jobs last updated before ``cutoff``."""
+
+    @abstractmethod
+    async def delete_jobs(self, event_ids: list[str]) -> int: ...
+
+    @abstractmethod
+    async def blob_in_use(self, digest: str) -> bool:
+        """Whether any job's result is still the blob ``digest`` (indexed ``result_blob``)."""
+
+    @abstractmethod
+    async def compact(self, max_pages: int = 0) -> None:
+        """Return space freed by deleted jobs to the backend."""
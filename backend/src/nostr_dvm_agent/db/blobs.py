@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+from pathlib import Path
+
+import structlog
+
+logger = structlog.get_logger()
+
+DATA_URL_RE = re.compile(r"^data:([\w.+-]+/[\w.+-]+);base64,")
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+_MAGIC = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def sniff_mime(head: bytes) -> str:
+    for magic, mime in _MAGIC:
+        if head.startswith(magic):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def blob_url(public_url: str, digest: str) -> str:
+    return f"{public_url.rstrip('/')}/blobs/{digest}"
+
+
+def blob_digest(value: str, public_url: str) -> str | None:
+    """Digest of ``value`` if it is one of our blob URLs under ``public_url``."""
+    if not public_url:
+        return None
+    prefix = blob_url(public_url, "")
+    digest = value[len(prefix):] if value.startswith(prefix) else ""
+    return digest if DIGEST_RE.match(digest) else None
+
+
+def decode_data_url(value: str) -> tuple[str, bytes] | None:
+    """Return ``(mime, bytes)`` for a base64 data URL, or None if it isn't one."""
+    match = DATA_URL_RE.match(value)
+    if not match:
+        return None
+    try:
+        return match.group(1), base64.b64decode(value[match.end():], validate=True)
+    except ValueError:
+        return None
+
+
+def _write_atomic(target: Path, data: bytes) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class BlobStore:
+    """Content-addressed blob files on local disk, keyed by SHA-256.
+
+    Blobs are fanned out as ``<root>/ab/<digest>`` and written via a temp
+    file + rename, so concurrent writers of the same content are harmless.
+    The mime a blob was stored under is kept next to it in ``<digest>.mime``;
+    blobs without one are sniffed. Reads can be memory-mapped to avoid
+    copying large images into the heap.
+    """
+
+    def __init__(self, root: str, *, use_mmap: bool = True) -> None:
+        self._root = Path(root)
+        self._use_mmap = use_mmap
+        self._root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, digest: str) -> Path:
+        if not DIGEST_RE.match(digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return self._root / digest[:2] / digest
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).is_file()
+
+    def put(self, data: bytes, mime: str | None = None) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.path(digest)
+        if mime:
+            _write_atomic(target.with_name(f"{digest}.mime"), mime.encode())
+        if target.is_file():
+            # Mark it as in use again so garbage collection leaves it alone.
+            os.utime(target)
+            return digest
+
+        _write_atomic(target, data)
+        logger.info("blob_stored", digest=digest[:16], size=len(data))
+        return digest
+
+    def mime(self, digest: str) -> str:
+        """Mime the blob was stored under, else sniffed from its first bytes."""
+        path = self.path(digest)
+        try:
+            return path.with_name(f"{digest}.mime").read_text()
+        except FileNotFoundError:
+            pass
+        try:
+            with open(path, "rb") as fh:
+                return sniff_mime(fh.read(16))
+        except FileNotFoundError:
+            return "application/octet-stream"
+
+    def delete(self, digest: str, *, unused_since: float) -> bool:
+        """Remove a blob not stored again since ``unused_since`` (epoch seconds)."""
+        path = self.path(digest)
+        try:
+            if path.stat().st_mtime >= unused_since:
+                return False
+            path.unlink()
+        except FileNotFoundError:
+            return False
+        path.with_name(f"{digest}.mime").unlink(missing_ok=True)
+        logger.info("blob_deleted", digest=digest[:16])
+        return True
+
+    def read(self, digest: str) -> bytes | mmap.mmap | None:
+        """Blob contents, memory-mapped when enabled; None if missing."""
+        path = self.path(digest)
+        try:
+            with open(path, "rb") as fh:
+                if self._use_mmap and path.stat().st_size > 0:
+                    return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                return fh.read()
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from nostr_dvm_agent.config import Settings
+from nostr_dvm_agent.db.base import BaseStore
+from nostr_dvm_agent.db.store import Store
+
+
+def create_store(settings: Settings) -> BaseStore:
+    """Build the job store selected by ``settings.store_backend``."""
+    if settings.store_backend == "sqlite":
+        # Store caches live jobs in memory and assumes it is the only writer.
+        if settings.agent_role != "all":
+            raise ValueError(
+                f"AGENT_ROLE={settings.agent_role} needs a shared store; set STORE_BACKEND=postgres"
+            )
+        return Store(
+            settings.db_path,
+            read_pool_size=settings.sqlite_read_pool_size,
+            synchronous=settings.sqlite_synchronous,
+            cache_size=settings.sqlite_cache_size,
+            mmap_size=settings.sqlite_mmap_size,
+            busy_timeout_ms=settings.sqlite_busy_timeout_ms,
+        )
+    if settings.store_backend == "postgres":
+        if not settings.postgres_dsn:
+            raise ValueError("POSTGRES_DSN must be set when STORE_BACKEND=postgres")
+        from nostr_dvm_agent.db.postgres import PostgresStore
+
+        return PostgresStore(
+            settings.postgres_dsn,
+            min_size=settings.postgres_pool_min_size,
+            max_size=settings.postgres_pool_max_size,
+        )
+    raise ValueError(f"Unknown store backend: {settings.store_backend!r}")
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+import msgpack
+
+PAYLOAD_VERSION = 1
+
+# Fields services read from job_data. event_id, pubkey and kind have their
+# own columns and are re-attached on decode rather than stored twice.
+PAYLOAD_FIELDS = (
+    "content",
+    "inputs",
+    "params",
+    "output_mime",
+    "bid_msats",
+    "encrypted",
+    "topics",
+)
+
+
+def _defaults(event_id: str, pubkey: str, kind: int) -> dict[str, Any]:
+    return {
+        "event_id": event_id,
+        "pubkey": pubkey,
+        "kind": kind,
+        "content": "",
+        "inputs": [],
+        "params": {},
+        "output_mime": None,
+        "bid_msats": None,
+        "encrypted": False,
+    }
+
+
+def encode_payload(job_data: dict[str, Any]) -> bytes:
+    """Encode job_data as a version byte followed by a msgpack map.
+
+    Only ``PAYLOAD_FIELDS`` are kept, and empty values are dropped since
+    ``decode_payload`` restores them as defaults.
+    """
+    body = {
+        key: job_data[key]
+        for key in PAYLOAD_FIELDS
+        if job_data.get(key) not in (None, "", [], {}, False)
+    }
+    return bytes([PAYLOAD_VERSION]) + msgpack.packb(body, use_bin_type=True)
+
+
+def decode_payload(
+    raw: bytes | str | None,
+    *,
+    event_id: str,
+    pubkey: str,
+    kind: int,
+) -> dict[str, Any]:
+    """Rebuild job_data from a stored payload (binary, or legacy JSON text)."""
+    job_data = _defaults(event_id, pubkey, kind)
+    if not raw:
+        return job_data
+
+    if isinstance(raw, str):
+        job_data.update(json.loads(raw))
+        return job_data
+
+    version = raw[0]
+    if version != PAYLOAD_VERSION:
+        raise ValueError(f"Unsupported job payload version: {version}")
+    job_data.update(msgpack.unpackb(raw[1:], raw=False))
+    return job_data
@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+import structlog
+
+from nostr_dvm_agent.db.base import TERMINAL_STATES, UPDATABLE_COLUMNS, BaseStore, JobState
+from nostr_dvm_agent.db.payload import decode_payload, encode_payload
+
+try:
+    import asyncpg
+except ImportError:  # optional: pip install "nostr-dvm-agent[postgres]"
+    asyncpg = None
+
+logger = structlog.get_logger()
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        event_id        TEXT PRIMARY KEY,
+        customer_pubkey TEXT NOT NULL,
+        kind            INTEGER NOT NULL,
+        state           TEXT NOT NULL DEFAULT 'received',
+        input_data      BYTEA,
+        bolt11          TEXT,
+        invoice_hash    TEXT,
+        amount_msats    BIGINT,
+        result          TEXT,
+        error           TEXT,
+        created_at      DOUBLE PRECISION NOT NULL,
+        updated_at      DOUBLE PRECISION NOT NULL
+    );
+    ALTER TABLE jobs ADD COLUMN IF NOT EXISTS lease_owner TEXT;
+    ALTER TABLE jobs ADD COLUMN IF NOT EXISTS lease_expires DOUBLE PRECISION;
+    ALTER TABLE jobs ADD COLUMN IF NOT EXISTS result_blob TEXT;
+    CREATE INDEX IF NOT EXISTS idx_jobs_result_blob ON jobs(result_blob);
+    CREATE INDEX IF NOT EXISTS idx_jobs_invoice ON jobs(invoice_hash);
+    CREATE INDEX IF NOT EXISTS idx_jobs_state_updated ON jobs(state, updated_at);
+    CREATE TABLE IF NOT EXISTS credit_balances (
+        pubkey          TEXT PRIMARY KEY,
+        balance_msats   BIGINT NOT NULL,
+        updated_at      DOUBLE PRECISION NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS credit_ledger (
+        reference       TEXT PRIMARY KEY,
+        pubkey          TEXT NOT NULL,
+        delta_msats     BIGINT NOT NULL,
+        created_at      DOUBLE PRECISION NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_credit_ledger_pubkey ON credit_ledger(pubkey, created_at);
+    CREATE TABLE IF NOT EXISTS customer_reputation (
+        pubkey           TEXT PRIMARY KEY,
+        requested        INTEGER NOT NULL,
+        paid             INTEGER NOT NULL,
+        expired          INTEGER NOT NULL,
+        total_msats      BIGINT NOT NULL,
+        pay_latency_secs DOUBLE PRECISION
+    );
+"""
+
+
+class _AlreadyDebited(Exception):
+    """Raised inside a debit transaction to roll it back."""
+
+
+class PostgresStore(BaseStore):
+    """PostgreSQL-backed job store for running several agents on one database.
+
+    Unlike the SQLite ``Store`` there is no in-process row index, because
+    other agents may change any job at any time; every read goes to the
+    database through an asyncpg connection pool. Conditional transitions
+    are single ``UPDATE ... WHERE state = ...`` statements, and batch
+    claiming uses ``FOR UPDATE SKIP LOCKED`` so concurrent workers never
+    block on, or double-claim, the same rows.
+    """
+
+    def __init__(self, dsn: str, *, min_size: int = 2, max_size: int = 10) -> None:
+        if asyncpg is None:
+            raise RuntimeError(
+                'asyncpg is required for the postgres store: pip install "nostr-dvm-agent[postgres]"'
+            )
+        self._dsn = dsn
+        self._min_size = min_size
+        self._max_size = max_size
+        self._pool: asyncpg.Pool | None = None
+
+    async def open(self) -> None:
+        self._pool = await asyncpg.create_pool(
+            self._dsn, min_size=self._min_size, max_size=self._max_size
+        )
+        async with self._pool.acquire() as conn:
+            # Serialize schema creation between agents starting together.
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext('nostr_dvm_jobs'))")
+                await conn.execute(SCHEMA)
+        logger.info("postgres_store_opened", max_size=self._max_size)
+
+    async def close(self) -> None:
+        if self._pool:
+            await self._pool.close()
+
+    async def _fetchrow(self, sql: str, *args: Any) -> dict[str, Any] | None:
+        assert self._pool
+        row = await self._pool.fetchrow(sql, *args)
+        return dict(row) if row else None
+
+    async def _fetch(self, sql: str, *args: Any) -> list[dict[str, Any]]:
+        assert self._pool
+        return [dict(r) for r in await self._pool.fetch(sql, *args)]
+
+    async def create_job(
+        self,
+        event_id: str,
+        customer_pubkey: str,
+        kind: int,
+        input_data: dict[str, Any] | None = None,
+    ) -> bool:
+        assert self._pool
+        now = time.time()
+        payload = encode_payload(input_data) if input_data else None
+        status = await self._pool.execute(
+            """INSERT INTO jobs
+               (event_id, customer_pubkey, kind, state, input_data, created_at, updated_at)
+               VALUES ($1, $2, $3, $4, $5, $6, $6)
+               ON CONFLICT (event_id) DO NOTHING""",
+            event_id, customer_pubkey, kind, JobState.RECEIVED.value, payload, now,
+        )
+        # Command tag is "INSERT 0 <rows>"; zero rows means the conflict fired.
+        return status == "INSERT 0 1"
+
+    async def get_payload(self, event_id: str) -> dict[str, Any] | None:
+        row = await self._fetchrow(
+            "SELECT customer_pubkey, kind, input_data FROM jobs WHERE event_id = $1", event_id
+        )
+        if not row:
+            return None
+        return decode_payload(
+            row["input_data"],
+            event_id=event_id,
+            pubkey=row["customer_pubkey"],
+            kind=row["kind"],
+        )
+
+    async def update_state(self, event_id: str, state: JobState, **extra: Any) -> None:
+        assert self._pool
+        sets = ["state = $1", "updated_at = $2"]
+        params: list[Any] = [state.value, time.time()]
+        for key, val in extra.items():
+            if key not in UPDATABLE_COLUMNS:
+                raise ValueError(f"Disallowed column name: {key}")
+            params.append(val)
+            sets.append(f"{key} = ${len(params)}")
+        params.append(event_id)
+        await self._pool.execute(
+            f"UPDATE jobs SET {', '.join(sets)} WHERE event_id = ${len(params)}", *params
+        )
+
+    async def get_job(self, event_id: str) -> dict[str, Any] | None:
+        return await self._fetchrow("SELECT * FROM jobs WHERE event_id = $1", event_id)
+
+    async def get_job_by_invoice(self, invoice_hash: str) -> dict[str, Any] | None:
+        return await self._fetchrow("SELECT * FROM jobs WHERE invoice_hash = $1", invoice_hash)
+
+    async def get_jobs_in_state(self, state: JobState) -> list[dict[str, Any]]:
+        return await self._fetch("SELECT * FROM jobs WHERE state = $1", state.value)
+
+    async def claim_job(self, event_id: str, from_state: JobState, to_state: JobState) -> bool:
+        row = await self._fetchrow(
+            """UPDATE jobs SET state = $1, updated_at = $2
+               WHERE event_id = $3 AND state = $4
+               RETURNING event_id""",
+            to_state.value, time.time(), event_id, from_state.value,
+        )
+        return row is not None
+
+    async def claim_jobs(
+        self, from_state: JobState, to_state: JobState, limit: int
+    ) -> list[dict[str, Any]]:
+        return await self._fetch(
+            """WITH claimable AS (
+                   SELECT event_id FROM jobs WHERE state = $1
+                   ORDER BY updated_at LIMIT $2
+                   FOR UPDATE SKIP LOCKED
+               )
+               UPDATE jobs SET state = $3, updated_at = $4
+               FROM claimable WHERE jobs.event_id = claimable.event_id
+               RETURNING jobs.*""",
+            from_state.value, limit, to_state.value, time.time(),
+        )
+
+    async def lease_jobs(self, owner: str, lease_secs: float, limit: int) -> list[dict[str, Any]]:
+        now = time.time()
+        return await self._fetch(
+            """WITH claimable AS (
+                   SELECT event_id FROM jobs WHERE state = $1
+                   ORDER BY updated_at LIMIT $2
+                   FOR UPDATE SKIP LOCKED
+               )
+               UPDATE jobs SET state = $3, lease_owner = $4, lease_expires = $5, updated_at = $6
+               FROM claimable WHERE jobs.event_id = claimable.event_id
+               RETURNING jobs.*""",
+            JobState.QUEUED.value, limit, JobState.PROCESSING.value, owner, now + lease_secs, now,
+        )
+
+    async def renew_lease(self, event_id: str, owner: str, lease_secs: float) -> bool:
+        row = await self._fetchrow(
+            """UPDATE jobs SET lease_expires = $1
+               WHERE event_id = $2 AND lease_owner = $3 AND state = $4
+               RETURNING event_id""",
+            time.time() + lease_secs, event_id, owner, JobState.PROCESSING.value,
+        )
+        return row is not None
+
+    async def finish_lease(
+        self,
+        event_id: str,
+        owner: str,
+        *,
+        result: str | None = None,
+        error: str | None = None,
+    ) -> bool:
+        row = await self._fetchrow(
+            """UPDATE jobs SET state = $1, result = $2, error = $3, lease_expires = NULL,
+                   updated_at = $4
+               WHERE event_id = $5 AND lease_owner = $6 AND state = $7
+               RETURNING event_id""",
+            JobState.EXECUTED.value, result, error, time.time(), event_id, owner,
+            JobState.PROCESSING.value,
+        )
+        return row is not None
+
+    async def requeue_expired_leases(self) -> list[str]:
+        now = time.time()
+        rows = await self._fetch(
+            """UPDATE jobs SET state = $1, lease_owner = NULL, lease_expires = NULL, updated_at = $2
+               WHERE state = $3 AND lease_expires < $2
+               RETURNING event_id""",
+            JobState.QUEUED.value, now, JobState.PROCESSING.value,
+        )
+        return [r["event_id"] for r in rows]
+
+    async def load_reputation(self) -> list[dict[str, Any]]:
+        return await self._fetch("SELECT * FROM customer_reputation")
+
+    async def save_reputation(self, rows: list[dict[str, Any]]) -> None:
+        assert self._pool
+        await self._pool.executemany(
+            """INSERT INTO customer_reputation
+               (pubkey, requested, paid, expired, total_msats, pay_latency_secs)
+               VALUES ($1, $2, $3, $4, $5, $6)
+               ON CONFLICT (pubkey) DO UPDATE SET
+                   requested = EXCLUDED.requested,
+                   paid = EXCLUDED.paid,
+                   expired = EXCLUDED.expired,
+                   total_msats = EXCLUDED.total_msats,
+                   pay_latency_secs = EXCLUDED.pay_latency_secs""",
+            [
+                (r["pubkey"], r["requested"], r["paid"], r["expired"],
+                 r["total_msats"], r["pay_latency_secs"])
+                for r in rows
+            ],
+        )
+
+    async def get_balance(self, pubkey: str) -> int | None:
+        row = await self._fetchrow(
+            "SELECT balance_msats FROM credit_balances WHERE pubkey = $1", pubkey
+        )
+        return row["balance_msats"] if row else None
+
+    async def credit(self, pubkey: str, amount_msats: int, reference: str) -> int | None:
+        assert self._pool
+        now = time.time()
+        async with self._pool.acquire() as conn, conn.transaction():
+            status = await conn.execute(
+                """INSERT INTO credit_ledger (reference, pubkey, delta_msats, created_at)
+                   VALUES ($1, $2, $3, $4) ON CONFLICT (reference) DO NOTHING""",
+                reference, pubkey, amount_msats, now,
+            )
+            if status.endswith(" 0"):
+                return None
+            return await conn.fetchval(
+                """INSERT INTO credit_balances (pubkey, balance_msats, updated_at)
+                   VALUES ($1, $2, $3)
+                   ON CONFLICT (pubkey) DO UPDATE SET
+                       balance_msats = credit_balances.balance_msats + EXCLUDED.balance_msats,
+                       updated_at = EXCLUDED.updated_at
+                   RETURNING balance_msats""",
+                pubkey, amount_msats, now,
+            )
+
+    async def debit(self, pubkey: str, amount_msats: int, reference: str) -> int | None:
+        assert self._pool
+        now = time.time()
+        async with self._pool.acquire() as conn:
+            try:
+                async with conn.transaction():
+                    balance = await conn.fetchval(
+                        """UPDATE credit_balances
+                           SET balance_msats = balance_msats - $1, updated_at = $2
+                           WHERE pubkey = $3 AND balance_msats >= $1
+                           RETURNING balance_msats""",
+                        amount_msats, now, pubkey,
+                    )
+                    if balance is None:
+                        return None
+                    status = await conn.execute(
+                        """INSERT INTO credit_ledger (reference, pubkey, delta_msats, created_at)
+                           VALUES ($1, $2, $3, $4) ON CONFLICT (reference) DO NOTHING""",
+                        reference, pubkey, -amount_msats, now,
+                    )
+                    if status.endswith(" 0"):
+                        raise _AlreadyDebited
+                    return balance
+            except _AlreadyDebited:
+                return None
+
+    async def expire_stale_jobs(self, timeout_secs: float) -> int:
+        now = time.time()
+        rows = await self._fetch(
+            """UPDATE jobs SET state = $1, updated_at = $2
+               WHERE state = $3 AND updated_at < $4
+               RETURNING event_id""",
+            JobState.EXPIRED.value, now, JobState.WAITING_PAYMENT.value, now - timeout_secs,
+        )
+        return len(rows)
+
+    async def get_archivable_jobs(self, cutoff: float, limit: int) -> list[dict[str, Any]]:
+        return await self._fetch(
+            """SELECT * FROM jobs
+               WHERE state = ANY($1::text[]) AND updated_at < $2
+               ORDER BY updated_at LIMIT $3""",
+            [s.value for s in TERMINAL_STATES], cutoff, limit,
+        )
+
+    async def delete_jobs(self, event_ids: list[str]) -> int:
+        assert self._pool
+        if not event_ids:
+            return 0
+        status = await self._pool.execute(
+            "DELETE FROM jobs WHERE event_id = ANY($1::text[])", event_ids
+        )
+        return int(status.split()[-1])
+
+    async def blob_in_use(self, digest: str) -> bool:
+        row = await self._fetchrow("SELECT 1 FROM jobs WHERE result_blob = $1 LIMIT 1", digest)
+        return row is not None
+
+    async def compact(self, max_pages: int = 0) -> None:
+        """Plain VACUUM so freed tuples are reused; ``max_pages`` has no equivalent here."""
+        assert self._pool
+        await self._pool.execute("VACUUM (ANALYZE) jobs")
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import io
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+import structlog
+
+from nostr_dvm_agent.db.base import BaseStore
+from nostr_dvm_agent.db.blobs import BlobStore, blob_digest
+from nostr_dvm_agent.db.payload import decode_payload
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install "nostr-dvm-agent[archive]"
+    zstandard = None
+
+logger = structlog.get_logger()
+
+SECONDS_PER_DAY = 86400
+
+
+def _compressed_writer(raw: io.BufferedWriter) -> io.TextIOWrapper:
+    """Text writer compressing into ``raw``; closing it leaves ``raw`` open."""
+    if zstandard is not None:
+        stream = zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False)
+    else:
+        stream = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+    return io.TextIOWrapper(stream, encoding="utf-8")
+
+
+def read_segment(path: str | Path) -> Iterator[dict[str, Any]]:
+    """Yield archived job rows from a ``.jsonl.zst`` or ``.jsonl.gz`` segment."""
+    path = Path(path)
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read .zst archive segments")
+        with open(path, "rb") as raw:
+            reader = zstandard.ZstdDecompressor().stream_reader(raw)
+            for line in io.TextIOWrapper(reader, encoding="utf-8"):
+                yield json.loads(line)
+    else:
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                yield json.loads(line)
+
+
+class RetentionManager:
+    """Moves old terminal jobs from the hot table into compressed archive segments.
+
+    Each batch is written to a new JSONL segment (zstd if ``zstandard`` is
+    installed, gzip otherwise), fsynced and atomically renamed into place
+    before its rows are deleted, so a crash can at worst duplicate a batch
+    in the archive, never lose it. Blobs whose URL only archived jobs held
+    are deleted (encrypted results hide their URL, so theirs are kept).
+    After a pass that archived anything the store is compacted
+    (incremental vacuum + WAL truncate).
+    """
+
+    def __init__(
+        self,
+        store: BaseStore,
+        archive_dir: str,
+        retention_days: float,
+        *,
+        interval_secs: float = 3600,
+        batch_size: int = 500,
+        blobs: BlobStore | None = None,
+        blob_public_url: str = "",
+    ) -> None:
+        self._store = store
+        self._blobs = blobs
+        self._blob_public_url = blob_public_url
+        self._archive_dir = Path(archive_dir)
+        self._retention_secs = retention_days * SECONDS_PER_DAY
+        self._interval = interval_secs
+        self._batch_size = batch_size
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._retention_secs <= 0:
+            logger.info("retention_disabled")
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("retention_pass_failed")
+            await asyncio.sleep(self._interval)
+
+    async def run_once(self) -> int:
+        cutoff = time.time() - self._retention_secs
+        archived = blobs_deleted = 0
+        while True:
+            rows = await self._store.get_archivable_jobs(cutoff, self._batch_size)
+            if not rows:
+                break
+            path = await asyncio.to_thread(self._write_segment, rows)
+            await self._store.delete_jobs([r["event_id"] for r in rows])
+            archived += len(rows)
+            logger.info("jobs_archived", count=len(rows), segment=path.name)
+            blobs_deleted += await self._delete_unreferenced_blobs(rows, cutoff)
+
+        if archived:
+            await self._store.compact()
+            logger.info("retention_pass_complete", archived=archived, blobs_deleted=blobs_deleted)
+        return archived
+
+    async def _delete_unreferenced_blobs(self, rows: list[dict[str, Any]], cutoff: float) -> int:
+        if self._blobs is None:
+            return 0
+        # Encrypted results hold the URL as ciphertext, so result_blob is the
+        # reference; the URL itself covers rows written before that column.
+        digests = {
+            digest
+            for row in rows
+            if (digest := row.get("result_blob")
+                or blob_digest(row.get("result") or "", self._blob_public_url))
+        }
+        deleted = 0
+        for digest in digests:
+            if await self._store.blob_in_use(digest):
+                continue
+            # A blob stored again since the cutoff belongs to a newer job.
+            if await asyncio.to_thread(self._blobs.delete, digest, unused_since=cutoff):
+                deleted += 1
+        return deleted
+
+    @staticmethod
+    def _archivable(row: dict[str, Any]) -> dict[str, Any]:
+        """Row with its binary payload expanded so archives stay plain JSON."""
+        if isinstance(row.get("input_data"), bytes):
+            row = dict(row)
+            row["input_data"] = decode_payload(
+                row["input_data"],
+                event_id=row["event_id"],
+                pubkey=row["customer_pubkey"],
+                kind=row["kind"],
+            )
+        return row
+
+    def _write_segment(self, rows: list[dict[str, Any]]) -> Path:
+        self._archive_dir.mkdir(parents=True, exist_ok=True)
+        suffix = ".jsonl.zst" if zstandard is not None else ".jsonl.gz"
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        name = f"jobs-{stamp}-{rows[0]['event_id'][:8]}{suffix}"
+        final = self._archive_dir / name
+        tmp = self._archive_dir / f"{name}.tmp"
+
+        with open(tmp, "wb") as raw:
+            with _compressed_writer(raw) as fh:
+                for row in rows:
+                    fh.write(json.dumps(self._archivable(row), separators=(",", ":")) + "\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, final)
+        return final
@@ -1,41 +1,122 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import time
-from enum import Enum
-from typing import Any
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator
 
 import aiosqlite
+import structlog
 
+from nostr_dvm_agent.db.base import TERMINAL_STATES, UPDATABLE_COLUMNS, BaseStore, JobState
+from nostr_dvm_agent.db.payload import decode_payload, encode_payload
 
-class JobState(str, Enum):
-    RECEIVED = "received"
-    PAYMENT_REQUIRED = "payment_required"
-    WAITING_PAYMENT = "waiting_payment"
-    PROCESSING = "processing"
-    STREAMING = "streaming"
-    COMPLETED = "completed"
-    FAILED = "failed"
-    EXPIRED = "expired"
+logger = structlog.get_logger()
 
+# Pages released per incremental_vacuum call, so other writes interleave.
+VACUUM_STEP_PAGES = 256
 
-class Store:
-    """SQLite-backed persistence for DVM job state."""
 
-    def __init__(self, db_path: str = "dvm_agent.db") -> None:
+class Store(BaseStore):
+    """SQLite-backed persistence for DVM job state.
+
+    Rows of non-terminal jobs are mirrored in memory, keyed by event id and
+    invoice hash, and kept coherent by every write method, so lookups on the
+    payment-confirmation path never touch disk. Terminal jobs are read
+    through to SQLite.
+
+    Writes go through one dedicated connection; reads that miss the index
+    use a small pool of read-only WAL connections, each on its own
+    aiosqlite thread, so lookups and scans never queue behind commits.
+
+    The in-memory index assumes this process is the database's only
+    writer; multi-process deployments use ``PostgresStore`` instead.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "dvm_agent.db",
+        *,
+        read_pool_size: int = 2,
+        synchronous: str = "NORMAL",
+        cache_size: int = -16384,
+        mmap_size: int = 0,
+        busy_timeout_ms: int = 5000,
+    ) -> None:
         self._db_path = db_path
         self._db: aiosqlite.Connection | None = None
+        self._read_pool_size = read_pool_size if db_path != ":memory:" else 0
+        self._readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._reader_conns: list[aiosqlite.Connection] = []
+        self._synchronous = synchronous
+        self._cache_size = cache_size
+        self._mmap_size = mmap_size
+        self._busy_timeout_ms = busy_timeout_ms
+        # Decoded payloads of jobs not yet finished, so the
+        # request -> payment -> execute path never re-reads input_data.
+        self._payloads: dict[str, dict[str, Any]] = {}
+        self._live: dict[str, dict[str, Any]] = {}
+        self._by_invoice: dict[str, str] = {}
 
     async def open(self) -> None:
         self._db = await aiosqlite.connect(self._db_path)
         self._db.row_factory = aiosqlite.Row
+        # Only takes effect on a fresh database; vacuum() converts old ones.
+        await self._db.execute("PRAGMA auto_vacuum=INCREMENTAL")
         await self._db.execute("PRAGMA journal_mode=WAL")
+        await self._db.execute(f"PRAGMA synchronous={self._synchronous}")
+        await self._apply_common_pragmas(self._db)
         await self._migrate()
 
+        uri = f"{Path(self._db_path).resolve().as_uri()}?mode=ro"
+        for _ in range(self._read_pool_size):
+            conn = await aiosqlite.connect(uri, uri=True)
+            conn.row_factory = aiosqlite.Row
+            await self._apply_common_pragmas(conn)
+            await conn.execute("PRAGMA query_only=ON")
+            self._reader_conns.append(conn)
+            self._readers.put_nowait(conn)
+
+        await self._load_live_jobs()
+
+    async def _apply_common_pragmas(self, conn: aiosqlite.Connection) -> None:
+        await conn.execute(f"PRAGMA busy_timeout={int(self._busy_timeout_ms)}")
+        await conn.execute(f"PRAGMA cache_size={int(self._cache_size)}")
+        await conn.execute(f"PRAGMA mmap_size={int(self._mmap_size)}")
+
     async def close(self) -> None:
+        for conn in self._reader_conns:
+            await conn.close()
+        self._reader_conns.clear()
         if self._db:
             await self._db.close()
 
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a read-only connection, or the writer if there is no pool."""
+        if not self._reader_conns:
+            assert self._db
+            yield self._db
+            return
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    async def _fetchone(self, sql: str, params: tuple[Any, ...] = ()) -> dict[str, Any] | None:
+        async with self._reader() as conn:
+            cursor = await conn.execute(sql, params)
+            row = await cursor.fetchone()
+        return dict(row) if row else None
+
+    async def _fetchall(self, sql: str, params: tuple[Any, ...] = ()) -> list[dict[str, Any]]:
+        async with self._reader() as conn:
+            cursor = await conn.execute(sql, params)
+            rows = await cursor.fetchall()
+        return [dict(r) for r in rows]
+
     async def _migrate(self) -> None:
         assert self._db
         await self._db.executescript("""
@@ -51,34 +132,127 @@ class Store:
                 result         TEXT,
                 error          TEXT,
                 created_at     REAL NOT NULL,
-                updated_at     REAL NOT NULL
+                updated_at     REAL NOT NULL,
+                lease_owner    TEXT,
+                lease_expires  REAL,
+                result_blob    TEXT
             );
             CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state);
             CREATE INDEX IF NOT EXISTS idx_jobs_invoice ON jobs(invoice_hash);
+            CREATE INDEX IF NOT EXISTS idx_jobs_state_updated ON jobs(state, updated_at);
+            CREATE TABLE IF NOT EXISTS credit_balances (
+                pubkey         TEXT PRIMARY KEY,
+                balance_msats  INTEGER NOT NULL,
+                updated_at     REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS credit_ledger (
+                reference      TEXT PRIMARY KEY,
+                pubkey         TEXT NOT NULL,
+                delta_msats    INTEGER NOT NULL,
+                created_at     REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_credit_ledger_pubkey ON credit_ledger(pubkey, created_at);
+            CREATE TABLE IF NOT EXISTS customer_reputation (
+                pubkey           TEXT PRIMARY KEY,
+                requested        INTEGER NOT NULL,
+                paid             INTEGER NOT NULL,
+                expired          INTEGER NOT NULL,
+                total_msats      INTEGER NOT NULL,
+                pay_latency_secs REAL
+            );
         """)
+        cursor = await self._db.execute("PRAGMA table_info(jobs)")
+        columns = {row["name"] for row in await cursor.fetchall()}
+        for column, ddl in (
+            ("lease_owner", "TEXT"), ("lease_expires", "REAL"), ("result_blob", "TEXT"),
+        ):
+            if column not in columns:
+                await self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {ddl}")
+        await self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_result_blob ON jobs(result_blob)"
+        )
         await self._db.commit()
 
+    async def _load_live_jobs(self) -> None:
+        assert self._db
+        states = [s.value for s in TERMINAL_STATES]
+        placeholders = ", ".join("?" for _ in states)
+        cursor = await self._db.execute(
+            f"SELECT * FROM jobs WHERE state NOT IN ({placeholders})", states
+        )
+        for row in await cursor.fetchall():
+            self._index(dict(row))
+
+    def _index(self, row: dict[str, Any]) -> None:
+        self._live[row["event_id"]] = row
+        if row.get("invoice_hash"):
+            self._by_invoice[row["invoice_hash"]] = row["event_id"]
+
+    def _evict(self, event_id: str) -> None:
+        row = self._live.pop(event_id, None)
+        if row and row.get("invoice_hash"):
+            self._by_invoice.pop(row["invoice_hash"], None)
+        self._payloads.pop(event_id, None)
+
     async def create_job(
         self,
         event_id: str,
         customer_pubkey: str,
         kind: int,
         input_data: dict[str, Any] | None = None,
-    ) -> None:
+    ) -> bool:
         assert self._db
         now = time.time()
-        await self._db.execute(
+        payload = encode_payload(input_data) if input_data else None
+        cursor = await self._db.execute(
             """INSERT OR IGNORE INTO jobs
                (event_id, customer_pubkey, kind, state, input_data, created_at, updated_at)
                VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (event_id, customer_pubkey, kind, JobState.RECEIVED.value,
-             json.dumps(input_data) if input_data else None, now, now),
+            (event_id, customer_pubkey, kind, JobState.RECEIVED.value, payload, now, now),
         )
         await self._db.commit()
+        if cursor.rowcount <= 0:
+            return False
+        self._index({
+            "event_id": event_id,
+            "customer_pubkey": customer_pubkey,
+            "kind": kind,
+            "state": JobState.RECEIVED.value,
+            "input_data": payload,
+            "bolt11": None,
+            "invoice_hash": None,
+            "amount_msats": None,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "lease_owner": None,
+            "lease_expires": None,
+            "result_blob": None,
+        })
+        self._payloads[event_id] = decode_payload(
+            payload, event_id=event_id, pubkey=customer_pubkey, kind=kind
+        )
+        return True
 
-    _ALLOWED_COLUMNS = frozenset({
-        "bolt11", "invoice_hash", "amount_msats", "result", "error", "input_data",
-    })
+    async def get_payload(self, event_id: str) -> dict[str, Any] | None:
+        """Decoded job_data for a job, served from memory while the job is live."""
+        cached = self._payloads.get(event_id)
+        if cached is not None:
+            return dict(cached)
+
+        row = await self._fetchone(
+            "SELECT customer_pubkey, kind, input_data FROM jobs WHERE event_id = ?",
+            (event_id,),
+        )
+        if not row:
+            return None
+        return decode_payload(
+            row["input_data"],
+            event_id=event_id,
+            pubkey=row["customer_pubkey"],
+            kind=row["kind"],
+        )
 
     async def update_state(
         self,
@@ -87,10 +261,11 @@ class Store:
         **extra: Any,
     ) -> None:
         assert self._db
+        now = time.time()
         sets = ["state = ?", "updated_at = ?"]
-        params: list[Any] = [state.value, time.time()]
+        params: list[Any] = [state.value, now]
         for key, val in extra.items():
-            if key not in self._ALLOWED_COLUMNS:
+            if key not in UPDATABLE_COLUMNS:
                 raise ValueError(f"Disallowed column name: {key}")
             sets.append(f"{key} = ?")
             params.append(val)
@@ -101,33 +276,295 @@ class Store:
         )
         await self._db.commit()
 
+        if "input_data" in extra:
+            self._payloads.pop(event_id, None)
+        if state in TERMINAL_STATES:
+            self._evict(event_id)
+            return
+        row = self._live.get(event_id)
+        if row is not None:
+            old_invoice = row.get("invoice_hash")
+            row.update(extra, state=state.value, updated_at=now)
+            if old_invoice and old_invoice != row.get("invoice_hash"):
+                self._by_invoice.pop(old_invoice, None)
+            self._index(row)
+
     async def get_job(self, event_id: str) -> dict[str, Any] | None:
+        live = self._live.get(event_id)
+        if live is not None:
+            return dict(live)
+        return await self._fetchone("SELECT * FROM jobs WHERE event_id = ?", (event_id,))
+
+    async def get_job_by_invoice(self, invoice_hash: str) -> dict[str, Any] | None:
+        event_id = self._by_invoice.get(invoice_hash)
+        if event_id is not None:
+            return dict(self._live[event_id])
+        return await self._fetchone("SELECT * FROM jobs WHERE invoice_hash = ?", (invoice_hash,))
+
+    async def get_jobs_in_state(self, state: JobState) -> list[dict[str, Any]]:
+        return await self._fetchall("SELECT * FROM jobs WHERE state = ?", (state.value,))
+
+    async def claim_job(self, event_id: str, from_state: JobState, to_state: JobState) -> bool:
         assert self._db
-        cursor = await self._db.execute("SELECT * FROM jobs WHERE event_id = ?", (event_id,))
+        now = time.time()
+        cursor = await self._db.execute(
+            "UPDATE jobs SET state = ?, updated_at = ? WHERE event_id = ? AND state = ?",
+            (to_state.value, now, event_id, from_state.value),
+        )
+        await self._db.commit()
+        if not cursor.rowcount:
+            return False
+        if to_state in TERMINAL_STATES:
+            self._evict(event_id)
+        elif event_id in self._live:
+            self._live[event_id].update(state=to_state.value, updated_at=now)
+        return True
+
+    async def claim_jobs(
+        self, from_state: JobState, to_state: JobState, limit: int
+    ) -> list[dict[str, Any]]:
+        assert self._db
+        # A single UPDATE takes SQLite's write lock, so the subquery and the
+        # update are atomic with respect to other writers.
+        cursor = await self._db.execute(
+            """UPDATE jobs SET state = ?, updated_at = ?
+               WHERE event_id IN (
+                   SELECT event_id FROM jobs WHERE state = ?
+                   ORDER BY updated_at LIMIT ?
+               )
+               RETURNING *""",
+            (to_state.value, time.time(), from_state.value, limit),
+        )
+        claimed = [dict(row) for row in await cursor.fetchall()]
+        await self._db.commit()
+        for row in claimed:
+            if to_state in TERMINAL_STATES:
+                self._evict(row["event_id"])
+            else:
+                self._index(row)
+        return claimed
+
+    async def lease_jobs(self, owner: str, lease_secs: float, limit: int) -> list[dict[str, Any]]:
+        assert self._db
+        now = time.time()
+        cursor = await self._db.execute(
+            """UPDATE jobs SET state = ?, lease_owner = ?, lease_expires = ?, updated_at = ?
+               WHERE event_id IN (
+                   SELECT event_id FROM jobs WHERE state = ?
+                   ORDER BY updated_at LIMIT ?
+               )
+               RETURNING *""",
+            (JobState.PROCESSING.value, owner, now + lease_secs, now, JobState.QUEUED.value, limit),
+        )
+        leased = [dict(row) for row in await cursor.fetchall()]
+        await self._db.commit()
+        for row in leased:
+            self._index(row)
+        return leased
+
+    async def renew_lease(self, event_id: str, owner: str, lease_secs: float) -> bool:
+        assert self._db
+        cursor = await self._db.execute(
+            """UPDATE jobs SET lease_expires = ?
+               WHERE event_id = ? AND lease_owner = ? AND state = ?""",
+            (time.time() + lease_secs, event_id, owner, JobState.PROCESSING.value),
+        )
+        await self._db.commit()
+        return cursor.rowcount > 0
+
+    async def finish_lease(
+        self,
+        event_id: str,
+        owner: str,
+        *,
+        result: str | None = None,
+        error: str | None = None,
+    ) -> bool:
+        assert self._db
+        now = time.time()
+        cursor = await self._db.execute(
+            """UPDATE jobs SET state = ?, result = ?, error = ?, lease_expires = NULL, updated_at = ?
+               WHERE event_id = ? AND lease_owner = ? AND state = ?""",
+            (JobState.EXECUTED.value, result, error, now, event_id, owner, JobState.PROCESSING.value),
+        )
+        await self._db.commit()
+        if not cursor.rowcount:
+            return False
+        # The job is the coordinator's again; don't keep its result in memory here.
+        self._evict(event_id)
+        return True
+
+    async def requeue_expired_leases(self) -> list[str]:
+        assert self._db
+        now = time.time()
+        cursor = await self._db.execute(
+            """UPDATE jobs SET state = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?
+               WHERE state = ? AND lease_expires < ?
+               RETURNING event_id""",
+            (JobState.QUEUED.value, now, JobState.PROCESSING.value, now),
+        )
+        requeued = [row["event_id"] for row in await cursor.fetchall()]
+        await self._db.commit()
+        for event_id in requeued:
+            row = self._live.get(event_id)
+            if row is not None:
+                row.update(
+                    state=JobState.QUEUED.value, lease_owner=None, lease_expires=None,
+                    updated_at=now,
+                )
+        return requeued
+
+    async def load_reputation(self) -> list[dict[str, Any]]:
+        return await self._fetchall("SELECT * FROM customer_reputation")
+
+    async def save_reputation(self, rows: list[dict[str, Any]]) -> None:
+        assert self._db
+        await self._db.executemany(
+            """INSERT OR REPLACE INTO customer_reputation
+               (pubkey, requested, paid, expired, total_msats, pay_latency_secs)
+               VALUES (:pubkey, :requested, :paid, :expired, :total_msats, :pay_latency_secs)""",
+            rows,
+        )
+        await self._db.commit()
+
+    async def get_balance(self, pubkey: str) -> int | None:
+        row = await self._fetchone(
+            "SELECT balance_msats FROM credit_balances WHERE pubkey = ?", (pubkey,)
+        )
+        return row["balance_msats"] if row else None
+
+    async def credit(self, pubkey: str, amount_msats: int, reference: str) -> int | None:
+        assert self._db
+        now = time.time()
+        cursor = await self._db.execute(
+            """INSERT OR IGNORE INTO credit_ledger (reference, pubkey, delta_msats, created_at)
+               VALUES (?, ?, ?, ?)""",
+            (reference, pubkey, amount_msats, now),
+        )
+        if not cursor.rowcount:
+            return None
+        cursor = await self._db.execute(
+            """INSERT INTO credit_balances (pubkey, balance_msats, updated_at) VALUES (?, ?, ?)
+               ON CONFLICT(pubkey) DO UPDATE SET
+                   balance_msats = balance_msats + excluded.balance_msats,
+                   updated_at = excluded.updated_at
+               RETURNING balance_msats""",
+            (pubkey, amount_msats, now),
+        )
         row = await cursor.fetchone()
-        return dict(row) if row else None
+        await self._db.commit()
+        return row["balance_msats"]
 
-    async def get_job_by_invoice(self, invoice_hash: str) -> dict[str, Any] | None:
+    async def debit(self, pubkey: str, amount_msats: int, reference: str) -> int | None:
         assert self._db
+        now = time.time()
+        # The balance check and the subtraction are one statement, so two
+        # debits racing for the same balance can't both succeed.
         cursor = await self._db.execute(
-            "SELECT * FROM jobs WHERE invoice_hash = ?", (invoice_hash,)
+            """UPDATE credit_balances SET balance_msats = balance_msats - ?, updated_at = ?
+               WHERE pubkey = ? AND balance_msats >= ?
+               RETURNING balance_msats""",
+            (amount_msats, now, pubkey, amount_msats),
         )
         row = await cursor.fetchone()
-        return dict(row) if row else None
+        if row is None:
+            await self._db.commit()
+            return None
+        cursor = await self._db.execute(
+            """INSERT OR IGNORE INTO credit_ledger (reference, pubkey, delta_msats, created_at)
+               VALUES (?, ?, ?, ?)""",
+            (reference, pubkey, -amount_msats, now),
+        )
+        if not cursor.rowcount:
+            await self._db.execute(
+                "UPDATE credit_balances SET balance_msats = balance_msats + ? WHERE pubkey = ?",
+                (amount_msats, pubkey),
+            )
+            await self._db.commit()
+            return None
+        await self._db.commit()
+        return row["balance_msats"]
 
-    async def get_jobs_in_state(self, state: JobState) -> list[dict[str, Any]]:
+    async def get_archivable_jobs(self, cutoff: float, limit: int) -> list[dict[str, Any]]:
+        """Oldest terminal jobs last updated before ``cutoff``."""
+        states = [s.value for s in TERMINAL_STATES]
+        placeholders = ", ".join("?" for _ in states)
+        return await self._fetchall(
+            f"""SELECT * FROM jobs
+                WHERE state IN ({placeholders}) AND updated_at < ?
+                ORDER BY updated_at LIMIT ?""",
+            (*states, cutoff, limit),
+        )
+
+    async def delete_jobs(self, event_ids: list[str]) -> int:
         assert self._db
-        cursor = await self._db.execute("SELECT * FROM jobs WHERE state = ?", (state.value,))
-        rows = await cursor.fetchall()
-        return [dict(r) for r in rows]
+        if not event_ids:
+            return 0
+        placeholders = ", ".join("?" for _ in event_ids)
+        cursor = await self._db.execute(
+            f"DELETE FROM jobs WHERE event_id IN ({placeholders})", event_ids
+        )
+        await self._db.commit()
+        for event_id in event_ids:
+            self._evict(event_id)
+        return cursor.rowcount
+
+    async def blob_in_use(self, digest: str) -> bool:
+        row = await self._fetchone("SELECT 1 FROM jobs WHERE result_blob = ? LIMIT 1", (digest,))
+        return row is not None
+
+    async def compact(self, max_pages: int = 0) -> None:
+        """Return up to ``max_pages`` free pages (0: all) to the filesystem and truncate the WAL.
+
+        Pages are released ``VACUUM_STEP_PAGES`` at a time, so writes queued
+        behind compaction wait for one step, not the whole pass. Databases
+        created before incremental auto-vacuum was enabled only get the WAL
+        truncated until ``vacuum()`` converts them.
+        """
+        assert self._db
+        cursor = await self._db.execute("PRAGMA auto_vacuum")
+        row = await cursor.fetchone()
+        if row and row[0] != 2:
+            logger.warning("sqlite_needs_offline_vacuum", db=self._db_path)
+        else:
+            freed, free = 0, None
+            while not max_pages or freed < max_pages:
+                cursor = await self._db.execute("PRAGMA freelist_count")
+                remaining = (await cursor.fetchone())[0]
+                if not remaining or (free is not None and remaining >= free):
+                    break
+                free = remaining
+                step = min(VACUUM_STEP_PAGES, free, max_pages - freed if max_pages else free)
+                # execute() steps a pragma only once (one page); executescript runs it to the end.
+                await self._db.executescript(f"PRAGMA incremental_vacuum({step});")
+                freed += step
+        cursor = await self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        await cursor.fetchall()
+
+    async def vacuum(self) -> None:
+        """Rebuild the database with incremental auto-vacuum enabled.
+
+        A full VACUUM rewrites the whole file while holding the write lock,
+        so this is a maintenance step (``scripts/vacuum_db.py``), run while
+        the agent is stopped.
+        """
+        assert self._db
+        await self._db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        await self._db.execute("VACUUM")
+        cursor = await self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        await cursor.fetchall()
 
     async def expire_stale_jobs(self, timeout_secs: float) -> int:
         assert self._db
         cutoff = time.time() - timeout_secs
         cursor = await self._db.execute(
             """UPDATE jobs SET state = ?, updated_at = ?
-               WHERE state = ? AND updated_at < ?""",
+               WHERE state = ? AND updated_at < ?
+               RETURNING event_id""",
             (JobState.EXPIRED.value, time.time(), JobState.WAITING_PAYMENT.value, cutoff),
         )
+        expired = [row["event_id"] for row in await cursor.fetchall()]
         await self._db.commit()
-        return cursor.rowcount
+        for event_id in expired:
+            self._evict(event_id)
+        return len(expired)
@@ -2,19 +2,25 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import os
 import signal
+import socket
 import sys
 
 import structlog
 
-from nostr_dvm_agent.advertising.nip89 import publish_handler_info
+from nostr_dvm_agent.advertising.nip89 import HandlerAdvertiser
 from nostr_dvm_agent.ai.gemini_client import GeminiClient
 from nostr_dvm_agent.config import Settings
+from nostr_dvm_agent.core.blob_server import BlobServer
+from nostr_dvm_agent.core.cpu_executor import CpuExecutor
 from nostr_dvm_agent.core.nostr_client import NostrClient
 from nostr_dvm_agent.core.state_machine import StateMachine
-from nostr_dvm_agent.db.store import Store
+from nostr_dvm_agent.core.worker import JobWorker
+from nostr_dvm_agent.db.blobs import BlobStore
+from nostr_dvm_agent.db.factory import create_store
+from nostr_dvm_agent.db.retention import RetentionManager
 from nostr_dvm_agent.payment.lightning import LightningClient
-from nostr_dvm_agent.payment.zap_verifier import verify_zap_receipt
 from nostr_dvm_agent.services.base import BaseDVMService
 from nostr_dvm_agent.services.discovery import DiscoveryService
 from nostr_dvm_agent.services.image_generation import ImageGenerationService
@@ -39,29 +45,106 @@ def configure_logging(level: str) -> None:
     )
 
 
-def build_services(settings: Settings, gemini: GeminiClient) -> dict[int, BaseDVMService]:
+def build_cpu_executor(settings: Settings) -> CpuExecutor:
+    return CpuExecutor(
+        thread_workers=settings.cpu_thread_workers,
+        process_workers=settings.cpu_process_workers,
+        thread_min_bytes=settings.cpu_thread_min_bytes,
+        process_min_bytes=settings.cpu_process_min_bytes,
+    )
+
+
+def build_services(
+    settings: Settings, gemini: GeminiClient, cpu: CpuExecutor
+) -> dict[int, BaseDVMService]:
     return {
         5000: TranslationService(gemini, settings.cost_translation_msats),
         5001: TextGenerationService(gemini, settings.cost_text_generation_msats),
-        5002: TextExtractionService(gemini, settings.cost_text_extraction_msats),
+        5002: TextExtractionService(gemini, settings.cost_text_extraction_msats, cpu=cpu),
         5100: ImageGenerationService(gemini, settings.cost_image_generation_msats),
         5300: DiscoveryService(gemini, settings.default_cost_msats),
     }
 
 
+async def _wait_for_shutdown_signal() -> None:
+    shutdown_event = asyncio.Event()
+
+    def _signal_handler():
+        logger.info("shutdown_signal_received")
+        shutdown_event.set()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, _signal_handler)
+    await shutdown_event.wait()
+
+
+async def run_worker(settings: Settings) -> None:
+    """Execution-only process: leases queued jobs from the shared store."""
+    store = create_store(settings)
+    await store.open()
+
+    cpu = build_cpu_executor(settings)
+    gemini = GeminiClient(settings, cpu=cpu)
+    services = build_services(settings, gemini, cpu)
+    worker = JobWorker(
+        store,
+        services,
+        settings.worker_id or f"{socket.gethostname()}-{os.getpid()}",
+        concurrency=settings.worker_concurrency,
+        lease_secs=settings.worker_lease_secs,
+        poll_interval_secs=settings.worker_poll_interval_secs,
+    )
+    worker.start()
+
+    await _wait_for_shutdown_signal()
+
+    logger.info("shutting_down")
+    await worker.stop()
+    cpu.shutdown()
+    await store.close()
+    logger.info("worker_stopped")
+
+
 async def run() -> None:
     settings = Settings()
     configure_logging(settings.log_level)
 
-    logger.info("starting_sats_ai_agent", lightning=settings.lightning_address)
+    if settings.agent_role == "worker":
+        await run_worker(settings)
+        return
+
+    logger.info(
+        "starting_sats_ai_agent",
+        lightning=settings.lightning_address,
+        role=settings.agent_role,
+    )
 
-    store = Store(settings.db_path)
+    store = create_store(settings)
     await store.open()
 
-    gemini = GeminiClient(settings)
+    blobs: BlobStore | None = None
+    blob_server: BlobServer | None = None
+    if settings.blob_public_url:
+        blobs = BlobStore(settings.blob_dir, use_mmap=settings.blob_mmap)
+        blob_server = BlobServer(blobs, settings.blob_http_host, settings.blob_http_port)
+        await blob_server.start()
+
+    retention = RetentionManager(
+        store,
+        settings.archive_dir,
+        settings.retention_days,
+        interval_secs=settings.retention_interval_secs,
+        batch_size=settings.retention_batch_size,
+        blobs=blobs,
+        blob_public_url=settings.blob_public_url,
+    )
+
+    cpu = build_cpu_executor(settings)
+    gemini = GeminiClient(settings, cpu=cpu)
     lightning = LightningClient(settings)
     nostr = NostrClient(settings)
-    services = build_services(settings, gemini)
+    services = build_services(settings, gemini, cpu)
 
     state_machine = StateMachine(
         settings=settings,
@@ -69,26 +152,41 @@ async def run() -> None:
         store=store,
         lightning=lightning,
         services=services,
+        blobs=blobs,
+        cpu=cpu,
+        router=gemini.router,
     )
 
     async def on_job_request(event):
         await state_machine.handle_job_request(event)
 
-    async def on_zap_receipt(event):
-        zap_data = verify_zap_receipt(event)
-        if zap_data and zap_data.get("event_id"):
-            job = await store.get_job(zap_data["event_id"])
-            if job and job.get("invoice_hash"):
-                await state_machine.handle_payment_confirmed(job["invoice_hash"])
-
     nostr.on_job_request(on_job_request)
-    nostr.on_zap_receipt(on_zap_receipt)
+    nostr.on_zap_receipt(state_machine.handle_zap_receipt)
+    nostr.on_deletion(state_machine.handle_deletion)
 
     await nostr.connect()
     await nostr.subscribe()
     await state_machine.start()
-
-    await publish_handler_info(nostr, services, settings.lightning_address)
+    retention.start()
+
+    # A coordinator's router sees no Gemini calls (workers make them), so its
+    # circuit breakers never trip and can't be used to withdraw services.
+    def availability(service: BaseDVMService) -> bool:
+        return settings.agent_role == "coordinator" or gemini.router.task_available(service.task)
+
+    advertiser = HandlerAdvertiser(
+        nostr,
+        services,
+        settings.lightning_address,
+        load=state_machine.load,
+        availability=availability,
+        price=state_machine.pricing.advertised_price if state_machine.pricing else None,
+        interval_secs=settings.advertise_interval_secs,
+        check_secs=settings.advertise_check_secs,
+        busy_wait_secs=settings.advertise_busy_wait_secs,
+    )
+    await advertiser.refresh(force=True)
+    advertiser.start()
 
     logger.info(
         "agent_ready",
@@ -97,18 +195,8 @@ async def run() -> None:
         relays=settings.relay_url_list,
     )
 
-    shutdown_event = asyncio.Event()
-
-    def _signal_handler():
-        logger.info("shutdown_signal_received")
-        shutdown_event.set()
-
-    loop = asyncio.get_running_loop()
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, _signal_handler)
-
     event_loop_task = asyncio.create_task(nostr.run_event_loop())
-    shutdown_task = asyncio.create_task(shutdown_event.wait())
+    shutdown_task = asyncio.create_task(_wait_for_shutdown_signal())
 
     done, pending = await asyncio.wait(
         [event_loop_task, shutdown_task],
@@ -119,9 +207,14 @@ async def run() -> None:
     for task in pending:
         task.cancel()
 
+    retention.stop()
+    advertiser.stop()
     await state_machine.stop()
     await nostr.disconnect()
     await lightning.close()
+    cpu.shutdown()
+    if blob_server:
+        await blob_server.stop()
     await store.close()
 
     logger.info("agent_stopped")
@@ -63,6 +63,11 @@ class LightningClient:
             logger.exception("lnurlp_fetch_failed", url=url)
             return None
 
+    async def zapper_pubkey(self) -> str | None:
+        """Key our LNURL provider signs zap receipts with (``nostrPubkey``), if it supports zaps."""
+        meta = await self._fetch_lnurlp_metadata()
+        return meta.get("nostrPubkey") if meta else None
+
     async def create_invoice(self, amount_msats: int, description: str = "") -> dict[str, Any] | None:
         meta = await self._fetch_lnurlp_metadata()
         if not meta:
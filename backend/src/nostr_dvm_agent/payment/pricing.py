@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import math
+import time
+from typing import Callable
+
+import structlog
+
+from nostr_dvm_agent.ai.model_router import ModelRouter
+from nostr_dvm_agent.config import Settings
+from nostr_dvm_agent.services.base import BaseDVMService
+
+logger = structlog.get_logger()
+
+ADVERTISED_STEP = 0.25
+
+LoadFn = Callable[[], tuple[int, float]]
+
+
+class PricingEngine:
+    """Scales quoted prices per service kind with load on us and on Gemini.
+
+    The target multiplier is ``1 + queue + latency + quota`` where each term
+    is zero in normal operation:
+
+    * queue: outstanding paid jobs beyond ``job_capacity``, per capacity;
+    * latency: how far the service's preferred model's latency EWMA is
+      above ``pricing_latency_target_secs``, relative to the target;
+    * quota: calls per minute to that model above half of
+      ``gemini_rpm_limit`` (disabled when the limit is 0).
+
+    Each term has a weight, the result is clamped to the configured
+    floor/ceiling, and the applied multiplier follows the target with
+    time-based exponential smoothing so a single burst doesn't whipsaw
+    quotes.
+
+    A coordinator's Gemini calls run in its workers, so its own router never
+    sees latency or quota; there only the queue term applies.
+    """
+
+    def __init__(self, settings: Settings, load: LoadFn, router: ModelRouter) -> None:
+        self._settings = settings
+        self._load = load
+        self._router = router
+        self._multipliers: dict[int, tuple[float, float]] = {}
+
+    def target_multiplier(self, service: BaseDVMService) -> float:
+        s = self._settings
+        depth, _ = self._load()
+        capacity = max(1, s.job_capacity)
+        queue = max(0.0, depth / capacity - 1.0)
+
+        latency = quota = 0.0
+        if s.agent_role != "coordinator":
+            model = self._router.preferred_model(service.task, 0)
+            stats = self._router.stats(model)
+            if stats.latency_ewma is not None and s.pricing_latency_target_secs > 0:
+                latency = max(0.0, stats.latency_ewma / s.pricing_latency_target_secs - 1.0)
+            if s.gemini_rpm_limit > 0:
+                usage = self._router.calls_per_minute(model) / s.gemini_rpm_limit
+                quota = max(0.0, usage - 0.5) * 2
+
+        raw = (
+            1.0
+            + s.pricing_queue_weight * queue
+            + s.pricing_latency_weight * latency
+            + s.pricing_quota_weight * quota
+        )
+        return min(s.pricing_max_multiplier, max(s.pricing_min_multiplier, raw))
+
+    def multiplier(self, service: BaseDVMService) -> float:
+        """Smoothed multiplier for ``service``, advanced to now."""
+        target = self.target_multiplier(service)
+        now = time.monotonic()
+        previous = self._multipliers.get(service.kind)
+        if previous is None:
+            current = target
+        else:
+            value, updated = previous
+            tau = self._settings.pricing_smoothing_secs
+            alpha = 1.0 if tau <= 0 else 1.0 - math.exp(-(now - updated) / tau)
+            current = value + alpha * (target - value)
+        self._multipliers[service.kind] = (current, now)
+        return current
+
+    def quote(self, service: BaseDVMService, base_msats: int) -> int:
+        """Price to invoice for a job whose unsurged cost is ``base_msats``."""
+        multiplier = self.multiplier(service)
+        if multiplier > 1.0:
+            logger.info("surge_pricing", kind=service.kind, multiplier=round(multiplier, 2))
+        return round(base_msats * multiplier)
+
+    def advertised_price(self, service: BaseDVMService) -> int:
+        """Base price at the current multiplier, in coarse steps to limit republishing."""
+        step = round(self.multiplier(service) / ADVERTISED_STEP) * ADVERTISED_STEP
+        return round(service.default_cost_msats * step)
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from typing import Any
+
+import structlog
+from nostr_sdk import Event
+
+from nostr_dvm_agent.core.cpu_executor import CpuExecutor
+from nostr_dvm_agent.payment.zap_verifier import verify_zap_receipt
+
+logger = structlog.get_logger()
+
+MAX_CACHED_RECEIPTS = 4096
+BATCH_WINDOW_SECS = 0.01
+MAX_BATCH = 64
+
+
+def verify_zap_receipts(events: list[Event]) -> list[dict[str, Any] | None]:
+    return [verify_zap_receipt(event) for event in events]
+
+
+class ZapReceiptCache:
+    """Verifies each zap receipt once and indexes the valid ones.
+
+    The same receipt arrives from every relay we're connected to. Results
+    (including rejections) are cached by receipt id, and concurrent copies
+    of a receipt still being verified share one verification. Receipts that
+    arrive within ``batch_window_secs`` of each other are verified together
+    in a single executor call. Valid receipts are indexed by the job they
+    reference (``e`` tag) and by bolt11, so a job can find a receipt that
+    arrived before it was ready to accept payment.
+    """
+
+    def __init__(
+        self,
+        cpu: CpuExecutor | None = None,
+        *,
+        max_entries: int = MAX_CACHED_RECEIPTS,
+        batch_window_secs: float = BATCH_WINDOW_SECS,
+        max_batch: int = MAX_BATCH,
+    ) -> None:
+        self._cpu = cpu or CpuExecutor()
+        self._max_entries = max_entries
+        self._batch_window = batch_window_secs
+        self._max_batch = max_batch
+        self._verified: OrderedDict[str, dict[str, Any] | None] = OrderedDict()
+        self._by_job: dict[str, dict[str, Any]] = {}
+        self._by_bolt11: dict[str, dict[str, Any]] = {}
+        self._pending: dict[str, asyncio.Future[dict[str, Any] | None]] = {}
+        self._batch: list[tuple[str, Event]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+
+    def __len__(self) -> int:
+        return len(self._verified)
+
+    def find_by_job(self, event_id: str) -> dict[str, Any] | None:
+        return self._by_job.get(event_id)
+
+    def find_by_bolt11(self, bolt11: str) -> dict[str, Any] | None:
+        return self._by_bolt11.get(bolt11)
+
+    async def verify(self, event: Event) -> dict[str, Any] | None:
+        """Verified zap data for ``event``, or None if the receipt is invalid."""
+        receipt_id = event.id().to_hex()
+        if receipt_id in self._verified:
+            self._verified.move_to_end(receipt_id)
+            return self._verified[receipt_id]
+
+        fut = self._pending.get(receipt_id)
+        if fut is None:
+            fut = asyncio.get_running_loop().create_future()
+            self._pending[receipt_id] = fut
+            self._enqueue(receipt_id, event)
+        return await asyncio.shield(fut)
+
+    def _enqueue(self, receipt_id: str, event: Event) -> None:
+        self._batch.append((receipt_id, event))
+        if len(self._batch) >= self._max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self._batch_window, self._flush
+            )
+
+    def _flush(self) -> None:
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._batch = self._batch, []
+        if batch:
+            asyncio.create_task(self._verify_batch(batch))
+
+    async def _verify_batch(self, batch: list[tuple[str, Event]]) -> None:
+        try:
+            results = await self._cpu.run_thread(
+                verify_zap_receipts, [event for _, event in batch]
+            )
+        except Exception as exc:
+            logger.exception("zap_batch_verification_failed", size=len(batch))
+            for receipt_id, _ in batch:
+                fut = self._pending.pop(receipt_id)
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+
+        for (receipt_id, _), zap in zip(batch, results):
+            self._remember(receipt_id, zap)
+            fut = self._pending.pop(receipt_id)
+            if not fut.done():
+                fut.set_result(zap)
+        if len(batch) > 1:
+            logger.debug("zap_batch_verified", size=len(batch))
+
+    def _remember(self, receipt_id: str, zap: dict[str, Any] | None) -> None:
+        self._verified[receipt_id] = zap
+        if zap:
+            if zap.get("event_id"):
+                self._by_job[zap["event_id"]] = zap
+            self._by_bolt11[zap["bolt11"]] = zap
+
+        while len(self._verified) > self._max_entries:
+            _, old = self._verified.popitem(last=False)
+            if not old:
+                continue
+            if old.get("event_id") and self._by_job.get(old["event_id"]) is old:
+                del self._by_job[old["event_id"]]
+            if self._by_bolt11.get(old["bolt11"]) is old:
+                del self._by_bolt11[old["bolt11"]]
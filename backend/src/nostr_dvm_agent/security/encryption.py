@@ -3,6 +3,8 @@ from __future__ import annotations
 import structlog
 from nostr_sdk import Event, Keys, PublicKey, nip44_decrypt, nip44_encrypt
 
+from nostr_dvm_agent.security.nip44 import ConversationKeyCache
+
 logger = structlog.get_logger()
 
 
@@ -15,10 +17,22 @@ def is_encrypted(event: Event) -> bool:
     return False
 
 
-def decrypt_content(keys: Keys, sender_pubkey: PublicKey, ciphertext: str) -> str | None:
-    """Decrypt NIP-44 v2 encrypted content using ECDH shared secret."""
+def decrypt_content(
+    keys: Keys,
+    sender_pubkey: PublicKey,
+    ciphertext: str,
+    cache: ConversationKeyCache | None = None,
+) -> str | None:
+    """Decrypt NIP-44 v2 encrypted content using ECDH shared secret.
+
+    With a ``cache``, the conversation key for ``sender_pubkey`` is reused
+    instead of recomputing the ECDH.
+    """
     try:
-        plaintext = nip44_decrypt(keys.secret_key(), sender_pubkey, ciphertext)
+        if cache is not None:
+            plaintext = cache.decrypt(sender_pubkey.to_hex(), ciphertext)
+        else:
+            plaintext = nip44_decrypt(keys.secret_key(), sender_pubkey, ciphertext)
         logger.debug("nip44_decrypted", plaintext_len=len(plaintext))
         return plaintext
     except Exception:
@@ -26,10 +40,18 @@ def decrypt_content(keys: Keys, sender_pubkey: PublicKey, ciphertext: str) -> st
         return None
 
 
-def encrypt_content(keys: Keys, recipient_pubkey: PublicKey, plaintext: str) -> str | None:
+def encrypt_content(
+    keys: Keys,
+    recipient_pubkey: PublicKey,
+    plaintext: str,
+    cache: ConversationKeyCache | None = None,
+) -> str | None:
     """Encrypt content using NIP-44 v2 for the recipient."""
     try:
-        ciphertext = nip44_encrypt(keys.secret_key(), recipient_pubkey, plaintext)
+        if cache is not None:
+            ciphertext = cache.encrypt(recipient_pubkey.to_hex(), plaintext)
+        else:
+            ciphertext = nip44_encrypt(keys.secret_key(), recipient_pubkey, plaintext)
         logger.debug("nip44_encrypted", ciphertext_len=len(ciphertext))
         return ciphertext
     except Exception:
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms
+from nostr_sdk import Keys
+
+VERSION = 2
+SALT = b"nip44-v2"
+MIN_PLAINTEXT = 1
+MAX_PLAINTEXT = 65535
+
+
+def conversation_key(secret_key: ec.EllipticCurvePrivateKey, pubkey_hex: str) -> bytearray:
+    """HKDF-extract(salt="nip44-v2", ikm=ECDH x-coordinate) for an x-only pubkey."""
+    peer = ec.EllipticCurvePublicKey.from_encoded_point(
+        ec.SECP256K1(), b"\x02" + bytes.fromhex(pubkey_hex)
+    )
+    shared_x = bytearray(secret_key.exchange(ec.ECDH(), peer))
+    try:
+        return bytearray(hmac.digest(SALT, shared_x, hashlib.sha256))
+    finally:
+        shared_x[:] = bytes(len(shared_x))
+
+
+def _message_keys(conv_key: bytearray, nonce: bytes) -> tuple[bytes, bytes, bytes]:
+    # HKDF-expand to 76 bytes: 32 chacha key, 12 chacha nonce, 32 hmac key.
+    okm = b""
+    block = b""
+    counter = 1
+    while len(okm) < 76:
+        block = hmac.digest(conv_key, block + nonce + bytes([counter]), hashlib.sha256)
+        okm += block
+        counter += 1
+    return okm[:32], okm[32:44], okm[44:76]
+
+
+def _padded_len(n: int) -> int:
+    if n <= 32:
+        return 32
+    next_power = 1 << (n - 1).bit_length()
+    chunk = 32 if next_power <= 256 else next_power // 8
+    return chunk * ((n - 1) // chunk + 1)
+
+
+def payload_len(plaintext_bytes: int) -> int:
+    """Length of the base64 payload ``encrypt`` produces for a plaintext of this size."""
+    raw = 1 + 32 + 2 + _padded_len(plaintext_bytes) + 32
+    return 4 * ((raw + 2) // 3)
+
+
+def max_plaintext_for(payload_bytes: int) -> int:
+    """Largest plaintext, in UTF-8 bytes, whose payload fits in ``payload_bytes`` (0 if none)."""
+    lo, hi = 0, MAX_PLAINTEXT
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if payload_len(mid) <= payload_bytes:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _chacha20(key: bytes, nonce: bytes, data: bytes) -> bytes:
+    # cryptography takes a 16-byte nonce: 4-byte little-endian counter (0) + 12-byte nonce.
+    cipher = Cipher(algorithms.ChaCha20(key, b"\x00\x00\x00\x00" + nonce), mode=None)
+    return cipher.encryptor().update(data)
+
+
+def encrypt(conv_key: bytearray, plaintext: str, nonce: bytes | None = None) -> str:
+    raw = plaintext.encode()
+    if not MIN_PLAINTEXT <= len(raw) <= MAX_PLAINTEXT:
+        raise ValueError(f"NIP-44 plaintext must be 1..65535 bytes, got {len(raw)}")
+    nonce = nonce or os.urandom(32)
+    chacha_key, chacha_nonce, hmac_key = _message_keys(conv_key, nonce)
+    padded = struct.pack(">H", len(raw)) + raw + bytes(_padded_len(len(raw)) - len(raw))
+    ciphertext = _chacha20(chacha_key, chacha_nonce, padded)
+    mac = hmac.digest(hmac_key, nonce + ciphertext, hashlib.sha256)
+    return base64.b64encode(bytes([VERSION]) + nonce + ciphertext + mac).decode()
+
+
+def decrypt(conv_key: bytearray, payload: str) -> str:
+    if not payload or payload[0] == "#":
+        raise ValueError("Unknown NIP-44 payload version")
+    if not 132 <= len(payload) <= 87472:
+        raise ValueError("Invalid NIP-44 payload size")
+    data = base64.b64decode(payload, validate=True)
+    if data[0] != VERSION:
+        raise ValueError(f"Unsupported NIP-44 version: {data[0]}")
+
+    nonce, ciphertext, mac = data[1:33], data[33:-32], data[-32:]
+    chacha_key, chacha_nonce, hmac_key = _message_keys(conv_key, nonce)
+    expected = hmac.digest(hmac_key, nonce + ciphertext, hashlib.sha256)
+    if not hmac.compare_digest(mac, expected):
+        raise ValueError("Invalid NIP-44 MAC")
+
+    padded = _chacha20(chacha_key, chacha_nonce, ciphertext)
+    (length,) = struct.unpack(">H", padded[:2])
+    if not MIN_PLAINTEXT <= length or len(padded) != 2 + _padded_len(length):
+        raise ValueError("Invalid NIP-44 padding")
+    return padded[2:2 + length].decode()
+
+
+class ConversationKeyCache:
+    """Per-counterparty NIP-44 conversation keys for our own secret key.
+
+    Deriving a conversation key costs an ECDH; the message keys derived
+    from it per nonce are cheap. Keys are held in ``bytearray``s in an LRU
+    bounded by ``max_entries`` and dropped after ``ttl_secs`` without use,
+    and are overwritten with zeros when evicted (best effort: CPython may
+    still hold transient copies inside hashing calls). The lock is held
+    only to look a key up; encryption and decryption work on a private
+    copy, zeroed afterwards, so eviction never zeroes a key mid-use and
+    concurrent messages do not queue behind each other's ChaCha20. The
+    ECDH on a miss also runs outside the lock. Safe to call from executor
+    threads.
+    """
+
+    def __init__(self, keys: Keys, *, max_entries: int = 1024, ttl_secs: float = 3600) -> None:
+        self._keys = keys
+        self._secret: ec.EllipticCurvePrivateKey | None = None
+        self._max_entries = max_entries
+        self._ttl = ttl_secs
+        self._entries: OrderedDict[str, tuple[bytearray, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, pubkey_hex: str) -> bool:
+        return pubkey_hex in self._entries
+
+    def encrypt(self, pubkey_hex: str, plaintext: str) -> str:
+        conv_key = self._copy(pubkey_hex)
+        try:
+            return encrypt(conv_key, plaintext)
+        finally:
+            conv_key[:] = bytes(len(conv_key))
+
+    def decrypt(self, pubkey_hex: str, payload: str) -> str:
+        conv_key = self._copy(pubkey_hex)
+        try:
+            return decrypt(conv_key, payload)
+        finally:
+            conv_key[:] = bytes(len(conv_key))
+
+    def clear(self) -> None:
+        with self._lock:
+            for key, _ in self._entries.values():
+                key[:] = bytes(len(key))
+            self._entries.clear()
+
+    def _copy(self, pubkey_hex: str) -> bytearray:
+        """A private copy of the conversation key; the caller zeroes it after use."""
+        derived = self._derive_if_missing(pubkey_hex)
+        with self._lock:
+            return bytearray(self._checkout(pubkey_hex, derived))
+
+    def _derive_if_missing(self, pubkey_hex: str) -> bytearray | None:
+        with self._lock:
+            if pubkey_hex in self._entries:
+                return None
+            if self._secret is None:
+                self._secret = ec.derive_private_key(
+                    int(self._keys.secret_key().to_hex(), 16), ec.SECP256K1()
+                )
+            secret = self._secret
+        return conversation_key(secret, pubkey_hex)
+
+    def _checkout(self, pubkey_hex: str, derived: bytearray | None) -> bytearray:
+        """Return the live key for ``pubkey_hex``, inserting ``derived``; caller holds the lock."""
+        now = time.monotonic()
+        self._prune(now)
+        entry = self._entries.get(pubkey_hex)
+        if entry is None:
+            if derived is None:
+                # Evicted between derivation check and use; derive under the lock.
+                assert self._secret is not None
+                derived = conversation_key(self._secret, pubkey_hex)
+            entry = (derived, now)
+        elif derived is not None:
+            derived[:] = bytes(len(derived))
+        self._entries[pubkey_hex] = (entry[0], now)
+        self._entries.move_to_end(pubkey_hex)
+        while len(self._entries) > self._max_entries:
+            _, (old, _) = self._entries.popitem(last=False)
+            old[:] = bytes(len(old))
+        return entry[0]
+
+    def _prune(self, now: float) -> None:
+        # Entries are in last-use order, so expired ones are all at the front.
+        while self._entries:
+            pubkey_hex, (key, last_used) = next(iter(self._entries.items()))
+            if now - last_used < self._ttl:
+                break
+            del self._entries[pubkey_hex]
+            key[:] = bytes(len(key))
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import sys
 from abc import ABC, abstractmethod
 from typing import Any
 
@@ -11,10 +12,32 @@ class BaseDVMService(ABC):
     name: str
     description: str
     default_cost_msats: int
+    # Gemini routing task; advertised availability follows its circuit breakers.
+    task: str = "generate"
+    # Answers may be reused for near-duplicate prompts when the customer allows it.
+    cacheable: bool = False
+    # (token threshold, price multiplier) pairs, checked largest first.
+    token_tiers: tuple[tuple[int, int], ...] = ()
+
+    def price_for_tokens(
+        self, tokens: int, tiers: tuple[tuple[int, int], ...] | None = None
+    ) -> int:
+        """Apply ``tiers`` (this service's token tiers by default) to its base price."""
+        for threshold, multiplier in self.token_tiers if tiers is None else tiers:
+            if tokens > threshold:
+                return self.default_cost_msats * multiplier
+        return self.default_cost_msats
+
+    def max_price(self) -> int:
+        """Top-tier price, for jobs whose input is not known when they are quoted."""
+        return self.price_for_tokens(sys.maxsize)
 
     @abstractmethod
     async def validate_input(self, job_data: dict[str, Any]) -> bool:
-        """Check that the job request has valid inputs for this service."""
+        """Check that the job request has valid inputs for this service.
+
+        Raise ValueError instead of returning False to refuse with a reason.
+        """
         ...
 
     @abstractmethod
@@ -12,6 +12,10 @@ class DiscoveryService(BaseDVMService):
     name = "Content Discovery"
     description = "Search and curate content using AI"
     default_cost_msats = 500
+    cacheable = True
+    # Discovery is a text generation with a short wrapper prompt, so it
+    # shares TextGenerationService's tiers.
+    token_tiers = ((2600, 3), (1100, 2))
 
     def __init__(self, gemini: GeminiClient, cost_msats: int = 500) -> None:
         self._gemini = gemini
@@ -22,7 +26,10 @@ class DiscoveryService(BaseDVMService):
         return len(text.strip()) > 0
 
     async def estimate_cost(self, job_data: dict[str, Any]) -> int:
-        return self.default_cost_msats
+        query = get_primary_input_text(job_data)
+        params = job_data.get("params", {})
+        tokens = self._gemini.estimate_job_tokens(query, params, task="generate")
+        return self.price_for_tokens(tokens)
 
     async def execute(self, job_data: dict[str, Any]) -> str:
         query = get_primary_input_text(job_data)
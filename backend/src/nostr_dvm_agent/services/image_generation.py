@@ -12,6 +12,10 @@ class ImageGenerationService(BaseDVMService):
     name = "Image Generation"
     description = "Text-to-image generation powered by Gemini"
     default_cost_msats = 2000
+    task = "image"
+    # The image itself is billed per picture; only the prompt varies, and it
+    # is usually a few dozen tokens, so only very long prompts cost more.
+    token_tiers = ((1000, 2),)
 
     def __init__(self, gemini: GeminiClient, cost_msats: int = 2000) -> None:
         self._gemini = gemini
@@ -22,7 +26,10 @@ class ImageGenerationService(BaseDVMService):
         return len(text.strip()) > 0
 
     async def estimate_cost(self, job_data: dict[str, Any]) -> int:
-        return self.default_cost_msats
+        prompt = get_primary_input_text(job_data)
+        params = job_data.get("params", {})
+        tokens = self._gemini.estimate_job_tokens(prompt, params, task="image")
+        return self.price_for_tokens(tokens)
 
     async def execute(self, job_data: dict[str, Any]) -> str:
         prompt = get_primary_input_text(job_data)
@@ -14,6 +14,10 @@ class SummarizationService(BaseDVMService):
     name = "Summarization"
     description = "Text summarization powered by Gemini 3 Pro"
     default_cost_msats = 400
+    task = "summarize"
+    # The old input-only tiers (5000 and 1000 tokens) plus the typical
+    # 300-token summary that estimate_job_tokens now adds.
+    token_tiers = ((5300, 3), (1300, 2))
 
     def __init__(self, gemini: GeminiClient, cost_msats: int = 400) -> None:
         self._gemini = gemini
@@ -21,16 +25,16 @@ class SummarizationService(BaseDVMService):
 
     async def validate_input(self, job_data: dict[str, Any]) -> bool:
         text = get_primary_input_text(job_data)
+        # Refused at quote time rather than summarizing only part of it.
+        self._gemini.check_summarizable(len(text))
         return len(text.strip()) > 0
 
     async def estimate_cost(self, job_data: dict[str, Any]) -> int:
         text = get_primary_input_text(job_data)
-        tokens = self._gemini.estimate_tokens(text)
-        if tokens > 5000:
-            return self.default_cost_msats * 3
-        if tokens > 1000:
-            return self.default_cost_msats * 2
-        return self.default_cost_msats
+        params = job_data.get("params", {})
+        tokens = self._gemini.estimate_job_tokens(text, params, task="summarize")
+        # Long inputs cost one Gemini call per chunk before the final merge.
+        return self.price_for_tokens(tokens) * self._gemini.summary_chunks(len(text))
 
     async def execute(self, job_data: dict[str, Any]) -> str:
         text = get_primary_input_text(job_data)
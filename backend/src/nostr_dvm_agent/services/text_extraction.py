@@ -7,6 +7,7 @@ import httpx
 import structlog
 
 from nostr_dvm_agent.ai.gemini_client import GeminiClient
+from nostr_dvm_agent.core.cpu_executor import CpuExecutor
 from nostr_dvm_agent.services.base import BaseDVMService
 
 logger = structlog.get_logger()
@@ -27,9 +28,17 @@ class TextExtractionService(BaseDVMService):
     name = "Text Extraction"
     description = "Extract and analyze content from URLs"
     default_cost_msats = 200
-
-    def __init__(self, gemini: GeminiClient, cost_msats: int = 200) -> None:
+    task = "extract"
+    # The page is only fetched once the job is paid, so the quote covers the
+    # requested output: twice the typical 500-token extraction, and the
+    # 4096-token default max_tokens.
+    token_tiers = ((4000, 3), (1000, 2))
+
+    def __init__(
+        self, gemini: GeminiClient, cost_msats: int = 200, cpu: CpuExecutor | None = None
+    ) -> None:
         self._gemini = gemini
+        self._cpu = cpu or CpuExecutor()
         self.default_cost_msats = cost_msats
         self._http = httpx.AsyncClient(
             timeout=20,
@@ -44,7 +53,9 @@ class TextExtractionService(BaseDVMService):
         return False
 
     async def estimate_cost(self, job_data: dict[str, Any]) -> int:
-        return self.default_cost_msats
+        params = job_data.get("params", {})
+        tokens = self._gemini.estimate_job_tokens("", params, task="extract")
+        return self.price_for_tokens(tokens)
 
     async def execute(self, job_data: dict[str, Any]) -> str:
         url = ""
@@ -70,7 +81,9 @@ class TextExtractionService(BaseDVMService):
 
         content_type = resp.headers.get("content-type", "")
         if "html" in content_type:
-            text_content = strip_html(raw_content)
+            text_content = await self._cpu.run_process(
+                strip_html, raw_content, size=len(raw_content)
+            )
         else:
             text_content = raw_content
 
@@ -19,6 +19,12 @@ class TextGenerationService(BaseDVMService):
     name = "Text Generation"
     description = "LLM text generation and summarization powered by Gemini"
     default_cost_msats = 500
+    cacheable = True
+    # The old input-only tiers (2000 and 500 tokens) plus the typical
+    # 600-token completion that estimate_job_tokens now adds.
+    token_tiers = ((2600, 3), (1100, 2))
+    # Same as SummarizationService: 5000/1000 input tokens plus a 300-token summary.
+    summarize_token_tiers = ((5300, 3), (1300, 2))
 
     def __init__(self, gemini: GeminiClient, cost_msats: int = 500) -> None:
         self._gemini = gemini
@@ -35,19 +41,21 @@ class TextGenerationService(BaseDVMService):
 
     async def validate_input(self, job_data: dict[str, Any]) -> bool:
         text = get_primary_input_text(job_data)
+        if self._is_summarize_task(job_data):
+            # Refused at quote time rather than summarizing only part of it.
+            self._gemini.check_summarizable(len(text))
         return len(text.strip()) > 0
 
     async def estimate_cost(self, job_data: dict[str, Any]) -> int:
         text = get_primary_input_text(job_data)
-        tokens = self._gemini.estimate_tokens(text)
-        base = self.default_cost_msats
-        if self._is_summarize_task(job_data) and tokens > 5000:
-            return base * 3
-        if tokens > 2000:
-            return base * 3
-        if tokens > 500:
-            return base * 2
-        return base
+        params = job_data.get("params", {})
+        if self._is_summarize_task(job_data):
+            tokens = self._gemini.estimate_job_tokens(text, params, task="summarize")
+            # Long inputs cost one Gemini call per chunk before the final merge.
+            chunks = self._gemini.summary_chunks(len(text))
+            return self.price_for_tokens(tokens, self.summarize_token_tiers) * chunks
+        tokens = self._gemini.estimate_job_tokens(text, params, task="generate")
+        return self.price_for_tokens(tokens)
 
     async def execute(self, job_data: dict[str, Any]) -> str:
         text = get_primary_input_text(job_data)
@@ -12,6 +12,9 @@ class TranslationService(BaseDVMService):
     name = "Translation"
     description = "Text translation between languages powered by Gemini 3 Pro"
     default_cost_msats = 300
+    task = "translate"
+    # The old 1000-token input tier plus its translation (1.2x input + 16).
+    token_tiers = ((2200, 2),)
 
     def __init__(self, gemini: GeminiClient, cost_msats: int = 300) -> None:
         self._gemini = gemini
@@ -23,10 +26,9 @@ class TranslationService(BaseDVMService):
 
     async def estimate_cost(self, job_data: dict[str, Any]) -> int:
         text = get_primary_input_text(job_data)
-        tokens = self._gemini.estimate_tokens(text)
-        if tokens > 1000:
-            return self.default_cost_msats * 2
-        return self.default_cost_msats
+        params = job_data.get("params", {})
+        tokens = self._gemini.estimate_job_tokens(text, params, task="translate")
+        return self.price_for_tokens(tokens)
 
     async def execute(self, job_data: dict[str, Any]) -> str:
         text = get_primary_input_text(job_data)
@@ -0,0 +1,79 @@
+"""Shared fixtures and factories for the backend tests."""
+
+import os
+import tempfile
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from nostr_dvm_agent.config import Settings
+from nostr_dvm_agent.core.state_machine import StateMachine
+from nostr_dvm_agent.db.blobs import BlobStore
+from nostr_dvm_agent.db.store import Store
+from nostr_dvm_agent.services.base import BaseDVMService
+
+
+@pytest.fixture
+async def store():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    s = Store(path)
+    await s.open()
+    yield s
+    await s.close()
+    os.unlink(path)
+
+
+def make_settings(**fields: Any) -> Settings:
+    return Settings(nostr_private_key="nsec1test", gemini_api_key="test", **fields)
+
+
+def make_service(cost: int = 300, result: str = "done") -> MagicMock:
+    """A mocked service that accepts any input at a fixed price."""
+    service = MagicMock(cacheable=False)
+    service.validate_input = AsyncMock(return_value=True)
+    service.estimate_cost = AsyncMock(return_value=cost)
+    service.execute = AsyncMock(return_value=result)
+    return service
+
+
+def make_state_machine(
+    store: Store,
+    services: dict[int, Any] | None = None,
+    *,
+    nostr: AsyncMock | None = None,
+    lightning: AsyncMock | None = None,
+    blobs: BlobStore | None = None,
+    **fields: Any,
+) -> StateMachine:
+    """A StateMachine over ``store`` with mocked relays and a wallet invoicing ``lnbc1``."""
+    if lightning is None:
+        lightning = AsyncMock()
+        lightning.create_invoice.return_value = {"bolt11": "lnbc1", "payment_hash": "h1"}
+    return StateMachine(
+        make_settings(**fields), nostr or AsyncMock(), store, lightning, services or {}, blobs=blobs
+    )
+
+
+class StubService(BaseDVMService):
+    """A real service subclass with a flat price, for pricing and advertising tests."""
+
+    description = ""
+
+    def __init__(
+        self, kind: int = 5050, name: str = "Text", cost: int = 1000, task: str = "generate"
+    ) -> None:
+        self.kind = kind
+        self.name = name
+        self.default_cost_msats = cost
+        self.task = task
+
+    async def validate_input(self, job_data):
+        return True
+
+    async def estimate_cost(self, job_data):
+        return self.default_cost_msats
+
+    async def execute(self, job_data):
+        return ""
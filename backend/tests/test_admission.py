@@ -0,0 +1,61 @@
+"""Unit tests for admission control at job intake."""
+
+from unittest.mock import AsyncMock
+
+from conftest import StubService, make_state_machine
+from nostr_sdk import EventBuilder, Keys, Kind, Tag
+
+from nostr_dvm_agent.core.admission import AdmissionController
+
+
+def _controller(outstanding=0, awaiting=0, turnaround=None, **limits):
+    return AdmissionController(
+        outstanding=lambda: outstanding,
+        awaiting_payment=lambda: awaiting,
+        turnaround=lambda: turnaround,
+        capacity=4,
+        max_in_flight=limits.get("max_in_flight", 10),
+        max_wait_secs=limits.get("max_wait_secs", 60.0),
+    )
+
+
+def test_admits_when_idle():
+    assert _controller().refusal() is None
+
+
+def test_refuses_when_in_flight_limit_reached():
+    assert _controller(outstanding=6, awaiting=4).refusal() is not None
+    assert _controller(outstanding=6, awaiting=3).refusal() is None
+
+
+def test_refuses_when_completion_too_late():
+    # 8 paid jobs ahead at 4 at a time: the new job runs in the third wave.
+    controller = _controller(outstanding=8, turnaround=25.0, max_in_flight=0)
+    assert controller.estimated_completion_secs() == 75.0
+    assert "75s" in controller.refusal()
+    assert _controller(outstanding=3, turnaround=25.0).refusal() is None
+
+
+def test_zero_limits_disable_checks():
+    controller = _controller(outstanding=100, turnaround=100.0, max_in_flight=0, max_wait_secs=0)
+    assert controller.refusal() is None
+
+
+async def test_busy_request_gets_error_instead_of_invoice():
+    store = AsyncMock()
+    sm = make_state_machine(store, {5050: StubService()}, admission_max_in_flight=1)
+    nostr, lightning = sm._nostr, sm._lightning
+    sm._outstanding["other"] = 0.0
+
+    event = (
+        EventBuilder(Kind(5050), "")
+        .tags([Tag.parse(["i", "hello", "text"])])
+        .sign_with_keys(Keys.generate())
+    )
+    await sm.handle_job_request(event)
+
+    lightning.create_invoice.assert_not_awaited()
+    store.create_job.assert_not_awaited()
+    args, kwargs = nostr.publish_feedback.await_args
+    assert args[2] == "error"
+    assert "busy" in kwargs["content"]
@@ -0,0 +1,66 @@
+"""Unit tests for the adaptive NIP-89 handler advertiser."""
+
+import json
+from unittest.mock import AsyncMock
+
+from conftest import StubService
+from nostr_sdk import Keys
+
+from nostr_dvm_agent.advertising.nip89 import HandlerAdvertiser
+
+
+def _published(nostr: AsyncMock) -> tuple[dict, list[list[str]]]:
+    builder = nostr.publish_event.await_args.args[0]
+    event = builder.sign_with_keys(Keys.generate())
+    return json.loads(event.content()), [t.as_vec() for t in event.tags().to_vec()]
+
+
+def _make(load=(0, 0.0), tripped=frozenset()):
+    nostr = AsyncMock()
+    services = {
+        5000: StubService(5000, "Translation", 300, "translate"),
+        5001: StubService(5001, "Text", 500),
+    }
+    state = {"load": load, "tripped": set(tripped)}
+    advertiser = HandlerAdvertiser(
+        nostr,
+        services,
+        "sats@example.com",
+        load=lambda: state["load"],
+        availability=lambda s: s.task not in state["tripped"],
+        busy_wait_secs=60,
+    )
+    return advertiser, nostr, state
+
+
+async def test_republishes_only_on_change():
+    advertiser, nostr, state = _make()
+
+    assert await advertiser.refresh()
+    assert not await advertiser.refresh()
+
+    state["load"] = (3, 1.5)
+    assert await advertiser.refresh()
+    state["load"] = (3, 1.9)
+    assert not await advertiser.refresh()
+    assert nostr.publish_event.await_count == 2
+
+
+async def test_tripped_service_drops_its_kind_tag():
+    advertiser, nostr, state = _make(tripped={"translate"})
+    await advertiser.refresh()
+
+    metadata, tags = _published(nostr)
+    assert metadata["status"] == "degraded"
+    assert ["k", "5000"] not in tags and ["k", "5001"] in tags
+    assert ["nip90", "5000", "Translation", "300", "unavailable"] in tags
+
+
+async def test_long_wait_is_advertised_as_busy():
+    advertiser, nostr, _ = _make(load=(20, 300.0))
+    await advertiser.refresh()
+
+    metadata, _ = _published(nostr)
+    assert metadata["status"] == "busy"
+    assert metadata["queue_depth"] == 20
+    assert metadata["est_wait_secs"] == 300
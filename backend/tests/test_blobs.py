@@ -0,0 +1,65 @@
+"""Unit tests for the content-addressed blob store and its HTTP endpoint."""
+
+import asyncio
+import base64
+import hashlib
+
+from nostr_dvm_agent.core.blob_server import BlobServer
+from nostr_dvm_agent.db.blobs import BlobStore, decode_data_url
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+
+def test_put_is_content_addressed(tmp_path):
+    blobs = BlobStore(str(tmp_path))
+    digest = blobs.put(PNG)
+
+    assert digest == hashlib.sha256(PNG).hexdigest()
+    assert blobs.put(PNG) == digest
+    assert bytes(blobs.read(digest)) == PNG
+    assert blobs.read("0" * 64) is None
+
+
+def test_decode_data_url():
+    url = "data:image/png;base64," + base64.b64encode(PNG).decode()
+    assert decode_data_url(url) == ("image/png", PNG)
+    assert decode_data_url("just some text") is None
+
+
+def test_mime_is_persisted_or_sniffed(tmp_path):
+    blobs = BlobStore(str(tmp_path))
+    assert blobs.mime(blobs.put(PNG)) == "image/png"
+    assert blobs.mime(blobs.put(b"# notes", "text/markdown")) == "text/markdown"
+    assert blobs.mime(blobs.put(b"plain")) == "application/octet-stream"
+
+
+async def test_server_serves_blob(tmp_path):
+    blobs = BlobStore(str(tmp_path))
+    digest = blobs.put(PNG)
+    text_digest = blobs.put(b'{"a": 1}', "application/json")
+    server = BlobServer(blobs, "127.0.0.1", 0)
+    await server.start()
+    port = server._server.sockets[0].getsockname()[1]
+
+    async def fetch(path: str) -> bytes:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+        await writer.drain()
+        data = await reader.read()
+        writer.close()
+        return data
+
+    try:
+        response = await fetch(f"/blobs/{digest}")
+        head, _, body = response.partition(b"\r\n\r\n")
+        assert head.startswith(b"HTTP/1.1 200")
+        assert b"Content-Type: image/png" in head
+        assert body == PNG
+
+        text = await fetch(f"/blobs/{text_digest}")
+        assert b"Content-Type: application/json" in text.partition(b"\r\n\r\n")[0]
+
+        missing = await fetch("/blobs/" + "0" * 64)
+        assert missing.startswith(b"HTTP/1.1 404")
+    finally:
+        await server.stop()
@@ -0,0 +1,138 @@
+"""Unit tests for NIP-09 job cancellation in the state machine."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from conftest import make_state_machine
+
+from nostr_dvm_agent.core.state_machine import StateMachine
+from nostr_dvm_agent.db.store import JobState, Store
+
+
+def _make_deletion(author: str, event_ids: list[str]):
+    tags = []
+    for eid in event_ids:
+        tag = MagicMock()
+        tag.as_vec.return_value = ["e", eid]
+        tags.append(tag)
+
+    event = MagicMock()
+    event.author.return_value.to_hex.return_value = author
+    event.tags.return_value.to_vec.return_value = tags
+    return event
+
+
+@pytest.fixture
+def state_machine(store: Store):
+    return make_state_machine(store, lightning=AsyncMock())
+
+
+async def test_deletion_cancels_waiting_job(store: Store, state_machine: StateMachine):
+    await store.create_job("evt1", "alice", 5001)
+    await store.update_state("evt1", JobState.WAITING_PAYMENT, invoice_hash="h1")
+
+    await state_machine.handle_deletion(_make_deletion("alice", ["evt1"]))
+
+    job = await store.get_job("evt1")
+    assert job["state"] == JobState.CANCELLED.value
+
+
+async def test_deletion_from_other_author_is_ignored(store: Store, state_machine: StateMachine):
+    await store.create_job("evt2", "alice", 5001)
+    await store.update_state("evt2", JobState.WAITING_PAYMENT)
+
+    await state_machine.handle_deletion(_make_deletion("mallory", ["evt2"]))
+
+    job = await store.get_job("evt2")
+    assert job["state"] == JobState.WAITING_PAYMENT.value
+
+
+async def test_deletion_cancels_running_task(store: Store, state_machine: StateMachine):
+    await store.create_job("evt3", "alice", 5001)
+    await store.update_state("evt3", JobState.PROCESSING)
+
+    task = asyncio.create_task(asyncio.sleep(60))
+    state_machine._running_jobs["evt3"] = task
+
+    await state_machine.handle_deletion(_make_deletion("alice", ["evt3"]))
+    await asyncio.sleep(0)
+
+    assert task.cancelled()
+    job = await store.get_job("evt3")
+    assert job["state"] == JobState.CANCELLED.value
+
+
+async def test_completed_job_is_not_cancelled(store: Store, state_machine: StateMachine):
+    await store.create_job("evt4", "alice", 5001)
+    await store.update_state("evt4", JobState.COMPLETED, result="done")
+
+    await state_machine.handle_deletion(_make_deletion("alice", ["evt4"]))
+
+    job = await store.get_job("evt4")
+    assert job["state"] == JobState.COMPLETED.value
+
+
+async def test_cancelled_paid_job_is_credited(store: Store):
+    state_machine = make_state_machine(store, credit_enabled=True)
+    await store.create_job("evt5", "alice", 5001)
+    await store.update_state("evt5", JobState.PROCESSING, amount_msats=3000)
+
+    await state_machine.handle_deletion(_make_deletion("alice", ["evt5"]))
+
+    assert (await store.get_job("evt5"))["state"] == JobState.CANCELLED.value
+    assert await store.get_balance("alice") == 3000
+    # A repeated deletion does not credit twice.
+    await state_machine.handle_deletion(_make_deletion("alice", ["evt5"]))
+    assert await store.get_balance("alice") == 3000
+
+
+async def test_paid_job_without_credit_is_not_cancelled(store: Store, state_machine: StateMachine):
+    await store.create_job("evt6", "alice", 5001)
+    await store.update_state("evt6", JobState.QUEUED, amount_msats=3000)
+
+    await state_machine.handle_deletion(_make_deletion("alice", ["evt6"]))
+
+    assert (await store.get_job("evt6"))["state"] == JobState.QUEUED.value
+
+
+async def test_cancel_does_not_overwrite_a_finished_job(store: Store, state_machine: StateMachine):
+    await store.create_job("evt7", "alice", 5001)
+    await store.update_state("evt7", JobState.WAITING_PAYMENT, invoice_hash="h7")
+    claim = store.claim_job
+
+    async def finish_first(event_id, from_state, to_state):
+        await store.update_state(event_id, JobState.COMPLETED, result="done")
+        return await claim(event_id, from_state, to_state)
+
+    state_machine._store.claim_job = finish_first
+    await state_machine.handle_deletion(_make_deletion("alice", ["evt7"]))
+
+    assert (await store.get_job("evt7"))["state"] == JobState.COMPLETED.value
+
+
+async def test_payment_after_cancel_is_credited(store: Store):
+    state_machine = make_state_machine(store, credit_enabled=True)
+    await store.create_job("evt8", "alice", 5001)
+    await store.update_state("evt8", JobState.WAITING_PAYMENT, invoice_hash="h8", amount_msats=2000)
+    await state_machine.handle_deletion(_make_deletion("alice", ["evt8"]))
+
+    await state_machine.handle_payment_confirmed("h8")
+    await state_machine.handle_payment_confirmed("h8")
+
+    assert (await store.get_job("evt8"))["state"] == JobState.CANCELLED.value
+    assert await store.get_balance("alice") == 2000
+
+
+async def test_payment_after_cancel_runs_job_without_credit(
+    store: Store, state_machine: StateMachine
+):
+    await store.create_job("evt9", "alice", 5001)
+    await store.update_state("evt9", JobState.WAITING_PAYMENT, invoice_hash="h9", amount_msats=2000)
+    await state_machine.handle_deletion(_make_deletion("alice", ["evt9"]))
+    state_machine._start_job = AsyncMock()
+
+    await state_machine.handle_payment_confirmed("h9")
+
+    assert (await store.get_job("evt9"))["state"] == JobState.PROCESSING.value
+    state_machine._start_job.assert_awaited_once()
@@ -0,0 +1,151 @@
+"""Unit tests for long-input chunking and map-reduce summarization."""
+
+import pytest
+from conftest import make_state_machine
+from nostr_sdk import EventBuilder, Keys, Kind, Tag
+
+from nostr_dvm_agent.ai.chunking import split_text
+from nostr_dvm_agent.ai.gemini_client import GeminiClient
+from nostr_dvm_agent.config import Settings
+from nostr_dvm_agent.core.cpu_executor import CpuExecutor
+from nostr_dvm_agent.db.store import Store
+from nostr_dvm_agent.main import build_services
+
+
+def test_short_text_is_single_chunk():
+    assert split_text("Hello world.", 100) == ["Hello world."]
+    assert split_text("   ", 100) == []
+
+
+def test_paragraphs_are_packed_within_limit():
+    paragraphs = [f"Paragraph {i} " + "word " * 15 for i in range(20)]
+    text = "\n\n".join(paragraphs)
+    chunks = split_text(text, 300)
+
+    assert len(chunks) > 1
+    assert all(len(c) <= 300 for c in chunks)
+    assert chunks[0].startswith("Paragraph 0")
+    assert "".join(chunks).replace("\n", "").replace(" ", "") == text.replace("\n", "").replace(" ", "")
+
+
+def test_long_paragraph_splits_on_sentences():
+    text = " ".join(f"Sentence number {i} ends here." for i in range(50))
+    chunks = split_text(text, 120)
+
+    assert all(len(c) <= 120 for c in chunks)
+    assert all(c.endswith(".") for c in chunks)
+
+
+def test_unbroken_text_is_hard_cut():
+    chunks = split_text("x" * 1000, 300)
+    assert [len(c) for c in chunks] == [300, 300, 300, 100]
+
+
+async def test_map_reduce_summarize_reuses_chunk_cache():
+    settings = Settings(
+        nostr_private_key="nsec1test",
+        gemini_api_key="test",
+        summarize_chunk_chars=200,
+        summarize_concurrency=2,
+    )
+    client = GeminiClient(settings)
+    calls: list[str] = []
+
+    async def fake_generate(prompt, *, task="generate", **kwargs):
+        calls.append(task)
+        return "short note"
+
+    client._generate = fake_generate  # type: ignore[method-assign]
+    text = "\n\n".join(f"Section {i}. " + "lorem ipsum " * 10 for i in range(6))
+
+    assert await client.summarize(text) == "short note"
+    map_calls = calls.count("map_chunk")
+    assert map_calls > 1
+    assert calls[-1] == "summarize"
+
+    calls.clear()
+    await client.summarize(text)
+    assert calls == ["summarize"]
+    await client.close()
+
+
+def _client(**fields) -> GeminiClient:
+    settings = Settings(
+        nostr_private_key="nsec1test", gemini_api_key="test", summarize_chunk_chars=200, **fields
+    )
+    return GeminiClient(settings)
+
+
+async def test_condense_cuts_notes_that_stop_shrinking():
+    client = _client()
+    calls: list[str] = []
+
+    async def verbose_generate(prompt, *, task="generate", **kwargs):
+        calls.append(task)
+        return prompt + " and more"
+
+    client._generate = verbose_generate  # type: ignore[method-assign]
+    text = "\n\n".join(f"Section {i}. " + "lorem ipsum " * 10 for i in range(6))
+
+    notes = await client._condense(text, 200, kind="summary", instruction="Summarize:", system="")
+    assert len(notes) == 200
+    assert calls.count("map_chunk") == len(split_text(text, 200))
+    await client.close()
+
+
+async def test_summary_longer_than_max_chunks_is_refused_at_quote(store: Store):
+    client = _client(summarize_max_chunks=3)
+    calls: list[str] = []
+
+    async def fake_generate(prompt, *, task="generate", **kwargs):
+        calls.append(task)
+        return "note"
+
+    client._generate = fake_generate  # type: ignore[method-assign]
+    sm = make_state_machine(store, build_services(client._settings, client, CpuExecutor()))
+    event = (
+        EventBuilder(Kind(5001), "")
+        .tags([Tag.parse(["i", "word " * 200, "text"]), Tag.parse(["param", "task", "summarize"])])
+        .sign_with_keys(Keys.generate())
+    )
+    await sm.handle_job_request(event)
+
+    sm._lightning.create_invoice.assert_not_awaited()
+    feedback = sm._nostr.publish_feedback.await_args
+    assert feedback.args[2] == "error"
+    assert "too long to summarize" in feedback.kwargs["content"]
+    with pytest.raises(ValueError):
+        await client.summarize("word " * 200)
+    assert calls == []
+    assert client.summary_chunks(100) == 1
+    assert client.summary_chunks(600) == 3
+    await client.close()
+
+
+async def test_oversized_page_extract_states_truncation():
+    client = _client(summarize_max_chunks=3, extract_max_chars=200)
+    prompts: list[str] = []
+
+    async def fake_generate(prompt, *, task="generate", **kwargs):
+        prompts.append(prompt)
+        return "note"
+
+    client._generate = fake_generate  # type: ignore[method-assign]
+    result = await client.extract_text("https://example.com", content="word " * 200)
+
+    assert result.endswith("[Only the first 600 of 1000 characters of this page were read.]")
+    assert sum(len(p) for p in prompts if "section of the web page" in p) < 1000
+    await client.close()
+
+
+async def test_registered_summarize_service_prices_per_chunk():
+    client = _client(summarize_max_chunks=3)
+    service = build_services(client._settings, client, CpuExecutor())[5001]
+    job = {"inputs": [{"value": "word " * 20_000, "type": "text"}], "params": {"task": "summarize"}}
+
+    single = service.price_for_tokens(
+        client.estimate_job_tokens("word " * 20_000, {}, task="summarize"),
+        service.summarize_token_tiers,
+    )
+    assert await service.estimate_cost(job) == single * 3
+    await client.close()
@@ -0,0 +1,42 @@
+"""Unit tests for offloading CPU-heavy work from the event loop."""
+
+import base64
+import os
+import threading
+
+from nostr_dvm_agent.core.cpu_executor import B64_CHUNK_BYTES, CpuExecutor, b64encode_chunked
+from nostr_dvm_agent.services.text_extraction import strip_html
+
+
+async def test_small_inputs_run_inline():
+    cpu = CpuExecutor(thread_min_bytes=100, process_min_bytes=100)
+    assert await cpu.run_thread(threading.get_ident, size=10) == threading.get_ident()
+    assert await cpu.run_process(os.getpid, size=10) == os.getpid()
+    assert cpu._threads is None and cpu._processes is None
+
+
+async def test_large_inputs_are_offloaded():
+    cpu = CpuExecutor(thread_min_bytes=100, process_min_bytes=100, process_workers=1)
+    try:
+        assert await cpu.run_thread(threading.get_ident, size=1000) != threading.get_ident()
+        assert await cpu.run_thread(threading.get_ident) != threading.get_ident()
+        assert await cpu.run_process(os.getpid, size=1000) != os.getpid()
+
+        html = "<html><script>x()</script><p>hello</p>" + "<b>word</b>" * 50
+        assert await cpu.run_process(strip_html, html, size=len(html)) == strip_html(html)
+    finally:
+        cpu.shutdown()
+
+
+async def test_process_workers_zero_uses_threads():
+    cpu = CpuExecutor(process_workers=0, process_min_bytes=1)
+    try:
+        assert await cpu.run_process(os.getpid, size=10) == os.getpid()
+    finally:
+        cpu.shutdown()
+
+
+def test_chunked_base64_matches_stdlib():
+    data = os.urandom(B64_CHUNK_BYTES * 2 + 7)
+    assert b64encode_chunked(data) == base64.b64encode(data).decode()
+    assert b64encode_chunked(b"") == ""
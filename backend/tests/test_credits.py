@@ -0,0 +1,118 @@
+"""Unit tests for prepaid credit balances."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from conftest import make_service, make_settings, make_state_machine
+from nostr_sdk import EventBuilder, Keys, Kind, Tag
+
+from nostr_dvm_agent.db.store import JobState, Store
+
+
+def _make(store: Store):
+    sm = make_state_machine(store, {5002: make_service()}, credit_enabled=True)
+    sm._lightning.zapper_pubkey.return_value = "provider"
+    return sm, sm._nostr, sm._lightning
+
+
+def _request(keys: Keys, *params: list[str]):
+    tags = [Tag.parse(["i", "hello", "text"])] + [Tag.parse(["param", *p]) for p in params]
+    return EventBuilder(Kind(5002), "").tags(tags).sign_with_keys(keys)
+
+
+def _feedback_tags(nostr: AsyncMock, status: str) -> list[list[str]]:
+    for call in nostr.publish_feedback.await_args_list:
+        if call.args[2] == status:
+            return [t.as_vec() for t in call.kwargs.get("extra_tags") or []]
+    raise AssertionError(f"no {status} feedback")
+
+
+async def test_credit_and_debit_are_idempotent(store: Store):
+    assert await store.get_balance("alice") is None
+    assert await store.credit("alice", 1000, "zap:r1") == 1000
+    assert await store.credit("alice", 1000, "zap:r1") is None
+    assert await store.debit("alice", 400, "job:e1") == 600
+    assert await store.debit("alice", 400, "job:e1") is None
+    assert await store.debit("alice", 700, "job:e2") is None
+    assert await store.get_balance("alice") == 600
+
+
+async def test_job_debited_from_balance_skips_invoice(store: Store):
+    sm, nostr, lightning = _make(store)
+    keys = Keys.generate()
+    await store.credit(keys.public_key().to_hex(), 1000, "zap:r1")
+
+    event = _request(keys)
+    await sm.handle_job_request(event)
+    await asyncio.gather(*sm._running_jobs.values())
+
+    lightning.create_invoice.assert_not_awaited()
+    assert ["balance", "700"] in _feedback_tags(nostr, "processing")
+    job = await store.get_job(event.id().to_hex())
+    assert job["state"] == JobState.COMPLETED.value
+    assert job["amount_msats"] == 300
+
+
+async def test_short_balance_falls_back_to_invoice(store: Store):
+    sm, nostr, lightning = _make(store)
+    keys = Keys.generate()
+    await store.credit(keys.public_key().to_hex(), 100, "zap:r1")
+
+    await sm.handle_job_request(_request(keys))
+
+    lightning.create_invoice.assert_awaited_once()
+    assert ["balance", "100"] in _feedback_tags(nostr, "payment-required")
+    assert await store.get_balance(keys.public_key().to_hex()) == 100
+
+
+async def test_credit_param_tops_up_on_payment(store: Store):
+    sm, nostr, lightning = _make(store)
+    keys = Keys.generate()
+
+    await sm.handle_job_request(_request(keys, ["credit", "5000"]))
+    assert lightning.create_invoice.await_args.args[0] == 5300
+
+    await sm.handle_payment_confirmed("h1")
+    await asyncio.gather(*sm._running_jobs.values())
+    assert await store.get_balance(keys.public_key().to_hex()) == 5000
+    assert ["balance", "5000"] in _feedback_tags(nostr, "processing")
+
+
+async def test_profile_zap_tops_up_only_from_our_provider(store: Store):
+    sm, _, lightning = _make(store)
+    lightning.zapper_pubkey.return_value = "provider"
+    zap = {
+        "event_id": None, "bolt11": "lnbc1", "amount_msats": 2000,
+        "zap_receipt_id": "r1", "payer_pubkey": "alice", "receipt_author": "provider",
+    }
+    sm._zaps.verify = AsyncMock(return_value=zap)
+
+    await sm.handle_zap_receipt(MagicMock())
+    await sm.handle_zap_receipt(MagicMock())
+    assert await store.get_balance("alice") == 2000
+
+    sm._zaps.verify.return_value = {**zap, "zap_receipt_id": "r2", "receipt_author": "mallory"}
+    await sm.handle_zap_receipt(MagicMock())
+    assert await store.get_balance("alice") == 2000
+
+
+async def test_forged_receipt_does_not_credit_balance(store: Store):
+    sm, _, _ = _make(store)
+    keys = Keys.generate()
+    event = _request(keys, ["credit", "5000"])
+    await sm.handle_job_request(event)
+
+    sm._zaps.verify = AsyncMock(return_value={
+        "event_id": event.id().to_hex(), "bolt11": "lnbc1", "amount_msats": 5300,
+        "zap_receipt_id": "forged", "payer_pubkey": keys.public_key().to_hex(),
+        "receipt_author": keys.public_key().to_hex(),
+    })
+    await sm.handle_zap_receipt(MagicMock())
+
+    assert await store.get_balance(keys.public_key().to_hex()) is None
+    job = await store.get_job(event.id().to_hex())
+    assert job["state"] == JobState.WAITING_PAYMENT.value
+
+
+def test_credit_is_opt_in():
+    assert make_settings().credit_enabled is False
@@ -0,0 +1,153 @@
+"""Unit tests for NIP-90 job chaining input resolution."""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from conftest import make_service, make_state_machine
+from nostr_sdk import EventBuilder, Keys, Kind, Tag
+
+from nostr_dvm_agent.core.event_handler import get_primary_input_text
+from nostr_dvm_agent.core.input_resolver import InputResolver, has_chained_inputs
+from nostr_dvm_agent.db.store import JobState, Store
+
+
+def _job(inputs):
+    return {"event_id": "down", "pubkey": "alice", "kind": 5000, "inputs": inputs, "params": {}}
+
+
+def test_has_chained_inputs():
+    assert has_chained_inputs(_job([{"value": "x", "type": "job"}]))
+    assert not has_chained_inputs(_job([{"value": "x", "type": "text"}]))
+
+
+async def test_resolves_completed_job_from_store(store: Store):
+    await store.create_job("up", "alice", 5002, {"inputs": []})
+    await store.update_state("up", JobState.COMPLETED, result="extracted text")
+    resolver = InputResolver(store, AsyncMock(), wait_timeout_secs=1)
+
+    resolved = await resolver.resolve(_job([{"value": "up", "type": "job"}]))
+    assert get_primary_input_text(resolved) == "extracted text"
+
+
+async def test_waits_for_pending_job(store: Store):
+    await store.create_job("up", "alice", 5002, {"inputs": []})
+    await store.update_state("up", JobState.PROCESSING)
+    resolver = InputResolver(store, AsyncMock(), wait_timeout_secs=5)
+
+    pending = asyncio.create_task(resolver.resolve(_job([{"value": "up", "type": "job"}])))
+    await asyncio.sleep(0.05)
+    assert not pending.done()
+
+    await store.update_state("up", JobState.COMPLETED, result="late result")
+    resolver.notify_finished("up")
+
+    resolved = await asyncio.wait_for(pending, timeout=1)
+    assert get_primary_input_text(resolved) == "late result"
+
+
+async def test_failed_upstream_job_raises(store: Store):
+    await store.create_job("up", "alice", 5002, {"inputs": []})
+    await store.update_state("up", JobState.FAILED, error="boom")
+    resolver = InputResolver(store, AsyncMock(), wait_timeout_secs=1)
+
+    with pytest.raises(ValueError):
+        await resolver.resolve(_job([{"value": "up", "type": "job"}]))
+
+
+async def test_event_inputs_are_cached(store: Store):
+    nostr = AsyncMock()
+    event = MagicMock()
+    event.content.return_value = "note content"
+    nostr.fetch_event.return_value = event
+    resolver = InputResolver(store, nostr, wait_timeout_secs=1)
+
+    for _ in range(2):
+        resolved = await resolver.resolve(_job([{"value": "evt", "type": "event"}]))
+        assert get_primary_input_text(resolved) == "note content"
+    assert nostr.fetch_event.await_count == 1
+
+
+def _event(content="", author="", tags=()):
+    event = MagicMock()
+    event.content.return_value = content
+    event.author.return_value.to_hex.return_value = author
+    tag_mocks = []
+    for vec in tags:
+        tag = MagicMock()
+        tag.as_vec.return_value = list(vec)
+        tag_mocks.append(tag)
+    event.tags.return_value.to_vec.return_value = tag_mocks
+    return event
+
+
+def _remote_nostr(result_author: str):
+    nostr = AsyncMock()
+    nostr.public_key = MagicMock()
+    nostr.public_key.to_hex.return_value = "us"
+    nostr.fetch_event.return_value = _event(tags=[["p", "provider"]])
+    nostr.fetch_job_result.return_value = _event("remote result", author=result_author)
+    return nostr
+
+
+async def test_remote_result_from_targeted_provider(store: Store):
+    nostr = _remote_nostr("provider")
+    resolver = InputResolver(store, nostr, wait_timeout_secs=1)
+
+    resolved = await resolver.resolve(_job([{"value": "up", "type": "job"}]))
+    assert get_primary_input_text(resolved) == "remote result"
+    assert nostr.fetch_job_result.await_args.args == ("up", ["provider", "us"])
+
+
+async def test_remote_result_from_other_author_is_rejected(store: Store):
+    resolver = InputResolver(store, _remote_nostr("mallory"), wait_timeout_secs=1)
+
+    with pytest.raises(ValueError):
+        await resolver.resolve(_job([{"value": "up", "type": "job"}]))
+
+
+async def test_preview_does_not_wait_for_pending_job(store: Store):
+    await store.create_job("up", "alice", 5002, {"inputs": []})
+    await store.update_state("up", JobState.PROCESSING)
+    resolver = InputResolver(store, AsyncMock(), wait_timeout_secs=5)
+
+    assert await resolver.preview(_job([{"value": "up", "type": "job"}])) is None
+
+    await store.update_state("up", JobState.COMPLETED, result="done")
+    preview = await resolver.preview(_job([{"value": "up", "type": "job"}]))
+    assert get_primary_input_text(preview) == "done"
+
+
+async def test_circular_chain_fails_fast(store: Store):
+    resolver = InputResolver(store, AsyncMock(), wait_timeout_secs=5)
+    with pytest.raises(ValueError, match="refers back"):
+        await resolver.preview(_job([{"value": "down", "type": "job"}]))
+
+    await store.create_job("up", "alice", 5002, {"inputs": [{"value": "down", "type": "job"}]})
+    await store.update_state("up", JobState.PROCESSING)
+    with pytest.raises(ValueError, match="refers back"):
+        await asyncio.wait_for(resolver.resolve(_job([{"value": "up", "type": "job"}])), 1)
+
+
+async def test_chained_request_is_quoted_from_its_input(store: Store):
+    service = make_service(cost=700)
+    service.max_price.return_value = 1500
+    sm = make_state_machine(store, {5001: service})
+    await store.create_job("up", "alice", 5002, {"inputs": []})
+    await store.update_state("up", JobState.PROCESSING)
+
+    keys = Keys.generate()
+    for text in ("pending", "done"):
+        if text == "done":
+            await store.update_state("up", JobState.COMPLETED, result="upstream text")
+        event = (
+            EventBuilder(Kind(5001), text)
+            .tags([Tag.parse(["i", "up", "job"])])
+            .sign_with_keys(keys)
+        )
+        await sm.handle_job_request(event)
+
+    amounts = [call.args[0] for call in sm._lightning.create_invoice.await_args_list]
+    assert amounts == [1500, 700]
+    resolved = service.estimate_cost.await_args.args[0]
+    assert get_primary_input_text(resolved) == "upstream text"
@@ -0,0 +1,69 @@
+"""Unit tests for Gemini model routing and failover."""
+
+from nostr_dvm_agent.ai.model_router import ModelRouter
+from nostr_dvm_agent.config import Settings
+
+
+def _make_router(**overrides):
+    fields = {
+        "nostr_private_key": "nsec1test",
+        "gemini_api_key": "test",
+        "gemini_model": "default-model",
+        "gemini_fast_model": "fast-model",
+        "gemini_long_model": "long-model",
+        "gemini_fallback_models": "backup-model",
+        "route_short_input_chars": 100,
+        "route_long_input_chars": 1000,
+    }
+    fields.update(overrides)
+    return ModelRouter(Settings(**fields))
+
+
+def test_short_translation_uses_fast_model():
+    router = _make_router()
+    assert router.preferred_model("translate", 50) == "fast-model"
+    assert router.preferred_model("translate", 500) == "default-model"
+
+
+def test_long_summary_uses_long_model():
+    router = _make_router()
+    assert router.preferred_model("summarize", 5000) == "long-model"
+    assert router.preferred_model("map_chunk", 5000) == "long-model"
+    assert router.preferred_model("generate", 5000) == "default-model"
+
+
+def test_candidates_include_default_and_fallbacks():
+    router = _make_router()
+    assert router.candidates("translate", 10) == ["fast-model", "default-model", "backup-model"]
+
+
+def test_failing_model_trips_and_moves_last():
+    router = _make_router()
+    for _ in range(3):
+        router.record_failure("fast-model")
+
+    assert not router.is_available("fast-model")
+    candidates = router.candidates("translate", 10)
+    assert candidates[-1] == "fast-model"
+    assert candidates[0] in ("default-model", "backup-model")
+
+
+def test_success_resets_breaker():
+    router = _make_router()
+    for _ in range(3):
+        router.record_failure("fast-model")
+    router.record_success("fast-model", 0.5)
+
+    assert router.is_available("fast-model")
+    assert router.candidates("translate", 10)[0] == "fast-model"
+
+
+def test_healthy_fallbacks_ordered_by_latency():
+    router = _make_router(gemini_fallback_models="slow-model,quick-model")
+    router.record_success("slow-model", 5.0)
+    router.record_success("quick-model", 0.2)
+    router.record_success("default-model", 1.0)
+
+    assert router.candidates("generate", 10) == [
+        "default-model", "quick-model", "slow-model",
+    ]
@@ -0,0 +1,117 @@
+"""Unit tests for the NIP-44 v2 implementation and conversation-key cache."""
+
+import time
+from unittest.mock import patch
+
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec
+from nostr_sdk import Keys, Nip44Version, nip44_decrypt, nip44_encrypt
+
+from nostr_dvm_agent.security import nip44
+from nostr_dvm_agent.security.encryption import decrypt_content, encrypt_content
+
+
+def test_spec_vector():
+    secret = ec.derive_private_key(1, ec.SECP256K1())
+    peer = ec.derive_private_key(2, ec.SECP256K1()).public_key().public_numbers().x
+    conv_key = nip44.conversation_key(secret, f"{peer:064x}")
+
+    assert conv_key.hex() == "c41c775356fd92eadc63ff5a0dc1da211b268cbea22316767095b2871ea1412d"
+    payload = nip44.encrypt(conv_key, "a", nonce=bytes(31) + b"\x01")
+    assert payload == (
+        "AgAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABee0G5VSK0/9YypIObAtDKfYEAjD35uVkHyB0F4Dw"
+        "rcNaCXlCWZKaArsGrY6M9wnuTMxWfp1RTN9Xga8no+kF5Vsb"
+    )
+    assert nip44.decrypt(conv_key, payload) == "a"
+
+
+@pytest.mark.parametrize("message", ["a", "héllo " * 50, "x" * 40000])
+def test_interoperates_with_nostr_sdk(message: str):
+    ours, theirs = Keys.generate(), Keys.generate()
+    cache = nip44.ConversationKeyCache(ours)
+
+    sent = cache.encrypt(theirs.public_key().to_hex(), message)
+    assert nip44_decrypt(theirs.secret_key(), ours.public_key(), sent) == message
+
+    received = nip44_encrypt(theirs.secret_key(), ours.public_key(), message, Nip44Version.V2)
+    assert cache.decrypt(theirs.public_key().to_hex(), received) == message
+
+
+def test_tampered_payload_is_rejected():
+    ours, theirs = Keys.generate(), Keys.generate()
+    cache = nip44.ConversationKeyCache(ours)
+    payload = nip44_encrypt(theirs.secret_key(), ours.public_key(), "secret", Nip44Version.V2)
+    tampered = payload[:50] + ("A" if payload[50] != "A" else "B") + payload[51:]
+
+    with pytest.raises(ValueError):
+        cache.decrypt(theirs.public_key().to_hex(), tampered)
+
+
+def test_repeat_customer_reuses_conversation_key():
+    ours, customer = Keys.generate(), Keys.generate()
+    cache = nip44.ConversationKeyCache(ours)
+    pubkey = customer.public_key()
+
+    with patch.object(nip44, "conversation_key", wraps=nip44.conversation_key) as derive:
+        for _ in range(3):
+            ciphertext = encrypt_content(ours, pubkey, "result", cache)
+            assert decrypt_content(ours, pubkey, ciphertext, cache) == "result"
+    assert derive.call_count == 1
+
+
+def test_evicted_keys_are_zeroed():
+    cache = nip44.ConversationKeyCache(Keys.generate(), max_entries=1)
+    first, second = Keys.generate().public_key().to_hex(), Keys.generate().public_key().to_hex()
+
+    cache.encrypt(first, "x")
+    key = cache._entries[first][0]
+    cache.encrypt(second, "x")
+
+    assert first not in cache and len(cache) == 1
+    assert key == bytearray(32)
+
+
+def test_idle_keys_expire():
+    cache = nip44.ConversationKeyCache(Keys.generate(), ttl_secs=60)
+    pubkey = Keys.generate().public_key().to_hex()
+    cache.encrypt(pubkey, "x")
+    key = cache._entries[pubkey][0]
+
+    cache._prune(time.monotonic() + 120)
+
+    assert pubkey not in cache
+    assert key == bytearray(32)
+
+
+def test_payload_length_and_plaintext_budget():
+    key = nip44.conversation_key(ec.derive_private_key(1, ec.SECP256K1()), "ab" * 32)
+    for n in (1, 32, 33, 300, 5000, 65535):
+        assert len(nip44.encrypt(key, "x" * n)) == nip44.payload_len(n)
+    budget = nip44.max_plaintext_for(4096)
+    assert nip44.payload_len(budget) <= 4096 < nip44.payload_len(budget + 1)
+    assert nip44.max_plaintext_for(10**6) == nip44.MAX_PLAINTEXT
+    assert nip44.max_plaintext_for(100) == 0
+
+
+def test_cipher_runs_outside_the_cache_lock():
+    ours, theirs = Keys.generate(), Keys.generate()
+    cache = nip44.ConversationKeyCache(ours)
+    pubkey = theirs.public_key().to_hex()
+    held, used = [], []
+
+    def spy(real):
+        def run(conv_key, *args, **kwargs):
+            held.append(cache._lock.locked())
+            used.append(conv_key)
+            return real(conv_key, *args, **kwargs)
+        return run
+
+    with (
+        patch.object(nip44, "encrypt", spy(nip44.encrypt)),
+        patch.object(nip44, "decrypt", spy(nip44.decrypt)),
+    ):
+        assert cache.decrypt(pubkey, cache.encrypt(pubkey, "secret")) == "secret"
+
+    assert held == [False, False]
+    assert all(key == bytearray(32) for key in used)
+    assert cache._entries[pubkey][0] != bytearray(32)
@@ -0,0 +1,82 @@
+"""Unit tests for the batched event publishing pipeline."""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from nostr_sdk import Keys
+
+from nostr_dvm_agent.config import Settings
+from nostr_dvm_agent.core import nostr_client
+from nostr_dvm_agent.core.nostr_client import NostrClient
+
+
+def _make_client() -> NostrClient:
+    settings = Settings(nostr_private_key=Keys.generate().secret_key().to_bech32(), gemini_api_key="test")
+    client = NostrClient(settings)
+    client._client = AsyncMock()
+    return client
+
+
+def _tags(event) -> list[list[str]]:
+    return [t.as_vec() for t in event.tags().to_vec()]
+
+
+async def test_queued_events_are_signed_in_one_batch():
+    client = _make_client()
+    with patch.object(nostr_client, "_sign_all", wraps=nostr_client._sign_all) as sign_all:
+        await asyncio.gather(*(
+            client.publish_feedback(f"{i:064x}", "ab" * 32, "processing") for i in range(5)
+        ))
+
+    assert sign_all.call_count == 1
+    sent = [call.args[0] for call in client._client.send_event.await_args_list]
+    assert len(sent) == 5
+    for event in sent:
+        event.verify()
+        assert event.author().to_hex() == client.public_key.to_hex()
+        assert ["status", "processing"] in _tags(event)
+
+
+async def test_job_tag_templates_are_reused_until_result():
+    client = _make_client()
+    job, customer = "01" * 32, "ab" * 32
+
+    await client.publish_feedback(job, customer, "payment-required")
+    cached = client._job_tags[job]
+    await client.publish_feedback(job, customer, "processing")
+    assert client._job_tags[job] is cached
+
+    await client.publish_result(job, customer, 5001, "done")
+    assert job not in client._job_tags
+
+    result = client._client.send_event.await_args.args[0]
+    assert result.kind().as_u16() == 6001
+    assert _tags(result)[:3] == [["e", job], ["p", customer], ["status", "success"]]
+
+
+async def test_send_failure_only_fails_its_own_event():
+    client = _make_client()
+    client._client.send_event.side_effect = [RuntimeError("relay down"), None]
+
+    results = await asyncio.gather(
+        client.publish_feedback("01" * 32, "ab" * 32, "processing"),
+        client.publish_feedback("02" * 32, "ab" * 32, "processing"),
+        return_exceptions=True,
+    )
+    assert isinstance(results[0], RuntimeError)
+    assert results[1] is None
+
+
+async def test_result_chunks_published_as_partials_then_result():
+    client = _make_client()
+    job, customer = "02" * 32, "ab" * 32
+
+    await client.publish_result_chunks(job, customer, 5001, ["a", "b", "c"])
+
+    sent = [call.args[0] for call in client._client.send_event.await_args_list]
+    by_chunk = {_tags(e)[3][1]: e for e in sent}
+    assert [by_chunk[str(i)].content() for i in range(3)] == ["a", "b", "c"]
+    assert [by_chunk[str(i)].kind().as_u16() for i in range(3)] == [7000, 7000, 6001]
+    assert ["status", "partial"] in _tags(by_chunk["0"])
+    assert ["chunk", "2", "3"] in _tags(by_chunk["2"])
+    assert job not in client._job_tags
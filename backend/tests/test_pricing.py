@@ -0,0 +1,77 @@
+"""Unit tests for load-based surge pricing."""
+
+import time
+from unittest.mock import patch
+
+from conftest import StubService, make_settings
+
+from nostr_dvm_agent.ai.model_router import ModelRouter
+from nostr_dvm_agent.payment.pricing import PricingEngine
+
+
+def _make(load=(0, 0.0), **fields):
+    settings = make_settings(job_capacity=4, pricing_smoothing_secs=0, **fields)
+    router = ModelRouter(settings)
+    state = {"load": load}
+    return PricingEngine(settings, lambda: state["load"], router), router, state
+
+
+def test_base_price_when_idle():
+    pricing, _, _ = _make()
+    assert pricing.quote(StubService(), 1000) == 1000
+
+
+def test_queue_beyond_capacity_raises_price():
+    pricing, _, _ = _make(load=(8, 30.0))
+    assert pricing.quote(StubService(), 1000) == 2000
+
+
+def test_slow_model_raises_price():
+    pricing, router, _ = _make(pricing_latency_target_secs=10.0)
+    service = StubService()
+    router.record_success(router.preferred_model(service.task, 0), 30.0)
+    assert pricing.quote(service, 1000) == 2000
+
+
+def test_coordinator_prices_on_queue_only():
+    pricing, router, _ = _make(
+        load=(8, 30.0), agent_role="coordinator", pricing_latency_target_secs=10.0
+    )
+    service = StubService()
+    router.record_success(router.preferred_model(service.task, 0), 30.0)
+    assert pricing.quote(service, 1000) == 2000
+
+
+def test_quota_pressure_raises_price():
+    pricing, router, _ = _make(gemini_rpm_limit=10)
+    service = StubService()
+    model = router.preferred_model(service.task, 0)
+    now = time.monotonic()
+    for _ in range(10):
+        router.stats(model).note_call(now)
+    assert pricing.quote(service, 1000) == 2000
+
+
+def test_multiplier_clamped_to_ceiling():
+    pricing, _, _ = _make(load=(400, 0.0), pricing_max_multiplier=3.0)
+    assert pricing.quote(StubService(), 1000) == 3000
+
+
+def test_multiplier_smoothed_over_time():
+    pricing, _, state = _make()
+    pricing._settings.pricing_smoothing_secs = 60
+    service = StubService()
+    with patch("nostr_dvm_agent.payment.pricing.time.monotonic", return_value=0.0):
+        assert pricing.multiplier(service) == 1.0
+    state["load"] = (12, 0.0)
+    with patch("nostr_dvm_agent.payment.pricing.time.monotonic", return_value=1.0):
+        bumped = pricing.multiplier(service)
+    assert 1.0 < bumped < 1.1
+    with patch("nostr_dvm_agent.payment.pricing.time.monotonic", return_value=600.0):
+        assert abs(pricing.multiplier(service) - 3.0) < 0.01
+
+
+def test_advertised_price_is_quantized():
+    pricing, _, _ = _make(load=(5, 0.0))
+    # target 1.25 exactly; a 1.1x blip would round back to base.
+    assert pricing.advertised_price(StubService()) == 1250
@@ -0,0 +1,61 @@
+"""Unit tests for the customer payment-reputation index."""
+
+import time
+from unittest.mock import AsyncMock
+
+from conftest import make_service, make_state_machine
+from nostr_sdk import EventBuilder, Keys, Kind, Tag
+
+from nostr_dvm_agent.core.reputation import ReputationIndex
+from nostr_dvm_agent.db.store import Store
+
+
+def test_records_payments_and_expiries():
+    index = ReputationIndex(AsyncMock(), min_expired=2, min_pay_rate=0.5)
+    index.record_request("alice")
+    index.record_invoice("alice")
+    index.record_paid("alice", 400, invoiced_at=time.time() - 10)
+    index.record_paid("alice", 600)
+
+    stats = index.get("alice")
+    assert (stats.requested, stats.paid, stats.total_msats, stats.pending) == (1, 2, 1000, 0)
+    assert 9 < stats.pay_latency_secs < 11
+    assert index.get("nobody").pay_rate == 1.0
+
+    for _ in range(2):
+        index.record_invoice("mallory")
+        index.record_expired("mallory")
+    assert index.deprioritised("mallory")
+    assert not index.deprioritised("alice")
+
+
+async def test_flush_persists_only_changed_entries(store: Store):
+    index = ReputationIndex(store)
+    index.record_paid("alice", 400)
+    index.record_expired("bob")
+    assert await index.flush() == 2
+    assert await index.flush() == 0
+
+    reloaded = ReputationIndex(store)
+    await reloaded.load()
+    assert reloaded.get("alice").paid == 1
+    assert reloaded.get("bob").expired == 1
+
+
+async def test_deprioritised_pubkey_limited_to_one_open_invoice(store: Store):
+    sm = make_state_machine(store, {5002: make_service()})
+
+    keys = Keys.generate()
+    for _ in range(3):
+        sm.reputation.record_expired(keys.public_key().to_hex())
+
+    for text in ("one", "two"):
+        event = (
+            EventBuilder(Kind(5002), "")
+            .tags([Tag.parse(["i", text, "text"])])
+            .sign_with_keys(keys)
+        )
+        await sm.handle_job_request(event)
+
+    sm._lightning.create_invoice.assert_awaited_once()
+    assert sm.reputation.get(keys.public_key().to_hex()).pending == 1
@@ -0,0 +1,149 @@
+"""Unit tests for chunked and externalized delivery of large results."""
+
+import base64
+from unittest.mock import AsyncMock
+
+import pytest
+from conftest import make_state_machine
+from nostr_sdk import Keys, nip44_decrypt
+
+from nostr_dvm_agent.core.result_chunks import join_chunks, split_result
+from nostr_dvm_agent.db.blobs import BlobStore
+from nostr_dvm_agent.db.store import JobState, Store
+from nostr_dvm_agent.security import nip44
+
+TEXT = "Grüße, 世界! " * 4000
+
+
+def test_split_roundtrip_compressed():
+    pieces = split_result(TEXT, 1000)
+    assert all(len(p) <= 1000 for p in pieces)
+    assert len(pieces) < len(TEXT.encode()) // 1000
+    assert join_chunks(pieces) == TEXT
+
+
+def test_split_uncompressed_keeps_characters_whole():
+    pieces = split_result(TEXT, 1001, compress=False)
+    assert all(len(p.encode()) <= 1001 for p in pieces)
+    assert join_chunks(pieces, compressed=False) == TEXT
+
+
+def _make(store: Store, blobs: BlobStore | None = None, **fields):
+    nostr = AsyncMock()
+    nostr.keys = Keys.generate()
+    sm = make_state_machine(store, nostr=nostr, blobs=blobs, result_max_event_bytes=4096, **fields)
+    return sm, nostr
+
+
+def _tag_values(tags) -> list[list[str]]:
+    return [t.as_vec() for t in tags]
+
+
+async def test_large_result_is_chunked_with_requested_mime(store: Store):
+    sm, nostr = _make(store)
+    await store.create_job("evt1", "ab" * 32, 5001)
+
+    await sm._deliver_result("evt1", "ab" * 32, 5001, TEXT, False, output_mime="text/markdown")
+
+    nostr.publish_result.assert_not_awaited()
+    args, kwargs = nostr.publish_result_chunks.await_args
+    assert join_chunks(args[3]) == TEXT
+    assert ["m", "text/markdown"] in _tag_values(kwargs["extra_tags"])
+    assert ["encoding", "gzip"] in _tag_values(kwargs["extra_tags"])
+    job = await store.get_job("evt1")
+    assert job["state"] == JobState.COMPLETED.value
+    assert job["result"] == TEXT
+
+
+async def test_encrypted_chunks_decrypt_individually(store: Store):
+    sm, nostr = _make(store, result_chunk_compression=False)
+    customer = Keys.generate()
+    pubkey = customer.public_key().to_hex()
+    await store.create_job("evt1", pubkey, 5001)
+
+    await sm._deliver_result("evt1", pubkey, 5001, TEXT, True)
+
+    args, kwargs = nostr.publish_result_chunks.await_args
+    plain = [
+        nip44_decrypt(customer.secret_key(), nostr.keys.public_key(), piece) for piece in args[3]
+    ]
+    assert "".join(plain) == TEXT
+    assert all(len(piece) <= 4096 for piece in args[3])
+    assert ["encrypted"] in _tag_values(kwargs["extra_tags"])
+
+
+async def test_encrypted_result_at_event_limit(store: Store):
+    sm, nostr = _make(store, result_chunk_compression=False)
+    customer = Keys.generate()
+    pubkey = customer.public_key().to_hex()
+    fits = nip44.max_plaintext_for(4096)
+    assert fits < 4096
+
+    await store.create_job("evt1", pubkey, 5001)
+    await sm._deliver_result("evt1", pubkey, 5001, "x" * fits, True)
+    assert len(nostr.publish_result.await_args.args[3]) <= 4096
+    nostr.publish_result_chunks.assert_not_awaited()
+
+    await store.create_job("evt2", pubkey, 5001)
+    await sm._deliver_result("evt2", pubkey, 5001, "x" * (fits + 1), True)
+    nostr.publish_result_chunks.assert_awaited_once()
+
+
+async def test_result_over_chunk_limit_is_refused(store: Store):
+    sm, _ = _make(store, result_max_chunks=2, result_chunk_compression=False)
+    await store.create_job("evt1", "ab" * 32, 5001)
+    with pytest.raises(ValueError):
+        await sm._deliver_result("evt1", "ab" * 32, 5001, TEXT, False)
+
+
+async def test_large_text_goes_to_blob_store(store: Store, tmp_path):
+    blobs = BlobStore(str(tmp_path))
+    sm, nostr = _make(
+        store, blobs, blob_public_url="https://dvm.example", blob_min_bytes=4096
+    )
+    await store.create_job("evt1", "ab" * 32, 5001)
+
+    await sm._deliver_result("evt1", "ab" * 32, 5001, TEXT, False, output_mime="application/json")
+
+    args, kwargs = nostr.publish_result.await_args
+    assert args[3].startswith("https://dvm.example/blobs/")
+    digest = args[3].rsplit("/", 1)[1]
+    assert bytes(blobs.read(digest)).decode() == TEXT
+    assert blobs.mime(digest) == "application/json"
+    assert ["m", "application/json"] in _tag_values(kwargs["extra_tags"])
+    assert (await store.get_job("evt1"))["result_blob"] == digest
+    assert await store.blob_in_use(digest)
+
+
+def _chained(upstream: str, customer: str) -> dict:
+    return {"pubkey": customer, "inputs": [{"value": upstream, "type": "job"}], "params": {}}
+
+
+@pytest.mark.parametrize("compress", [True, False])
+async def test_encrypted_chunked_result_can_be_chained(store: Store, compress: bool):
+    sm, _ = _make(store, result_chunk_compression=compress)
+    pubkey = Keys.generate().public_key().to_hex()
+    await store.create_job("evt1", pubkey, 5001, {"encrypted": True, "inputs": []})
+
+    await sm._deliver_result("evt1", pubkey, 5001, TEXT, True)
+
+    resolved = await sm._resolver.resolve(_chained("evt1", pubkey))
+    assert resolved["inputs"][0]["value"] == TEXT
+
+
+@pytest.mark.parametrize("is_enc", [False, True])
+async def test_blob_result_can_be_chained(store: Store, tmp_path, is_enc: bool):
+    blobs = BlobStore(str(tmp_path))
+    sm, _ = _make(store, blobs, blob_public_url="https://dvm.example", blob_min_bytes=4096)
+    pubkey = Keys.generate().public_key().to_hex()
+    await store.create_job("evt1", pubkey, 5001, {"encrypted": is_enc, "inputs": []})
+    image = "data:image/png;base64," + base64.b64encode(b"\x89PNG\r\n\x1a\n" * 1000).decode()
+
+    await sm._deliver_result("evt1", pubkey, 5001, TEXT, is_enc)
+    resolved = await sm._resolver.resolve(_chained("evt1", pubkey))
+    assert resolved["inputs"][0]["value"] == TEXT
+
+    await store.create_job("evt2", pubkey, 5100, {"encrypted": is_enc, "inputs": []})
+    await sm._deliver_result("evt2", pubkey, 5100, image, is_enc)
+    resolved = await sm._resolver.resolve(_chained("evt2", pubkey))
+    assert resolved["inputs"][0]["value"] == image
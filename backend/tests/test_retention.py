@@ -0,0 +1,119 @@
+"""Unit tests for job retention and archival."""
+
+import os
+import sqlite3
+import time
+
+from nostr_dvm_agent.db.blobs import BlobStore, blob_url
+from nostr_dvm_agent.db.retention import RetentionManager, read_segment
+from nostr_dvm_agent.db.store import JobState, Store
+
+
+async def _age_job(store: Store, event_id: str, days: float) -> None:
+    await store._db.execute(
+        "UPDATE jobs SET updated_at = ? WHERE event_id = ?",
+        (time.time() - days * 86400, event_id),
+    )
+    await store._db.commit()
+
+
+async def test_archives_only_old_terminal_jobs(store: Store, tmp_path):
+    await store.create_job("old_done", "pk", 5001, {"inputs": []})
+    await store.update_state("old_done", JobState.COMPLETED, result="hello")
+    await _age_job(store, "old_done", 40)
+
+    await store.create_job("old_waiting", "pk", 5001)
+    await store.update_state("old_waiting", JobState.WAITING_PAYMENT)
+    await _age_job(store, "old_waiting", 40)
+
+    await store.create_job("new_done", "pk", 5001)
+    await store.update_state("new_done", JobState.COMPLETED, result="fresh")
+
+    retention = RetentionManager(store, str(tmp_path), retention_days=30, batch_size=1)
+    assert await retention.run_once() == 1
+
+    assert await store.get_job("old_done") is None
+    assert await store.get_job("old_waiting") is not None
+    assert await store.get_job("new_done") is not None
+
+    segments = [p for p in tmp_path.iterdir() if not p.name.endswith(".tmp")]
+    assert len(segments) == 1
+    rows = list(read_segment(segments[0]))
+    assert [r["event_id"] for r in rows] == ["old_done"]
+    assert rows[0]["result"] == "hello"
+
+
+async def test_nothing_to_archive(store: Store, tmp_path):
+    retention = RetentionManager(store, str(tmp_path), retention_days=30)
+    assert await retention.run_once() == 0
+    assert not any(tmp_path.iterdir())
+
+
+async def _fill_and_delete(store: Store, count: int) -> None:
+    for i in range(count):
+        await store.create_job(f"evt{i}", "pk", 5001, {"inputs": [{"value": "x" * 4000}]})
+    await store.delete_jobs([f"evt{i}" for i in range(count)])
+
+
+async def _pragma(store: Store, name: str) -> int:
+    cursor = await store._db.execute(f"PRAGMA {name}")
+    return (await cursor.fetchone())[0]
+
+
+async def test_compact_frees_pages_in_bounded_steps(store: Store):
+    await _fill_and_delete(store, 200)
+    free = await _pragma(store, "freelist_count")
+    assert free > 10
+
+    await store.compact(max_pages=10)
+    assert await _pragma(store, "freelist_count") == free - 10
+    await store.compact()
+    assert await _pragma(store, "freelist_count") == 0
+
+
+async def test_legacy_database_is_only_vacuumed_offline(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    legacy = sqlite3.connect(path)
+    legacy.execute("CREATE TABLE filler (x)")
+    legacy.close()
+
+    s = Store(path)
+    await s.open()
+    await _fill_and_delete(s, 50)
+    await s.compact()
+    assert await _pragma(s, "auto_vacuum") == 0
+    assert await _pragma(s, "freelist_count") > 0
+
+    await s.vacuum()
+    assert await _pragma(s, "auto_vacuum") == 2
+    assert await _pragma(s, "freelist_count") == 0
+    await s.close()
+
+
+async def test_blobs_only_archived_jobs_used_are_deleted(store: Store, tmp_path):
+    blobs = BlobStore(str(tmp_path / "blobs"))
+    url = "https://dvm.example"
+    orphan, shared = blobs.put(b"orphan", "text/plain"), blobs.put(b"shared")
+    old = time.time() - 40 * 86400
+    for digest in (orphan, shared):
+        os.utime(blobs.path(digest), (old, old))
+
+    await store.create_job("a", "pk", 5001)
+    await store.update_state("a", JobState.COMPLETED, result=blob_url(url, orphan), result_blob=orphan)
+    # A row from before result_blob existed is matched by its URL.
+    await store.create_job("b", "pk", 5001)
+    await store.update_state("b", JobState.COMPLETED, result=blob_url(url, shared))
+    for event_id in ("a", "b"):
+        await _age_job(store, event_id, 40)
+    # An encrypted result only references its blob through result_blob.
+    await store.create_job("c", "pk", 5001)
+    await store.update_state("c", JobState.COMPLETED, result="ciphertext", result_blob=shared)
+
+    retention = RetentionManager(
+        store, str(tmp_path / "archive"), retention_days=30, blobs=blobs, blob_public_url=url
+    )
+    assert await retention.run_once() == 2
+
+    assert not blobs.exists(orphan)
+    assert not blobs.path(orphan).with_name(f"{orphan}.mime").exists()
+    assert blobs.exists(shared)
@@ -0,0 +1,60 @@
+"""Unit tests for the payment-expiry deadline scheduler."""
+
+import asyncio
+import time
+
+from nostr_dvm_agent.core.scheduler import DeadlineScheduler
+
+
+async def test_fires_in_deadline_order_and_skips_cancelled():
+    fired: list[str] = []
+
+    async def on_deadline(key: str) -> None:
+        fired.append(key)
+
+    scheduler = DeadlineScheduler(on_deadline)
+    scheduler.start()
+    now = time.time()
+    scheduler.schedule("late", now + 0.15)
+    scheduler.schedule("early", now + 0.05)
+    scheduler.schedule("cancelled", now + 0.1)
+    scheduler.cancel("cancelled")
+
+    await asyncio.sleep(0.3)
+    scheduler.stop()
+
+    assert fired == ["early", "late"]
+    assert len(scheduler) == 0
+
+
+async def test_reschedule_replaces_previous_deadline():
+    fired: list[str] = []
+
+    async def on_deadline(key: str) -> None:
+        fired.append(key)
+
+    scheduler = DeadlineScheduler(on_deadline)
+    scheduler.start()
+    scheduler.schedule("job", time.time() + 10)
+    scheduler.schedule("job", time.time() + 0.05)
+
+    await asyncio.sleep(0.2)
+    scheduler.stop()
+
+    assert fired == ["job"]
+
+
+async def test_overdue_deadlines_fire_immediately():
+    fired: list[str] = []
+
+    async def on_deadline(key: str) -> None:
+        fired.append(key)
+
+    scheduler = DeadlineScheduler(on_deadline)
+    scheduler.schedule("overdue", time.time() - 60)
+    scheduler.start()
+
+    await asyncio.sleep(0.05)
+    scheduler.stop()
+
+    assert fired == ["overdue"]
@@ -0,0 +1,92 @@
+"""Unit tests for the near-duplicate prompt cache."""
+
+import asyncio
+from unittest.mock import patch
+
+from conftest import make_service, make_state_machine
+from nostr_sdk import EventBuilder, Keys, Kind, Tag
+
+from nostr_dvm_agent.ai.semantic_cache import (
+    SemanticCache,
+    answer_scope,
+    canonicalize,
+    equivalent,
+)
+from nostr_dvm_agent.db.store import JobState, Store
+
+
+def test_canonicalize():
+    assert canonicalize("  What is   Bitcoin?! ") == "what is bitcoin"
+    assert canonicalize("ＷＨＡＴ is bitcoin") == "what is bitcoin"
+    assert len({canonicalize("2+2"), canonicalize("2-2"), canonicalize("2*2")}) == 3
+
+
+def test_equivalent_tolerates_typos_and_filler_only():
+    assert equivalent("what is bitcoin", "what is bitcion")
+    assert equivalent("what is bitcoin", "please what is the bitcoin")
+    assert not equivalent("i am unhappy with it", "i am content with it")
+    assert not equivalent("i am happy", "i am unhappy")
+    assert not equivalent("is it safe", "is it not safe")
+    assert not equivalent("3 apples plus 4", "3 apples plus 5")
+    assert not equivalent("2+2", "2*2")
+
+
+def test_near_duplicates_hit_and_unrelated_miss():
+    cache = SemanticCache(threshold=0.6)
+    cache.store("s", "what is bitcoin", "digital money")
+    assert cache.lookup("s", "What is Bitcoin?") == "digital money"
+    assert cache.lookup("s", "what is bitcion") == "digital money"
+    assert cache.lookup("s", "what is ethereum") is None
+    assert cache.lookup("s", "what is not bitcoin") is None
+    assert cache.lookup("s", "what is bitcoin 2") is None
+    assert cache.lookup("other", "what is bitcoin") is None
+
+
+def test_scope_ignores_control_params():
+    base = {"params": {"max_tokens": "100"}}
+    assert answer_scope(5001, base) == answer_scope(
+        5001, {"params": {"max_tokens": "100", "cache": "allow"}}
+    )
+    assert answer_scope(5001, base) != answer_scope(5001, {"params": {"max_tokens": "200"}})
+
+
+def test_expiry_and_eviction():
+    cache = SemanticCache(max_entries=2, ttl_secs=10)
+    with patch("nostr_dvm_agent.ai.semantic_cache.time.monotonic", return_value=0.0):
+        cache.store("s", "first prompt", "1")
+        cache.store("s", "second prompt", "2")
+        cache.store("s", "third prompt", "3")
+        assert len(cache) == 2
+        assert cache.lookup("s", "first prompt") is None
+    with patch("nostr_dvm_agent.ai.semantic_cache.time.monotonic", return_value=11.0):
+        assert cache.lookup("s", "third prompt") is None
+    assert len(cache) == 1
+    assert all(cache._buckets.values())
+
+
+async def test_allowed_request_served_from_cache_at_discount(store: Store):
+    service = make_service(cost=1000, result="digital money")
+    service.kind, service.cacheable = 5001, True
+    sm = make_state_machine(store, {5001: service})
+    lightning = sm._lightning
+
+    def request(text, *params):
+        tags = [Tag.parse(["i", text, "text"])] + [Tag.parse(["param", *p]) for p in params]
+        return EventBuilder(Kind(5001), "").tags(tags).sign_with_keys(Keys.generate())
+
+    await sm.handle_job_request(request("what is bitcoin"))
+    await sm.handle_payment_confirmed("h1")
+    await asyncio.gather(*sm._running_jobs.values())
+    assert lightning.create_invoice.await_args.args[0] == 1000
+
+    lightning.create_invoice.return_value = {"bolt11": "lnbc2", "payment_hash": "h2"}
+    event = request("What is Bitcoin?", ["cache", "allow"])
+    await sm.handle_job_request(event)
+    assert lightning.create_invoice.await_args.args[0] == 500
+    await sm.handle_payment_confirmed("h2")
+    await asyncio.gather(*sm._running_jobs.values())
+
+    service.execute.assert_awaited_once()
+    job = await store.get_job(event.id().to_hex())
+    assert job["state"] == JobState.COMPLETED.value
+    assert job["result"] == "digital money"
@@ -0,0 +1,99 @@
+"""Unit tests for speculative execution of cheap jobs before payment confirms."""
+
+import asyncio
+from unittest.mock import MagicMock
+
+from conftest import make_service, make_state_machine
+from nostr_sdk import EventBuilder, Keys, Kind, Tag
+
+from nostr_dvm_agent.core.state_machine import StateMachine
+from nostr_dvm_agent.db.store import JobState, Store
+
+
+def _make(store: Store, cost: int = 300):
+    service = make_service(cost)
+    sm = make_state_machine(
+        store, {5002: service}, speculative_enabled=True, speculative_min_paid_jobs=2
+    )
+    return sm, service
+
+
+def _history(sm: StateMachine, pubkey: str, paid: int, expired: int = 0) -> None:
+    for _ in range(paid):
+        sm.reputation.record_paid(pubkey, 300)
+    for _ in range(expired):
+        sm.reputation.record_expired(pubkey)
+
+
+def _request(keys: Keys):
+    return (
+        EventBuilder(Kind(5002), "")
+        .tags([Tag.parse(["i", "hello", "text"])])
+        .sign_with_keys(keys)
+    )
+
+
+async def test_reliable_payer_result_reused_after_payment(store: Store):
+    sm, service = _make(store)
+    keys = Keys.generate()
+    _history(sm, keys.public_key().to_hex(), paid=2)
+    event = _request(keys)
+
+    await sm.handle_job_request(event)
+    assert event.id().to_hex() in sm._speculative
+    await asyncio.sleep(0)
+
+    await sm.handle_payment_confirmed("h1")
+    await asyncio.gather(*sm._running_jobs.values())
+
+    service.execute.assert_awaited_once()
+    job = await store.get_job(event.id().to_hex())
+    assert job["state"] == JobState.COMPLETED.value
+    assert job["result"] == "done"
+
+
+async def test_no_speculation_for_unreliable_or_expensive_jobs(store: Store):
+    sm, _ = _make(store)
+    keys = Keys.generate()
+    _history(sm, keys.public_key().to_hex(), paid=2, expired=2)
+    await sm.handle_job_request(_request(keys))
+    assert not sm._speculative
+
+    sm, _ = _make(store, cost=5000)
+    await sm.handle_job_request(_request(Keys.generate()))
+    assert not sm._speculative
+
+
+async def test_expiry_discards_speculative_result(store: Store):
+    sm, service = _make(store)
+    async def slow(job_data):
+        await asyncio.sleep(60)
+
+    service.execute = slow
+    keys = Keys.generate()
+    _history(sm, keys.public_key().to_hex(), paid=2)
+    event = _request(keys)
+
+    await sm.handle_job_request(event)
+    task = sm._speculative[event.id().to_hex()]
+    await sm._expire_job(event.id().to_hex())
+    await asyncio.sleep(0)
+
+    assert not sm._speculative
+    assert task.cancelled()
+
+
+async def test_no_speculation_when_answer_is_cached(store: Store):
+    sm, service = _make(store)
+    keys = Keys.generate()
+    _history(sm, keys.public_key().to_hex(), paid=2)
+    sm._cached_answer = MagicMock(return_value="cached")
+    event = _request(keys)
+
+    await sm.handle_job_request(event)
+    assert event.id().to_hex() not in sm._speculative
+
+    await sm.handle_payment_confirmed("h1")
+    await asyncio.gather(*sm._running_jobs.values())
+    service.execute.assert_not_awaited()
+    assert (await store.get_job(event.id().to_hex()))["result"] == "cached"
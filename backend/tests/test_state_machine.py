@@ -1,27 +1,19 @@
 """Unit tests for the DVM job state store."""
 
 import asyncio
-import os
-import tempfile
+import json
 
 import pytest
+from conftest import make_service, make_state_machine
+from nostr_sdk import EventBuilder, Keys, Kind, Tag
 
+from nostr_dvm_agent.db.payload import decode_payload, encode_payload
 from nostr_dvm_agent.db.store import JobState, Store
 
 
-@pytest.fixture
-async def store():
-    fd, path = tempfile.mkstemp(suffix=".db")
-    os.close(fd)
-    s = Store(path)
-    await s.open()
-    yield s
-    await s.close()
-    os.unlink(path)
-
-
 async def test_create_and_get_job(store: Store):
-    await store.create_job("evt1", "pubkey1", 5001, {"inputs": []})
+    assert await store.create_job("evt1", "pubkey1", 5001, {"inputs": []})
+    assert not await store.create_job("evt1", "pubkey1", 5001)
     job = await store.get_job("evt1")
     assert job is not None
     assert job["event_id"] == "evt1"
@@ -59,6 +51,82 @@ async def test_expire_stale_jobs(store: Store):
     assert job["state"] == JobState.EXPIRED.value
 
 
+async def test_expire_job_only_when_waiting(store: Store):
+    await store.create_job("evt5", "pubkey5", 5001)
+    await store.update_state("evt5", JobState.WAITING_PAYMENT)
+    assert await store.expire_job("evt5") is True
+    assert (await store.get_job("evt5"))["state"] == JobState.EXPIRED.value
+
+    await store.create_job("evt6", "pubkey6", 5001)
+    await store.update_state("evt6", JobState.PROCESSING)
+    assert await store.expire_job("evt6") is False
+    assert (await store.get_job("evt6"))["state"] == JobState.PROCESSING.value
+
+
+async def test_live_jobs_are_served_from_memory(store: Store):
+    await store.create_job("evt8", "pubkey8", 5001)
+    await store.update_state("evt8", JobState.WAITING_PAYMENT, invoice_hash="hash8", amount_msats=500)
+
+    db = store._db
+    store._db = None  # any disk access would now fail
+    try:
+        job = await store.get_job_by_invoice("hash8")
+        assert job["event_id"] == "evt8"
+        assert job["amount_msats"] == 500
+        assert (await store.get_job("evt8"))["state"] == JobState.WAITING_PAYMENT.value
+    finally:
+        store._db = db
+
+    await store.update_state("evt8", JobState.COMPLETED, result="ok")
+    assert "evt8" not in store._live
+    assert (await store.get_job_by_invoice("hash8"))["state"] == JobState.COMPLETED.value
+
+
+async def test_live_index_reloaded_on_open(store: Store):
+    await store.create_job("evt9", "pubkey9", 5001)
+    await store.update_state("evt9", JobState.WAITING_PAYMENT, invoice_hash="hash9")
+
+    reopened = Store(store._db_path)
+    await reopened.open()
+    try:
+        assert "evt9" in reopened._live
+        assert reopened._by_invoice["hash9"] == "evt9"
+    finally:
+        await reopened.close()
+
+
+def test_payload_roundtrip_drops_redundant_fields():
+    job_data = {
+        "event_id": "evt", "pubkey": "pk", "kind": 5000, "content": "",
+        "inputs": [{"value": "hola", "type": "text"}],
+        "params": {"language": "en"}, "output_mime": None, "bid_msats": None,
+        "encrypted": False,
+    }
+    raw = encode_payload(job_data)
+    assert b"evt" not in raw and b"pk" not in raw
+    assert decode_payload(raw, event_id="evt", pubkey="pk", kind=5000) == job_data
+
+
+def test_decode_legacy_json_payload():
+    legacy = json.dumps({"inputs": [{"value": "x", "type": "text"}], "params": {}})
+    job_data = decode_payload(legacy, event_id="evt", pubkey="pk", kind=5001)
+    assert job_data["inputs"][0]["value"] == "x"
+    assert job_data["event_id"] == "evt"
+
+
+async def test_get_payload_served_from_memory_then_disk(store: Store):
+    await store.create_job("evt7", "pubkey7", 5001, {"inputs": [{"value": "hi", "type": "text"}]})
+    await store.update_state("evt7", JobState.WAITING_PAYMENT)
+    assert "evt7" in store._payloads
+
+    await store.update_state("evt7", JobState.COMPLETED, result="done")
+    assert "evt7" not in store._payloads
+
+    job_data = await store.get_payload("evt7")
+    assert job_data["inputs"] == [{"value": "hi", "type": "text"}]
+    assert job_data["pubkey"] == "pubkey7"
+
+
 async def test_get_job_by_invoice(store: Store):
     await store.create_job("evt4", "pubkey4", 5001)
     await store.update_state("evt4", JobState.WAITING_PAYMENT, invoice_hash="hash123")
@@ -69,3 +137,64 @@ async def test_get_job_by_invoice(store: Store):
 
     missing = await store.get_job_by_invoice("nonexistent")
     assert missing is None
+
+
+async def test_reads_use_read_only_pool(store: Store):
+    await store.create_job("evt10", "pubkey10", 5001)
+    await store.update_state("evt10", JobState.COMPLETED, result="ok")
+    assert len(store._reader_conns) == 2
+
+    jobs = await asyncio.gather(*(store.get_job("evt10") for _ in range(8)))
+    assert all(j["result"] == "ok" for j in jobs)
+
+    async with store._reader() as conn:
+        with pytest.raises(Exception):
+            await conn.execute("DELETE FROM jobs")
+    assert (await store.get_job("evt10")) is not None
+
+
+async def test_memory_store_falls_back_to_writer():
+    s = Store(":memory:")
+    await s.open()
+    try:
+        await s.create_job("evt11", "pubkey11", 5001)
+        await s.update_state("evt11", JobState.FAILED, error="x")
+        assert not s._reader_conns
+        assert (await s.get_job("evt11"))["state"] == JobState.FAILED.value
+    finally:
+        await s.close()
+
+
+async def test_claim_job_is_conditional(store: Store):
+    await store.create_job("evt12", "pubkey12", 5001)
+    await store.update_state("evt12", JobState.WAITING_PAYMENT, invoice_hash="hash12")
+
+    assert await store.claim_job("evt12", JobState.WAITING_PAYMENT, JobState.PROCESSING)
+    assert not await store.claim_job("evt12", JobState.WAITING_PAYMENT, JobState.PROCESSING)
+    assert (await store.get_job_by_invoice("hash12"))["state"] == JobState.PROCESSING.value
+
+
+async def test_claim_jobs_takes_oldest_once(store: Store):
+    for i in range(5):
+        await store.create_job(f"batch{i}", "pk", 5001)
+        await store.update_state(f"batch{i}", JobState.PROCESSING)
+
+    first = await store.claim_jobs(JobState.PROCESSING, JobState.STREAMING, 3)
+    second = await store.claim_jobs(JobState.PROCESSING, JobState.STREAMING, 3)
+    assert sorted(r["event_id"] for r in first) == ["batch0", "batch1", "batch2"]
+    assert sorted(r["event_id"] for r in second) == ["batch3", "batch4"]
+    assert (await store.get_job("batch0"))["state"] == JobState.STREAMING.value
+
+
+async def test_redelivered_request_is_invoiced_once(store: Store):
+    sm = make_state_machine(store, {5002: make_service()})
+
+    event = (
+        EventBuilder(Kind(5002), "")
+        .tags([Tag.parse(["i", "hello", "text"])])
+        .sign_with_keys(Keys.generate())
+    )
+    await sm.handle_job_request(event)
+    await sm.handle_job_request(event)
+
+    sm._lightning.create_invoice.assert_awaited_once()
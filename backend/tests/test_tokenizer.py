@@ -0,0 +1,114 @@
+"""Unit tests for local token estimation."""
+
+from types import SimpleNamespace
+
+from nostr_dvm_agent.ai.gemini_client import GeminiClient
+from nostr_dvm_agent.ai.tokenizer import TokenCounter, count_raw_tokens
+from nostr_dvm_agent.config import Settings
+from nostr_dvm_agent.services.discovery import DiscoveryService
+from nostr_dvm_agent.services.image_generation import ImageGenerationService
+from nostr_dvm_agent.services.text_extraction import TextExtractionService
+from nostr_dvm_agent.services.text_generation import TextGenerationService
+
+
+def test_cjk_counts_more_tokens_than_char_heuristic():
+    text = "比特币是什么？它如何运作"
+    assert count_raw_tokens(text) > len(text) // 4
+
+
+def test_code_is_denser_than_prose():
+    prose = "the cat sat on the mat and then went to sleep"
+    code = "x[i]=f(a,b);y={k:v};z=(1+2)*3"
+    assert len(code) < len(prose)
+    assert count_raw_tokens(code) > count_raw_tokens(prose)
+
+
+def test_count_is_memoized_and_calibrated():
+    counter = TokenCounter()
+    text = "Hello world, this is a test."
+    first = counter.count(text)
+    assert counter.count(text) == first
+
+    for _ in range(50):
+        counter.observe(text, first * 2)
+    assert counter.scale > 1.5
+    assert counter.count(text) > first
+
+
+def test_output_estimate_honours_max_tokens():
+    counter = TokenCounter()
+    assert counter.estimate_output("generate", 10, {"max_tokens": "2000"}) == 2000
+    assert counter.estimate_output("generate", 10, {}) < 2000
+    assert counter.estimate_output("translate", 1000, {}) > 1000
+
+
+def _gemini() -> GeminiClient:
+    return GeminiClient(Settings(nostr_private_key="nsec1test", gemini_api_key="test"))
+
+
+def _job(text: str = "", **params) -> dict:
+    return {"inputs": [{"value": text, "type": "text"}] if text else [], "params": params}
+
+
+async def test_services_price_by_tokens():
+    gemini = _gemini()
+    long_query = "word " * 3000
+
+    discovery = DiscoveryService(gemini, 500)
+    assert await discovery.estimate_cost(_job("bitcoin wallets")) == 500
+    assert await discovery.estimate_cost(_job(long_query)) == 1500
+
+    image = ImageGenerationService(gemini, 2000)
+    assert await image.estimate_cost(_job("a cat on a mat")) == 2000
+    assert await image.estimate_cost(_job(long_query)) == 4000
+
+    extraction = TextExtractionService(gemini, 200)
+    assert await extraction.estimate_cost(_job()) == 200
+    assert await extraction.estimate_cost(_job(max_tokens="8000")) == 600
+
+    generation = TextGenerationService(gemini, 500)
+    assert await generation.estimate_cost(_job("hi", task="summarize")) == 500
+    long_text = "word " * 7000
+    expected = 1500 * gemini.summary_chunks(len(long_text))
+    assert await generation.estimate_cost(_job(long_text, task="summarize")) == expected
+    await extraction._http.aclose()
+    await gemini.close()
+
+
+async def test_usage_calibration_runs_on_cpu_executor():
+    gemini = _gemini()
+    offloaded = []
+    run_thread = gemini._cpu.run_thread
+
+    async def record(fn, *args, **kwargs):
+        offloaded.append(fn.__name__)
+        return await run_thread(fn, *args, **kwargs)
+
+    gemini._cpu.run_thread = record  # type: ignore[method-assign]
+    usage = SimpleNamespace(prompt_token_count=40)
+    gemini._sync_generate = lambda *a, **k: SimpleNamespace(text="ok", usage_metadata=usage)  # type: ignore[method-assign]
+
+    assert await gemini.generate_text("hello there") == "ok"
+    assert offloaded == ["_observe_usage"]
+    assert gemini._tokens.scale != 1.0
+    await gemini.close()
+
+
+async def test_calibration_error_does_not_retry_a_good_answer():
+    gemini = _gemini()
+    calls = []
+
+    def generate(*args, **kwargs):
+        calls.append(kwargs["model"])
+        return SimpleNamespace(text="ok", usage_metadata=None)
+
+    def broken_observe(*args):
+        raise RuntimeError("tokenizer broke")
+
+    gemini._sync_generate = generate  # type: ignore[method-assign]
+    gemini._observe_usage = broken_observe  # type: ignore[method-assign]
+
+    assert await gemini.generate_text("hello there") == "ok"
+    assert len(calls) == 1
+    assert gemini.router.stats(calls[0]).failures == 0
+    await gemini.close()
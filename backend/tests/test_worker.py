@@ -0,0 +1,120 @@
+"""Unit tests for coordinator/worker execution with store leases."""
+
+import asyncio
+
+from conftest import make_service, make_state_machine
+
+from nostr_dvm_agent.core.worker import JobWorker
+from nostr_dvm_agent.db.store import JobState, Store
+
+
+def _make_service(result: str = "done", error: Exception | None = None):
+    service = make_service(result=result)
+    service.execute.side_effect = error
+    return service
+
+
+async def _paid_job(store: Store, event_id: str) -> None:
+    await store.create_job(event_id, "alice", 5001, {"inputs": [{"value": "hi", "type": "text"}]})
+    await store.update_state(event_id, JobState.WAITING_PAYMENT, invoice_hash=f"h-{event_id}")
+
+
+async def _drain(worker: JobWorker) -> None:
+    await asyncio.gather(*worker._running.values())
+
+
+async def test_coordinator_queues_and_publishes_worker_result(store: Store):
+    services = {5001: _make_service("translated")}
+    coordinator = make_state_machine(store, services, agent_role="coordinator")
+    nostr = coordinator._nostr
+    worker = JobWorker(store, services, "w1")
+
+    await _paid_job(store, "evt1")
+    await coordinator.handle_payment_confirmed("h-evt1")
+    await asyncio.gather(*coordinator._running_jobs.values())
+    assert (await store.get_job("evt1"))["state"] == JobState.QUEUED.value
+    assert coordinator.load()[0] == 1
+
+    assert await worker.poll_once() == 1
+    await _drain(worker)
+    job = await store.get_job("evt1")
+    assert job["state"] == JobState.EXECUTED.value
+    assert job["lease_owner"] == "w1"
+
+    assert await coordinator.collect_results() == 1
+    assert (await store.get_job("evt1"))["state"] == JobState.COMPLETED.value
+    assert coordinator.load()[0] == 0
+    nostr.publish_result.assert_awaited_once()
+    assert nostr.publish_result.await_args.args[3] == "translated"
+
+
+async def test_worker_failure_is_published_as_error(store: Store):
+    services = {5001: _make_service(error=RuntimeError("quota"))}
+    coordinator = make_state_machine(store, services, agent_role="coordinator")
+    nostr = coordinator._nostr
+    await store.create_job("evt2", "alice", 5001, {"inputs": [{"value": "x", "type": "text"}]})
+    await store.update_state("evt2", JobState.QUEUED)
+
+    worker = JobWorker(store, services, "w1")
+    await worker.poll_once()
+    await _drain(worker)
+    await coordinator.collect_results()
+
+    job = await store.get_job("evt2")
+    assert job["state"] == JobState.FAILED.value
+    assert job["error"] == "quota"
+    nostr.publish_feedback.assert_awaited_with("evt2", "alice", "error", content="quota")
+
+
+async def test_expired_lease_is_requeued_and_old_owner_loses_it(store: Store):
+    await store.create_job("evt3", "alice", 5001)
+    await store.update_state("evt3", JobState.QUEUED)
+
+    leased = await store.lease_jobs("dead-worker", lease_secs=-1, limit=5)
+    assert [r["event_id"] for r in leased] == ["evt3"]
+    assert await store.lease_jobs("w2", lease_secs=60, limit=5) == []
+
+    assert await store.requeue_expired_leases() == ["evt3"]
+    assert [r["event_id"] for r in await store.lease_jobs("w2", 60, 5)] == ["evt3"]
+
+    assert not await store.renew_lease("evt3", "dead-worker", 60)
+    assert not await store.finish_lease("evt3", "dead-worker", result="stale")
+    assert await store.finish_lease("evt3", "w2", result="fresh")
+    assert "evt3" not in store._live
+    assert (await store.get_job("evt3"))["result"] == "fresh"
+
+
+async def test_cancelled_job_revokes_lease(store: Store):
+    release = asyncio.Event()
+
+    async def slow_execute(job_data):
+        await release.wait()
+        return "late"
+
+    service = _make_service()
+    service.execute = slow_execute
+    await store.create_job("evt4", "alice", 5001, {"inputs": [{"value": "x", "type": "text"}]})
+    await store.update_state("evt4", JobState.QUEUED)
+
+    worker = JobWorker(store, {5001: service}, "w1", lease_secs=0.03)
+    await worker.poll_once()
+    await store.update_state("evt4", JobState.CANCELLED)
+
+    await asyncio.wait_for(_drain(worker), timeout=1)
+    assert (await store.get_job("evt4"))["state"] == JobState.CANCELLED.value
+
+
+async def test_restarted_coordinator_counts_jobs_in_flight(store: Store):
+    for event_id, state in (
+        ("q", JobState.QUEUED), ("l", JobState.QUEUED), ("x", JobState.EXECUTED),
+    ):
+        await store.create_job(event_id, "alice", 5001)
+        await store.update_state(event_id, state)
+    await store.lease_jobs("w1", lease_secs=60, limit=1)
+
+    coordinator = make_state_machine(store, agent_role="coordinator")
+    await coordinator.start()
+    try:
+        assert set(coordinator._outstanding) == {"q", "l", "x"}
+    finally:
+        await coordinator.stop()
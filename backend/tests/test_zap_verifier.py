@@ -1,9 +1,18 @@
 """Unit tests for Zap Receipt verification logic."""
 
+import asyncio
 import hashlib
 import json
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
+import pytest
+from conftest import make_service, make_state_machine
+from nostr_sdk import EventBuilder, Keys, Kind, Tag
+
+from nostr_dvm_agent.core.cpu_executor import CpuExecutor
+from nostr_dvm_agent.core.state_machine import StateMachine
+from nostr_dvm_agent.db.store import JobState, Store
+from nostr_dvm_agent.payment.zap_cache import ZapReceiptCache
 from nostr_dvm_agent.payment.zap_verifier import verify_zap_receipt
 
 
@@ -116,3 +125,135 @@ def test_amount_verification():
 
     result = verify_zap_receipt(event, expected_amount_msats=200)
     assert result is not None
+
+
+def _receipt(receipt_id: str, job_id: str, **kwargs):
+    event = _make_mock_zap_receipt(event_id=job_id, bolt11=f"lnbc-{job_id}", **kwargs)
+    event.id.return_value.to_hex.return_value = receipt_id
+    return event
+
+
+class _CountingExecutor(CpuExecutor):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def run_thread(self, fn, *args, size=None, **kwargs):
+        self.calls += 1
+        return fn(*args, **kwargs)
+
+
+async def test_duplicate_receipts_verified_once():
+    cache = ZapReceiptCache(_CountingExecutor())
+    event = _receipt("r1", "job1")
+
+    results = await asyncio.gather(*(cache.verify(event) for _ in range(5)))
+    again = await cache.verify(event)
+
+    assert all(r is results[0] for r in results) and again is results[0]
+    assert event.verify.call_count == 1
+
+
+async def test_burst_is_verified_in_one_batch():
+    cpu = _CountingExecutor()
+    cache = ZapReceiptCache(cpu)
+    events = [_receipt(f"r{i}", f"job{i}") for i in range(10)]
+
+    results = await asyncio.gather(*(cache.verify(e) for e in events))
+
+    assert cpu.calls == 1
+    assert [r["event_id"] for r in results] == [f"job{i}" for i in range(10)]
+    assert cache.find_by_job("job3")["bolt11"] == "lnbc-job3"
+    assert cache.find_by_bolt11("lnbc-job7")["event_id"] == "job7"
+
+
+async def test_rejected_receipts_are_cached_but_not_indexed():
+    cache = ZapReceiptCache(_CountingExecutor())
+    forged = _receipt("bad", "job9", valid_signature=False)
+
+    assert await cache.verify(forged) is None
+    assert await cache.verify(forged) is None
+    assert forged.verify.call_count == 1
+    assert cache.find_by_job("job9") is None
+
+
+async def test_cache_evicts_oldest_receipts_and_their_indexes():
+    cache = ZapReceiptCache(_CountingExecutor(), max_entries=2)
+    for i in range(3):
+        await cache.verify(_receipt(f"r{i}", f"job{i}"))
+
+    assert len(cache) == 2
+    assert cache.find_by_job("job0") is None
+    assert cache.find_by_bolt11("lnbc-job0") is None
+    assert cache.find_by_job("job2") is not None
+
+
+def _state_machine(store: Store) -> StateMachine:
+    sm = make_state_machine(store, {5002: make_service()})
+    sm._lightning.zapper_pubkey.return_value = "provider"
+    return sm
+
+
+def _job_request():
+    tags = [Tag.parse(["i", "hello", "text"])]
+    return EventBuilder(Kind(5002), "").tags(tags).sign_with_keys(Keys.generate())
+
+
+def _paid_zap(job_id: str, **overrides):
+    return {
+        "event_id": job_id, "bolt11": "lnbc1", "amount_msats": 300, "zap_receipt_id": "r1",
+        "payer_pubkey": "alice", "receipt_author": "provider", **overrides,
+    }
+
+
+async def test_only_our_providers_receipt_for_our_invoice_confirms_payment(store: Store):
+    sm = _state_machine(store)
+    event = _job_request()
+    job_id = event.id().to_hex()
+    await sm.handle_job_request(event)
+
+    sm._zaps.verify = AsyncMock()
+    for forged in (
+        _paid_zap(job_id, receipt_author="mallory"),
+        _paid_zap(job_id, bolt11="lnbc-someone-elses"),
+        _paid_zap(job_id, amount_msats=1),
+    ):
+        sm._zaps.verify.return_value = forged
+        await sm.handle_zap_receipt(MagicMock())
+        assert (await store.get_job(job_id))["state"] == JobState.WAITING_PAYMENT.value
+
+    sm._zaps.verify.return_value = _paid_zap(job_id)
+    await sm.handle_zap_receipt(MagicMock())
+    assert (await store.get_job(job_id))["state"] == JobState.PROCESSING.value
+    await asyncio.gather(*sm._running_jobs.values())
+
+
+@pytest.mark.parametrize(
+    "author, state", [("mallory", JobState.WAITING_PAYMENT), ("provider", JobState.PROCESSING)]
+)
+async def test_early_receipt_is_checked_before_confirming(
+    store: Store, author: str, state: JobState
+):
+    sm = _state_machine(store)
+    event = _job_request()
+    job_id = event.id().to_hex()
+    sm._zaps.find_by_job = MagicMock(return_value=_paid_zap(job_id, receipt_author=author))
+    sm._zaps.find_by_bolt11 = MagicMock(return_value=None)
+
+    await sm.handle_job_request(event)
+    assert (await store.get_job(job_id))["state"] == state.value
+    await asyncio.gather(*sm._running_jobs.values())
+
+
+async def test_receipt_is_not_trusted_without_a_zap_signing_provider(store: Store):
+    sm = _state_machine(store)
+    sm._lightning.zapper_pubkey.return_value = None
+    sm._lightning.check_payment_by_bolt11.return_value = True
+    event = _job_request()
+    job_id = event.id().to_hex()
+    await sm.handle_job_request(event)
+
+    sm._zaps.verify = AsyncMock(return_value=_paid_zap(job_id, receipt_author="anyone"))
+    await sm.handle_zap_receipt(MagicMock())
+
+    assert (await store.get_job(job_id))["state"] == JobState.WAITING_PAYMENT.value